@@ -6,6 +6,9 @@ import os
 import logging
 
 from comm import Message, CommunicationNode
+from comm.beacon import BeaconListener, BeaconSender, beacon_address, beacon_interval, beacon_mode, beacon_port
+from comm.prober import ConnectProber, SubnetSweep
+from comm.worker_pool import WorkerPool
 from app.discovery import RegisterTable, ServiceRegister, NodeType
 
 logger = logging.getLogger("dftp.app.discovery_node")
@@ -27,9 +30,16 @@ class DiscoveryNode(CommunicationNode):
 
     - query_all: Consulta todos los nodos registrados.
 
+    - subscribe: Stream de los cambios de la tabla (altas, bajas y actualizaciones) numerados; el
+        suscriptor los aplica a su copia y vuelve a suscribirse desde el último que vio.
+
     Hilos que ejecuta en background:
 
-    - update_discovery_peers_loop: escanea la subred en busca de otros DiscoveryNodes enviando heartbeats periódicos.
+    - update_discovery_peers_loop: envía heartbeats periódicos a los otros DiscoveryNodes; los conoce por sus
+        beacons UDP (ver comm.beacon) o, si la red no los entrega, escaneando la subred.
+
+    - beacons: anuncia el nodo por UDP (broadcast o multicast, DISCOVERY_BEACON) cada DISCOVERY_BEACON_INTERVAL
+        segundos para que los LocationNodes no tengan que barrer la subred.
 
     - clean_inactive_register_loop: limpia nodos inactivos de la tabla de registros basándose en timeouts de heartbeat.
     
@@ -44,6 +54,15 @@ class DiscoveryNode(CommunicationNode):
         # Tabla de servicios registrados
         self.register_table = RegisterTable()
 
+        # Cada suscripción ocupa un hilo esperando cambios: carril propio de DISCOVERY_MAX_SUBSCRIBERS
+        # hilos para no quitárselos a los handlers. Por encima se contesta COMM_BUSY y el
+        # suscriptor sigue con consultas por rol hasta que vuelve a intentarlo.
+        self.subscriber_pool = WorkerPool(max_workers=int(os.getenv("DISCOVERY_MAX_SUBSCRIBERS", "64")),
+                                          max_queue=int(os.getenv("DISCOVERY_SUBSCRIBER_QUEUE", "16")),
+                                          name=f"{node_name}-subscribe")
+        self.lanes.add_lane("subscribe", self.subscriber_pool)
+        self.set_priority("DISCOVERY_SUBSCRIBE", "subscribe")
+
         # Conjunto de discovery Nodes
         self.peers: dict[str, str] = {}
         self.peers_lock = threading.Lock()
@@ -58,6 +77,9 @@ class DiscoveryNode(CommunicationNode):
         self.discovery_interval = discovery_interval
         self.discovery_timeout = discovery_timeout
         self.discovery_workers = discovery_workers
+        # Barrido sin beacons: connects no bloqueantes por ventanas de DISCOVERY_SCAN_WINDOW direcciones
+        self.prober = ConnectProber(timeout=discovery_timeout)
+        self.sweep = SubnetSweep(self.possible_ips, window=int(os.getenv("DISCOVERY_SCAN_WINDOW", "0")) or None)
 
         # Registros y timeouts
         self.heartbeat_timeout = heartbeat_timeout
@@ -70,7 +92,11 @@ class DiscoveryNode(CommunicationNode):
 
         # Hilos de background
         self._stop = threading.Event()
+        self.beacon_sender = None
+        self.beacon_listener = None
         if not testing:
+            self._start_beacons()
+
             # Hilo de descubrimiento de peers
             t1 = threading.Thread(target=self.update_discovery_peers_loop, daemon=True)
             t1.start()
@@ -88,12 +114,21 @@ class DiscoveryNode(CommunicationNode):
         self.register_handler("DISCOVERY_QUERY_BY_NAME", self._handle_query_by_name)
         self.register_handler("DISCOVERY_QUERY_BY_ROLE", self._handle_query_by_role)
         self.register_handler("DISCOVERY_QUERY_ALL", self._handle_query_all)
+        self.register_handler("DISCOVERY_SUBSCRIBE", self._handle_subscribe)
 
     def get_possible_ips(self) -> list[str]:
         """Obtiene todas las posibles ips de hosts de la red exceptuando la ip propia para el envío de mensajes"""
         net = ipaddress.ip_network(self.subnet, strict=False)
         return [str(ip) for ip in net.hosts() if str(ip) != self.ip]
 
+    def stop_server(self):
+        """Detiene los hilos de background, los beacons y el servidor."""
+        self._stop.set()
+        for beacon in (self.beacon_sender, self.beacon_listener):
+            if beacon is not None:
+                beacon.stop()
+        super().stop_server()
+
     # ---------------- Handlers obligatorios ----------------
     def _handle_heartbeat(self, message: Message, client_sock):
         """Maneja DISCOVERY_HEARTBEAT:
@@ -101,20 +136,21 @@ class DiscoveryNode(CommunicationNode):
             . retorna información de contacto del nodo actual para que otros nodos puedan intercambiar mensajes
             . usado para descubrimiento por parte de otros nodos(incluidos otros Discovery Nodes)
 
-        Recibe Message(... payload: { name, ip, role })
-        Retorna Message(.. payload: {status, ip, name}) -> del nodo actual
+        Recibe Message(... payload: { name, ip, role, endpoint? })
+        Retorna Message(.. payload: {status, ip, name, endpoint}) -> del nodo actual
         """
         try:
             payload = message.payload or {}
             name = payload.get("name")
             ip = payload.get("ip")
             role = payload.get("role")
+            endpoint = payload.get("endpoint")
             if not name or not ip or not role:
                 return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "ERROR", "error_msg": "missing fields", "ip": self.ip, "name": self.node_name})
 
             # Si quien envía es un discovery node (role == 'DISCOVERY') lo tratamos como peer
             if str(role).upper() == "DISCOVERY":
-                return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ip": self.ip, "name": self.node_name})
+                return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ip": self.ip, "name": self.node_name, "endpoint": self.endpoint_info()})
 
             # No es discovery: registrar/actualizar en tabla
             try:
@@ -123,20 +159,16 @@ class DiscoveryNode(CommunicationNode):
                 # role inválido, no podemos registrar
                 return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "ERROR", "error_msg": "invalid role", "ip": self.ip, "name": self.node_name})
 
-            existing = self.register_table.get_node(name)
-            if existing:
-                # actualizar ip y heartbeat
-                existing.ip = ip
-                existing.heartbeat()
-            else:
+            # actualizar ip, endpoint y heartbeat si ya estaba registrado
+            if not self.register_table.touch_node(name, ip, endpoint):
                 try:
-                    sr = ServiceRegister(name, ip, node_type)
+                    sr = ServiceRegister(name, ip, node_type, endpoint)
                     self.register_table.add_node(sr)
                 except Exception as e:
                     logger.exception("Error registrando nodo %s: %s", name, e)
                     return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "ERROR", "error_msg": str(e), "ip": self.ip, "name": self.node_name})
 
-            return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ip": self.ip, "name": self.node_name})
+            return Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ip": self.ip, "name": self.node_name, "endpoint": self.endpoint_info()})
 
         except Exception as e:
             logger.exception("Error en _handle_heartbeat: %s", e)
@@ -177,8 +209,9 @@ class DiscoveryNode(CommunicationNode):
             
             nodes = self.register_table.get_nodes_by_type(node_type)
             ips = [n.ip for n in nodes]
+            endpoints = [n.endpoint for n in nodes if n.endpoint]
             
-            return Message(type="DISCOVERY_QUERY_BY_ROLE_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ips": ips})
+            return Message(type="DISCOVERY_QUERY_BY_ROLE_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "OK", "ips": ips, "endpoints": endpoints})
         
         except Exception as e:
             logger.exception("Error en query_by_role: %s", e)
@@ -194,6 +227,45 @@ class DiscoveryNode(CommunicationNode):
             logger.exception("Error en query_all: %s", e)
             return Message(type="DISCOVERY_QUERY_ALL_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "ERROR", "error_msg": str(e)})
 
+    def _handle_subscribe(self, message: Message, client_sock):
+        """
+        Responde en streaming (ver CommunicationNode.send_stream) con los cambios de la tabla
+        durante duration segundos; después el suscriptor vuelve a suscribirse desde el último.
+
+        Recibe Message(... payload: { since?, epoch?, duration?, keepalive? })
+        Cada chunk es uno de:
+            {kind: "snapshot", epoch, seq, nodes: [to_dict]} -> la tabla entera, si since falta, es de
+                otra tabla (epoch) o sus cambios ya no están en el registro
+            {kind: "deltas", epoch, seq, deltas: [{seq, op, node}]} -> cambios desde el chunk anterior,
+                o ninguno cada keepalive segundos para indicar que la suscripción sigue viva
+        """
+        payload = message.payload or {}
+        try:
+            since = payload.get("since")
+            since = int(since) if since is not None and payload.get("epoch") == self.register_table.epoch else None
+            duration = min(max(float(payload.get("duration", 30)), 0.0), 300.0)
+            keepalive = min(max(float(payload.get("keepalive", 5)), 0.05), 30.0)
+        except (TypeError, ValueError):
+            return Message(type="DISCOVERY_SUBSCRIBE_RESPONSE", src=self.ip, dst=message.header.get("src"), payload={"status": "ERROR", "error_msg": "invalid subscription"})
+        return self._subscription_stream(since, duration, keepalive)
+
+    def _subscription_stream(self, since: int | None, duration: float, keepalive: float):
+        table = self.register_table
+        end = time.monotonic() + duration
+        while True:
+            deltas = None if since is None else table.changes_since(since)
+            if deltas is None:
+                since, nodes = table.snapshot()
+                yield {"kind": "snapshot", "epoch": table.epoch, "seq": since, "nodes": [n.to_dict() for n in nodes]}
+            else:
+                since = deltas[-1]["seq"] if deltas else since
+                yield {"kind": "deltas", "epoch": table.epoch, "seq": since, "deltas": deltas}
+
+            remaining = end - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                return
+            table.wait_changes(since, min(keepalive, remaining))
+
     # ---------------- Background loops ----------------
     def update_discovery_peers_loop(self):
         """Escanea la subred en paralelo enviando DISCOVERY_HEARTBEAT y 
@@ -203,7 +275,7 @@ class DiscoveryNode(CommunicationNode):
         while not self._stop.is_set():
             try:
                 found = {}
-                results = self._find_peers_in_parallel()
+                results = self._find_peers_in_parallel(self._peer_targets())
 
                 for _ , response in results:
                     if not response:
@@ -239,13 +311,56 @@ class DiscoveryNode(CommunicationNode):
                 logger.exception("Error en clean_inactive_register_loop")
                 time.sleep(self.clean_interval)
 
-    def _find_peers_in_parallel(self):
-        """Envía señales en paralelo a toda la red para encontrar otros Discovery Nodes"""
-        max_workers = min(self.discovery_workers, max(1, len(self.possible_ips)))
+    def _start_beacons(self):
+        """Empieza a anunciarse por UDP y a escuchar los beacons de los demás discovery nodes."""
+        mode = beacon_mode()
+        if mode == "off":
+            return
+        interval = beacon_interval()
+        address = beacon_address(self.subnet, mode)
+        try:
+            self.beacon_listener = BeaconListener(beacon_port(), group=address if mode == "multicast" else None,
+                                                  accept=lambda p: p.get("role") == "DISCOVERY", ignore=self.node_name)
+            self.beacon_sender = BeaconSender(address, beacon_port(), self._beacon_payload, interval=interval)
+        except OSError:
+            logger.warning("%s: no se pudieron abrir los beacons UDP, se escaneará la subred", self.node_name, exc_info=True)
+            if self.beacon_listener is not None:
+                self.beacon_listener.stop()
+            self.beacon_listener = None
+            return
+        self.beacon_listener.start()
+        self.beacon_sender.start()
+
+    def _beacon_payload(self) -> dict:
+        return {"name": self.node_name, "ip": self.ip, "port": self.port, "role": "DISCOVERY", "endpoint": self.endpoint_info()}
+
+    def _peer_targets(self) -> list[str]:
+        """
+        IPs a las que mandar heartbeats: los discovery nodes cuyo beacon llegó hace poco y los peers
+        ya conocidos. Sin beacons (desactivados, o ninguno de otro discovery node en 3 intervalos)
+        las ips de la siguiente ventana del barrido que tienen el puerto abierto.
+        """
+        listener = self.beacon_listener
+        interval = self.beacon_sender.interval if self.beacon_sender else 0
+        with self.peers_lock:
+            known = set(self.peers.values())
+        if listener is None or listener.scan_needed(3 * interval):
+            window = self.sweep.next_window(priority=sorted(known))
+            open_ips = self.prober.probe(window, self.port)
+            self.sweep.update(window, open_ips, skipped=self.prober.last_skipped)
+            return open_ips
+        return sorted(known | set(listener.alive(3 * interval).values()))
+
+    def _find_peers_in_parallel(self, ips: list[str] = None):
+        """Envía señales en paralelo a ips (por defecto toda la red) para encontrar otros Discovery Nodes"""
+        ips = self.possible_ips if ips is None else ips
+        if not ips:
+            return []
+        max_workers = min(self.discovery_workers, len(ips))
         results = []
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futures = [ex.submit(self._probe_send_heartbeat, ip) for ip in self.possible_ips]
+            futures = [ex.submit(self._probe_send_heartbeat, ip) for ip in ips]
             for fut in concurrent.futures.as_completed(futures):
                 try:
                     res = fut.result(timeout=self.discovery_timeout + 0.5)
@@ -1,16 +1,32 @@
 import threading
+import uuid
+from collections import deque
 from app.discovery import ServiceRegister, NodeType  
 import time
 
+# Cambios que se guardan para los suscriptores (DISCOVERY_SUBSCRIBE); uno que se quede más
+# atrás recibe la tabla entera en lugar de los cambios
+DELTA_LOG_SIZE = 1024
+
 class RegisterTable:
     """
     Tabla de nodos registrados en memoria.
     Garantiza thread-safety y evita duplicados por nombre o IP.
+
+    Cada alta, baja o cambio de ip/tipo/endpoint queda en un registro de cambios numerado
+    (seq) para que los suscriptores pidan solo lo que cambió desde el último que vieron.
+    epoch identifica esta tabla: tras reiniciar discovery las seq vuelven a empezar.
     """
-    def __init__(self):
+    def __init__(self, log_size: int = DELTA_LOG_SIZE):
         self._nodes: dict[str, ServiceRegister] = {}  # name -> ServiceRegister
         self._ips: set[str] = set()                   # IPs registradas
         self._lock = threading.Lock()                 # Lock para concurrencia
+        self._changed = threading.Condition(self._lock)
+
+        # Registro de cambios: {"seq", "op": add|update|remove, "node": to_dict()}
+        self.epoch = uuid.uuid4().hex
+        self._seq = 0
+        self._log: deque[dict] = deque(maxlen=log_size)
 
     def _validate_node_type(self, node: ServiceRegister):
         """Valida que el tipo del nodo sea un NodeType válido."""
@@ -34,16 +50,39 @@ class RegisterTable:
                         raise ValueError(f"Node IP '{node.ip}' already exists")
                     self._ips.discard(existing_node.ip)
                     self._ips.add(node.ip)
+                changed = existing_node.ip != node.ip or existing_node.node_type != node.node_type
                 existing_node.ip = node.ip
                 existing_node.node_type = node.node_type
                 existing_node.last_heartbeat = time.time()
+                if changed:
+                    self._record("update", existing_node)
             else:
                 # Nodo nuevo
                 if node.ip in self._ips:
                     raise ValueError(f"Node IP '{node.ip}' already exists")
                 self._nodes[node.name] = node
                 self._ips.add(node.ip)
+                self._record("add", node)
 
+    def touch_node(self, name: str, ip: str, endpoint: dict = None) -> bool:
+        """
+        Heartbeat de un nodo ya registrado: actualiza su heartbeat, ip y endpoint.
+        Devuelve False si no existe.
+        """
+        with self._lock:
+            node = self._nodes.get(name)
+            if node is None:
+                return False
+            changed = node.ip != ip or node.endpoint != endpoint
+            if node.ip != ip:
+                self._ips.discard(node.ip)
+                self._ips.add(ip)
+            node.ip = ip
+            node.endpoint = endpoint
+            node.heartbeat()
+            if changed:
+                self._record("update", node)
+            return True
 
     def remove_node(self, name: str):
         """Elimina un nodo del registro por su nombre."""
@@ -51,6 +90,7 @@ class RegisterTable:
             node = self._nodes.pop(name, None)
             if node:
                 self._ips.discard(node.ip)
+                self._record("remove", node)
 
     def get_node(self, name: str) -> ServiceRegister | None:
         """Devuelve el nodo con el nombre dado, o None si no existe."""
@@ -66,3 +106,30 @@ class RegisterTable:
         """Devuelve todos los nodos registrados."""
         with self._lock:
             return list(self._nodes.values())
+
+    def snapshot(self) -> tuple[int, list[ServiceRegister]]:
+        """(seq, nodos): la tabla entera y el último cambio que ya incluye."""
+        with self._lock:
+            return self._seq, list(self._nodes.values())
+
+    def changes_since(self, seq: int) -> list[dict] | None:
+        """
+        Cambios posteriores a seq, en orden. None si ya no están todos en el registro (o seq
+        no es de esta tabla): quien pregunta debe empezar de nuevo con snapshot().
+        """
+        with self._lock:
+            oldest = self._log[0]["seq"] if self._log else self._seq + 1
+            if seq > self._seq or seq < oldest - 1:
+                return None
+            return [delta for delta in self._log if delta["seq"] > seq]
+
+    def wait_changes(self, seq: int, timeout: float) -> bool:
+        """Espera hasta timeout segundos a que haya algún cambio posterior a seq."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._seq > seq, timeout)
+
+    def _record(self, op: str, node: ServiceRegister):
+        """Anota un cambio (con el lock tomado) y despierta a quien espera en wait_changes."""
+        self._seq += 1
+        self._log.append({"seq": self._seq, "op": op, "node": node.to_dict()})
+        self._changed.notify_all()
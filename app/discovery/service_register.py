@@ -7,10 +7,11 @@ class ServiceRegister:
     """
     Representa un nodo registrado en el DiscoveryNode.
     """
-    def __init__(self, name: str, ip: str, node_type: NodeType):
+    def __init__(self, name: str, ip: str, node_type: NodeType, endpoint: dict = None):
         self.name = name
         self.ip = ip
         self.node_type = node_type
+        self.endpoint = endpoint  # {ip, port, host, uds} anunciado por el nodo (opcional)
         self.last_heartbeat = time.time()
 
     def heartbeat(self):
@@ -23,12 +24,15 @@ class ServiceRegister:
         """
         Devuelve una representación serializable del nodo.
         """
-        return {
+        data = {
             "name": self.name,
             "ip": self.ip,
             "type": self.node_type.value,
             "last_heartbeat": self.last_heartbeat
         }
+        if self.endpoint:
+            data["endpoint"] = self.endpoint
+        return data
 
     def __str__(self):
         return f"{self.name} ({self.node_type.value}) - {self.ip}"
@@ -0,0 +1,61 @@
+import unittest
+import os
+import socket
+import time
+from app.discovery import DiscoveryNode, NodeType
+from location.location_node import LocationNode
+
+
+class TestBeaconDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.env = dict(os.environ)
+        os.environ["DISCOVERY_SUBNET"] = "127.0.0.0/24"
+        os.environ["MEMBERSHIP_CACHE_DIR"] = ""
+        os.environ["DISCOVERY_BEACON_PORT"] = "9593"
+        os.environ["DISCOVERY_BEACON_INTERVAL"] = "0.1"
+        # En loopback el broadcast de la subred /24 no es un broadcast real del interfaz
+        os.environ["DISCOVERY_BEACON"] = "multicast"
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop_server()
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def test_location_finds_discovery_by_beacon(self):
+        """El LocationNode manda heartbeats solo a la ip anunciada por beacon, sin barrer la subred."""
+        discovery = DiscoveryNode("discovery1", "127.0.0.1", 9594)
+        self.nodes.append(discovery)
+        location = LocationNode("data1", "127.0.0.1", 9595, discovery_port=9594, heartbeat_interval=0.2,
+                                node_type=NodeType.DATA)
+        self.nodes.append(location)
+
+        end = time.monotonic() + 3
+        while time.monotonic() < end and not (discovery.register_table.get_node("data1") and location.discovery_nodes):
+            time.sleep(0.05)
+
+        self.assertEqual(location.discovery_nodes, {"discovery1": "127.0.0.1"})
+        self.assertIsNotNone(discovery.register_table.get_node("data1"))
+        self.assertEqual(location._heartbeat_targets(), ["127.0.0.1"])
+        self.assertEqual(discovery._peer_targets(), [])
+
+    def test_scan_when_beacons_off(self):
+        """Sin beacons se barre la subred y solo se mandan heartbeats a las ips con el puerto abierto."""
+        os.environ["DISCOVERY_BEACON"] = "off"
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.7", 9597))
+        listener.listen(16)
+        try:
+            location = LocationNode("data2", "127.0.0.1", 9596, discovery_port=9597, node_type=NodeType.DATA)
+            self.nodes.append(location)
+            self.assertIsNone(location.beacon_listener)
+            self.assertTrue(location._scanning())
+            self.assertEqual(location._heartbeat_targets(), ["127.0.0.7"])
+        finally:
+            listener.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import os
+import threading
+import time
+from app.discovery import DiscoveryNode, RegisterTable, ServiceRegister, NodeType
+from comm import CommunicationNode, Message
+from comm.streaming import StreamError
+
+
+class TestRegisterTableChanges(unittest.TestCase):
+
+    def test_changes_are_numbered(self):
+        table = RegisterTable()
+        table.add_node(ServiceRegister("data1", "10.0.0.5", NodeType.DATA))
+        table.add_node(ServiceRegister("data1", "10.0.0.5", NodeType.DATA))  # solo heartbeat
+        self.assertTrue(table.touch_node("data1", "10.0.0.6", {"ip": "10.0.0.6", "port": 9000}))
+        self.assertTrue(table.touch_node("data1", "10.0.0.6", {"ip": "10.0.0.6", "port": 9000}))
+        self.assertFalse(table.touch_node("ghost", "10.0.0.7"))
+        table.remove_node("data1")
+
+        deltas = table.changes_since(0)
+        self.assertEqual([(d["seq"], d["op"]) for d in deltas], [(1, "add"), (2, "update"), (3, "remove")])
+        self.assertEqual(deltas[1]["node"]["ip"], "10.0.0.6")
+        self.assertEqual(table.changes_since(3), [])
+        self.assertEqual(table.snapshot(), (3, []))
+
+    def test_gap_requires_snapshot(self):
+        table = RegisterTable(log_size=2)
+        for i in range(4):
+            table.add_node(ServiceRegister(f"data{i}", f"10.0.0.{i + 1}", NodeType.DATA))
+        self.assertIsNone(table.changes_since(1))
+        self.assertEqual([d["seq"] for d in table.changes_since(2)], [3, 4])
+        self.assertIsNone(table.changes_since(9))
+
+    def test_wait_changes(self):
+        table = RegisterTable()
+        self.assertFalse(table.wait_changes(0, 0.05))
+        threading.Timer(0.05, table.add_node, args=(ServiceRegister("auth1", "10.0.0.9", NodeType.AUTH),)).start()
+        self.assertTrue(table.wait_changes(0, 2))
+
+
+class TestDiscoverySubscribe(unittest.TestCase):
+
+    def setUp(self):
+        self.env = dict(os.environ)
+        os.environ["DISCOVERY_SUBNET"] = "127.0.0.0/28"
+        self.discovery = DiscoveryNode("discovery1", "127.0.0.1", 9630, testing=True)
+        self.client = CommunicationNode("client", "127.0.0.2", 9631)
+
+    def tearDown(self):
+        self.client.stop_server()
+        self.discovery.stop_server()
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def subscribe(self, **payload):
+        msg = Message(type="DISCOVERY_SUBSCRIBE", src=self.client.ip, dst=self.discovery.ip, payload=payload)
+        return self.client.send_stream(self.discovery.ip, self.discovery.port, msg, timeout=2)
+
+    def test_snapshot_then_deltas(self):
+        table = self.discovery.register_table
+        table.add_node(ServiceRegister("data1", "10.0.0.5", NodeType.DATA))
+
+        chunks = list(self.subscribe(duration=0))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0]["kind"], "snapshot")
+        self.assertEqual(chunks[0]["seq"], 1)
+        self.assertEqual([n["name"] for n in chunks[0]["nodes"]], ["data1"])
+
+        # Desde seq 1 llegan solo los cambios, según se producen
+        threading.Timer(0.1, table.remove_node, args=("data1",)).start()
+        stream = self.subscribe(since=1, epoch=chunks[0]["epoch"], duration=1, keepalive=0.5)
+        self.assertEqual(next(stream)["deltas"], [])
+        delta = next(stream)
+        self.assertEqual(delta["seq"], 2)
+        self.assertEqual([(d["op"], d["node"]["name"]) for d in delta["deltas"]], [("remove", "data1")])
+        stream.close()
+
+    def test_other_epoch_gets_snapshot(self):
+        chunks = list(self.subscribe(since=5, epoch="otra", duration=0))
+        self.assertEqual(chunks[0]["kind"], "snapshot")
+        self.assertEqual(chunks[0]["seq"], 0)
+
+    def test_subscribers_have_their_own_lane(self):
+        """Los suscriptores esperan en su carril, acotado: por encima se contesta COMM_BUSY y las consultas siguen."""
+        os.environ["DISCOVERY_MAX_SUBSCRIBERS"] = "1"
+        os.environ["DISCOVERY_SUBSCRIBER_QUEUE"] = "1"
+        discovery = DiscoveryNode("discovery2", "127.0.0.1", 9632, testing=True)
+        try:
+            def subscribe():
+                msg = Message(type="DISCOVERY_SUBSCRIBE", src=self.client.ip, dst=discovery.ip, payload={"duration": 1})
+                return self.client.send_stream(discovery.ip, discovery.port, msg, timeout=3)
+
+            first = subscribe()
+            self.assertEqual(next(first)["kind"], "snapshot")
+            queued = threading.Thread(target=lambda: list(subscribe()))
+            queued.start()
+            end = time.monotonic() + 2
+            while time.monotonic() < end and discovery.subscriber_pool.stats()["queue_depth"] < 1:
+                time.sleep(0.01)
+
+            with self.assertRaises(StreamError) as busy:
+                next(subscribe())
+            self.assertEqual(busy.exception.response.header["type"], "COMM_BUSY")
+            self.assertEqual(discovery.worker_pool.stats()["submitted"], 0)
+            response = self.client.send_message(discovery.ip, discovery.port,
+                                                Message(type="DISCOVERY_QUERY_ALL", src=self.client.ip, dst=discovery.ip, payload={}))
+            self.assertEqual(response.payload["status"], "OK")
+
+            first.close()
+            queued.join(5)
+        finally:
+            discovery.stop_server()
+
+    def test_invalid_subscription(self):
+        response = self.client.send_message(self.discovery.ip, self.discovery.port,
+                                            Message(type="DISCOVERY_SUBSCRIBE", src=self.client.ip, dst=self.discovery.ip,
+                                                    payload={"since": "x", "epoch": self.discovery.register_table.epoch}))
+        self.assertEqual(response.payload["status"], "ERROR")
+
+
+if __name__ == "__main__":
+    unittest.main()
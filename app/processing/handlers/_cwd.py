@@ -24,7 +24,7 @@ def handle_cwd(command: 'Command', client_session: 'FTPSession', processing_node
     ip, port = processing_node.get_data_node()
     msg = Message(type="CHECK_EXISTS", src= processing_node.ip, dst=ip, payload={"root": user_root, "current": current_dir, "path": new_directory, "want": 'dir'})
     try:
-        response = processing_node.send_message(ip, port, msg, await_response=True, timeout= 2.0)
+        response = processing_node.send_message(ip, port, msg, await_response=True, timeout= 2.0, retry=processing_node.rpc_retry)
         virtual = response.payload.get("path")
     except Exception as e:
         return 550, str(e)
@@ -21,7 +21,7 @@ def handle_dele(command: 'Command', client_session: 'FTPSession', processing_nod
     ip, port = processing_node.get_data_node()
     msg = Message(type='CHECK_DELE', src=processing_node.ip, dst=ip, payload={'root': user_root, 'current': current_directory, 'path': filename})
     try:
-        response = processing_node.send_message(ip, port, msg, True, 2.0)
+        response = processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
         msg = response.payload['msg']
     except FileNotFoundError:
         return 550, "File not found"
@@ -29,7 +29,7 @@ def handle_mkd(command: 'Command', client_session: 'FTPSession', processing_node
     msg = Message(type='CHECK_MKD', src=processing_node.ip, dst=ip, payload={'root': user_root, 'current': current_directory, 'dir': new_dir_name})
     # Crea el directorio usando FileSystemManager
     try:
-        response = processing_node.send_message(ip, port, msg, True, 2.0)
+        response = processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
         msg = response.payload['msg']
     except FileExistsError as e:
         return 550, str(e)
@@ -17,7 +17,7 @@ def handle_pass(command: 'Command', client_session: 'FTPSession', processing_nod
     password = command.get_arg(0)
     ip, port = processing_node.get_auth_node()
     msg = Message("CHECK_PASS", processing_node.ip, ip, payload={"username":client_session.username, "password" : password})
-    response = processing_node.send_message(ip, port, msg, True, 2.0)
+    response = processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
     if response.payload["result"]:
         return 230, "User logged in successfully"
     else:
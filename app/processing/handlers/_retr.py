@@ -1,5 +1,6 @@
 from app.processing.command import Command
 from app.processing.processing_node import ProcessingNode
+from app.processing.transfer import start_transfer
 from app.router.FTPSession import FTPSession
 from comm.message import Message
 
@@ -29,5 +30,5 @@ def handle_retr(command: Command, client_session: FTPSession, processing_node: P
         }
     )
 
-    processing_node.send_message(data_node_ip, data_node_port, msg, False)
+    start_transfer(processing_node, data_node_ip, data_node_port, msg)
     return 226, "Transfer complete"
@@ -25,7 +25,7 @@ def handle_rmd(command: 'Command', client_session: 'FTPSession', processing_node
     ip, port = processing_node.get_data_node()
     msg = Message(type='CHECK_RMD', src=processing_node.ip, dst=ip, payload={'root': user_root, 'current': current_directory, 'dir': dir_name})
     try:
-        response = processing_node.send_message(ip, port, msg, True, timeout=2.0)
+        response = processing_node.send_message(ip, port, msg, True, timeout=2.0, retry=processing_node.rpc_retry)
         msg = response.payload['msg']
     except FileNotFoundError:
         return 550, "Directory does not exist"
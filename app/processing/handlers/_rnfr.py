@@ -22,7 +22,7 @@ def handle_rnfr(command: 'Command', client_session: 'FTPSession', processing_nod
     ip, port = processing_node.get_data_node()
     msg = Message(type='CHECK_EXISTS', src=processing_node.ip, dst=ip, payload={'root': user_root, 'current': current_dir, 'path': old_path})
     try:
-        response = processing_node.send_message(ip, port, msg, True, 2.0)
+        response = processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
     except Exception as e:
         return 550, str(e)
     except FileNotFoundError:
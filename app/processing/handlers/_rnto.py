@@ -29,7 +29,7 @@ def handle_rnto(command: 'Command', client_session: 'FTPSession', processing_nod
     ip, port = processing_node.get_data_node()
     msg = Message(type='CHECK_RNTO', src=processing_node.ip, dst=ip, payload={'root': user_root, 'current': current_dir, 'old': old_virtual_path, 'new': requested_new_path})
     try:
-        processing_node.send_message(ip, port, msg, True, 2.0)
+        processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
     except Exception as e:
         client_session.clear_rename_from()
         return 550, str(e)
@@ -18,7 +18,7 @@ def handle_user(command, client_session: 'FTPSession', processing_node : 'Proces
     # Verificar si el usuario existe usando user_manager
     ip, port = processing_node.get_auth_node()
     msg = Message("CHECK_USER", processing_node.ip, ip, payload={"username":username})
-    response = processing_node.send_message(ip, port, msg, True, 2.0)
+    response = processing_node.send_message(ip, port, msg, True, 2.0, retry=processing_node.rpc_retry)
     if response.payload["result"]:
         return 331, "User name okay, need password"
     else:
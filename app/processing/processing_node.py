@@ -5,6 +5,7 @@ from app.processing.command import Command
 from app.processing.handlers_dispatch import HANDLERS_FTP_COMMANDS
 from app.router.FTPSession import FTPSession
 from comm.message import Message
+from comm.retry import RetryPolicy
 from location.location_node import LocationNode
 
 logger = logging.getLogger("dftp.processing.processing_node")
@@ -14,6 +15,9 @@ class ProcessingNode(LocationNode):
         super().__init__(node_name, ip, port, discovery_port, discovery_timeout, heartbeat_interval, node_type, discovery_workers)
         self.node_type = NodeType.PROCESSING
         self.register_handler("PROCESS_FTP_COMMAND", self._handle_process_ftp_command)
+        # Reintentos de las peticiones de los handlers FTP a auth y data: un timeout suelto
+        # no hace fallar el comando y el nodo destino no aplica dos veces CHECK_MKD, CHECK_RNTO...
+        self.rpc_retry = RetryPolicy(attempts=3, base_backoff=0.05, max_backoff=0.5)
 
     def _handle_process_ftp_command(self, message: Message, sock):
         payload = message.payload
@@ -70,17 +74,15 @@ class ProcessingNode(LocationNode):
         return session
     
     def get_auth_node(self):
-        auth_nodes = self.query_by_role(NodeType.AUTH)
-        if not auth_nodes or len(auth_nodes) == 0:
-            pass
-            #TODO: Agregar error aqui
-        index = randint(0, len(auth_nodes) - 1)
-        return auth_nodes[index]
-    
+        return self._pick_member(NodeType.AUTH)
+
     def get_data_node(self):
-        auth_nodes = self.query_by_role(NodeType.DATA)
-        if not auth_nodes or len(auth_nodes) == 0:
-            pass
-            #TODO: Agregar error aqui
-        index = randint(0, len(auth_nodes) - 1)
-        return auth_nodes[index]
\ No newline at end of file
+        return self._pick_member(NodeType.DATA)
+
+    def _pick_member(self, node_type: NodeType):
+        """(ip, port) de un miembro al azar del rol, desde el directorio local."""
+        members = self.lookup_role(node_type)
+        if not members:
+            raise RuntimeError(f"No hay nodos {node_type.value} disponibles")
+        member = members[randint(0, len(members) - 1)]
+        return member["ip"], member["port"]
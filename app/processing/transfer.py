@@ -0,0 +1,25 @@
+import logging
+from comm.message import Message
+
+logger = logging.getLogger("dftp.processing.transfer")
+
+# La respuesta del DataNode a DATA_RETR/DATA_STOR llega al terminar la transferencia por el canal PASV
+TRANSFER_TIMEOUT = 300.0
+
+
+def start_transfer(processing_node, data_node_ip: str, data_node_port: int, msg: Message):
+    """
+    Pide la transferencia al DataNode sin bloquear el comando FTP. Va por una conexión propia
+    (send_transfer_async): mientras dura no ocupa las conexiones del pool con ese DataNode que
+    necesitan los CHECK_* y DATA_LIST de otras sesiones.
+    """
+    type = msg.header.get("type")
+    processing_node.send_transfer_async(data_node_ip, data_node_port, msg, timeout=TRANSFER_TIMEOUT,
+                                        callback=lambda response: _log_transfer_result(type, response))
+
+
+def _log_transfer_result(type: str, response: Message | None):
+    if response is None:
+        logger.warning("%s: sin respuesta del DataNode", type)
+    elif response.payload.get("status") != "OK":
+        logger.warning("%s falló: %s", type, response.payload.get("msg"))
@@ -148,13 +148,13 @@ class RoutingNode(LocationNode):
         msg = Message(
             type="PROCESS_FTP_COMMAND",
             src=self.ip,
-            dst=processing_node.ip,
+            dst=processing_node["ip"],
             payload=payload,
         )
 
         resp = self.send_message(
-            processing_node.ip,
-            processing_node.port,
+            processing_node["ip"],
+            processing_node["port"],
             msg,
             await_response=True,
             timeout=5.0,
@@ -185,10 +185,7 @@ class RoutingNode(LocationNode):
     # ------------------------------------------------------------------ #
 
     def _select_processing_node(self):
-        resp = self.query_by_role(NodeType.PROCESSING)
-        if not resp or not resp.payload:
-            return None
-        nodes = resp.payload.get("nodes", [])
+        nodes = self.lookup_role(NodeType.PROCESSING)
         if not nodes:
             return None
         return nodes[0]
@@ -9,7 +9,8 @@ logging.basicConfig(
 
 from .message import Message
 from .tcp_server import TCPServer
+from .async_tcp_server import AsyncTCPServer
 from .tcp_client import TCPClient
 from .communication_node import CommunicationNode
 
-__all__ = ["Message", "TCPServer", "TCPClient", "CommunicationNode"]
\ No newline at end of file
+__all__ = ["Message", "TCPServer", "AsyncTCPServer", "TCPClient", "CommunicationNode"]
\ No newline at end of file
@@ -0,0 +1,288 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from comm import Message
+from comm.codec import DEFAULT_CODEC, HELLO_TYPE, HELLO_RESPONSE_TYPE, choose_codec
+from comm.compression import choose_compression, compress_frame
+from comm.deadline import on_arrival
+from comm.framing import FrameReader
+from comm.local_transport import bind_unix_socket, remove_unix_socket
+from comm.streaming import is_stream, stream_messages
+from comm.worker_pool import WorkerPoolBusy
+
+logger = logging.getLogger("dftp.comm.async_tcp_server")
+
+# Pausa entre intentos de encolar el siguiente chunk de un stream con el pool lleno
+STREAM_BUSY_RETRY = 0.01
+
+
+def _next_chunk(msg: Message, messages):
+    """Siguiente mensaje del stream (None al terminar); msg solo elige el carril del pool."""
+    return next(messages, None)
+
+
+class _ServerProtocol(asyncio.Protocol):
+    """Una instancia por conexión aceptada; trocea tramas y despacha mensajes."""
+
+    def __init__(self, server: "AsyncTCPServer"):
+        self.server = server
+        self.transport = None
+        self.addr = None
+        self.reader = FrameReader()
+        self.compression = None  # algoritmo acordado en COMM_HELLO para las respuestas
+        # Las peticiones no multiplexadas se atienden en orden, como en TCPServer
+        self.serial_lock = asyncio.Lock()
+        # Control de flujo de los streams: el transporte lo limpia cuando su buffer de envío se llena
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info("peername")
+        self.server._connections.add(self)
+        logger.debug("Conexión aceptada: %s", self.addr)
+
+    def connection_lost(self, exc):
+        self.server._connections.discard(self)
+        self.writable.set()
+        logger.debug("Cliente %s desconectado", self.addr)
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def data_received(self, data: bytes):
+        self.reader.feed(data)
+        try:
+            frames = list(iter(self.reader.next_frame, None))
+        except ValueError:
+            logger.exception("Trama inválida de %s, cerrando conexión", self.addr)
+            self.transport.close()
+            return
+
+        for codec, body in frames:
+            try:
+                msg = codec.decode(body)
+            except Exception:
+                logger.exception("Error parseando mensaje de %s", self.addr)
+                continue
+            on_arrival(msg)
+            if self.server.metrics is not None:
+                self.server.metrics.observe("server", msg.header.get("type"), "request_bytes", len(body))
+
+            if msg.header.get("type") == HELLO_TYPE:
+                self.compression = choose_compression(msg.payload.get("compression"))
+                response = Message(type=HELLO_RESPONSE_TYPE, src=self.server.ip, dst=msg.header.get("src"),
+                                   payload={"codec": choose_codec(msg), "compression": self.compression})
+                self.transport.write(DEFAULT_CODEC.encode(response))
+            else:
+                self.server._loop.create_task(self._dispatch(msg, codec))
+
+    async def _dispatch(self, msg: Message, codec):
+        if msg.metadata.get("mux"):
+            await self._respond(msg, codec)
+        else:
+            async with self.serial_lock:
+                await self._respond(msg, codec)
+
+    async def _respond(self, msg: Message, codec):
+        response = await self.server._run_handler(msg, self.transport)
+        if is_stream(response):
+            await self._stream(msg, codec, response)
+        elif response and not self.transport.is_closing():
+            logger.debug("Enviando respuesta a %s: %s", self.addr, response.header.get("type"))
+            self._write(msg, codec, response)
+
+    async def _stream(self, msg: Message, codec, chunks):
+        """
+        Envía la respuesta en streaming. Cada chunk se genera en el pool de handlers del servidor
+        (el handler puede bloquear) y no se pide el siguiente mientras el buffer del transporte
+        esté lleno.
+        """
+        messages = stream_messages(self.server.ip, msg, chunks)
+        pending = None
+        try:
+            while True:
+                pending = await self.server._submit_next(msg, messages)
+                chunk = await asyncio.wrap_future(pending)
+                if chunk is None or self.transport.is_closing():
+                    break
+                self._write(msg, codec, chunk)
+                await self.writable.wait()
+        finally:
+            if pending is not None and not pending.done():
+                # Cancelado mientras el handler generaba un chunk en otro hilo: se cierra al acabar
+                pending.add_done_callback(lambda _: messages.close())
+            else:
+                messages.close()
+
+    def _write(self, msg: Message, codec, response: Message):
+        msg_id = msg.metadata.get("msg_id")
+        if msg_id is not None:
+            response.metadata["reply_to"] = msg_id
+        data = compress_frame(codec.encode(response), self.compression, metrics=self.server.metrics, side="server", type=msg.header.get("type"))
+        if self.server.metrics is not None:
+            self.server.metrics.observe("server", msg.header.get("type"), "response_bytes", len(data))
+        self.transport.write(data)
+
+
+class AsyncTCPServer:
+    """
+    Servidor TCP basado en asyncio: un único hilo con el event loop atiende todas las
+    conexiones (sin hilo por conexión ni polling de recv cada 0.5 s) y los handlers
+    síncronos se ejecutan en un pool acotado de max_workers hilos.
+
+    Expone la misma API que TCPServer: on_message(Message, sock) -> Message | None.
+    """
+
+    def __init__(self, ip: str, port: int, on_message, max_workers: int = 16, executor=None, on_busy=None, metrics=None,
+                 uds_path: str = None):
+        """
+        ip: dirección del servidor
+        port: puerto del servidor
+        on_message: callback que recibe Message y socket cliente
+                    debe devolver un objeto Message como respuesta, o None
+                    (o un iterador de chunks para responder en streaming, ver comm.streaming)
+        max_workers: hilos del pool donde se ejecutan los handlers
+        executor: pool externo para los handlers (p.ej. el WorkerPool del nodo); si se pasa
+                  se ignora max_workers y el servidor no lo detiene
+        on_busy: callback(Message) -> Message para contestar cuando executor rechaza la tarea
+        metrics: comm.metrics.Metrics donde registrar tamaños, espera en cola y tiempo de handler por tipo
+        uds_path: si se indica, escucha además en ese Unix domain socket (nodos del mismo host)
+        """
+        self.ip = ip
+        self.port = port
+        self.on_message = on_message
+        self.max_workers = max_workers
+        self.on_busy = on_busy
+        self.metrics = metrics
+        self.uds_path = uds_path
+        self._own_executor = executor is None
+        self.running = False
+        self.server_thread = None
+
+        self._loop = None
+        self._server = None
+        self._uds_server = None
+        self._executor = executor
+        self._connections: set[_ServerProtocol] = set()
+        self._started = threading.Event()
+        self._start_error = None
+
+    # ---------------- Métodos públicos ----------------
+    def start(self):
+        """Inicia el event loop en un hilo independiente y espera a que el puerto esté escuchando."""
+        if self.running:
+            return
+        self._started.clear()
+        self._start_error = None
+        if self._own_executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"handler-{self.port}")
+        self.server_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.server_thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise self._start_error
+        self.running = True
+
+    def stop(self):
+        """Detiene el servidor y aborta las conexiones abiertas."""
+        if not self.running:
+            return
+        self.running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self.server_thread and self.server_thread is not threading.current_thread():
+            self.server_thread.join(timeout=1.0)
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+        logger.info("AsyncTCPServer detenido")
+
+    # ---------------- Métodos internos ----------------
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                self._loop.create_server(lambda: _ServerProtocol(self), self.ip, self.port, reuse_address=True, backlog=128)
+            )
+            if self.uds_path:
+                self._uds_server = self._loop.run_until_complete(
+                    self._loop.create_unix_server(lambda: _ServerProtocol(self), sock=self._unix_listener(), backlog=128)
+                )
+        except Exception as e:
+            self._start_error = e
+            if self._server is not None:
+                self._server.close()
+            self._started.set()
+            self._loop.close()
+            return
+
+        self._started.set()
+        logger.debug("AsyncTCPServer escuchando en %s:%s", self.ip, self.port)
+        try:
+            self._loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    def _shutdown(self):
+        """Se ejecuta en el hilo del loop: cierra el socket de escucha y aborta los clientes."""
+        self._server.close()
+        if self._uds_server is not None:
+            self._uds_server.close()
+            self._uds_server = None
+            remove_unix_socket(self.uds_path)
+        for conn in list(self._connections):
+            # Cierre abortivo para no dejar el puerto en TIME_WAIT (igual que TCPServer)
+            conn.transport.abort()
+        self._loop.stop()
+
+    def _unix_listener(self):
+        sock = bind_unix_socket(self.uds_path)
+        sock.setblocking(False)
+        return sock
+
+    async def _run_handler(self, msg: Message, transport):
+        sock = transport.get_extra_info("socket")
+        try:
+            if self.metrics is None:
+                return await self._loop.run_in_executor(self._executor, self.on_message, msg, sock)
+            return await self._loop.run_in_executor(self._executor, self._timed_handler, msg, sock, time.perf_counter())
+        except WorkerPoolBusy:
+            if self.metrics is not None:
+                self.metrics.observe("server", msg.header.get("type"), "rejected", 1)
+            return self.on_busy(msg) if self.on_busy else None
+        except Exception:
+            logger.exception("Error procesando mensaje tipo %s", msg.header.get("type"))
+            return None
+
+    async def _submit_next(self, msg: Message, messages):
+        """
+        Encola next(messages) en el pool de handlers (el mismo carril que la petición). Si la
+        cola está llena espera turno: el stream ya empezó y no se puede contestar COMM_BUSY.
+        """
+        while True:
+            try:
+                return self._executor.submit(_next_chunk, msg, messages)
+            except WorkerPoolBusy:
+                await asyncio.sleep(STREAM_BUSY_RETRY)
+
+    def _timed_handler(self, msg: Message, sock, enqueued_at: float):
+        """Ejecuta on_message en el pool registrando espera en cola, tiempo de handler y total."""
+        started = time.perf_counter()
+        type = msg.header.get("type")
+        try:
+            return self.on_message(msg, sock)
+        finally:
+            finished = time.perf_counter()
+            self.metrics.observe("server", type, "queue_us", started - enqueued_at)
+            self.metrics.observe("server", type, "handler_us", finished - started)
+            self.metrics.observe("server", type, "total_us", finished - enqueued_at)
@@ -0,0 +1,52 @@
+import logging
+from comm import Message
+
+logger = logging.getLogger("dftp.comm.batch")
+
+# Sobre que transporta N mensajes en una sola trama; la respuesta lleva N respuestas en el mismo orden
+BATCH_TYPE = "COMM_BATCH"
+BATCH_RESPONSE_TYPE = "COMM_BATCH_RESPONSE"
+
+
+def _pack(message: Message | None):
+    if message is None:
+        return None
+    return {"header": message.header, "payload": message.payload, "metadata": message.metadata}
+
+
+def _unpack(data: dict | None) -> Message | None:
+    if data is None:
+        return None
+    header = data["header"]
+    header.setdefault("dst", None)
+    return Message.from_parts(header, data.get("payload"), data.get("metadata"))
+
+
+def batch_message(src: str, dst: str, messages: list[Message]) -> Message:
+    """Empaqueta varios mensajes hacia un mismo destino en un único COMM_BATCH."""
+    return Message(type=BATCH_TYPE, src=src, dst=dst, payload={"messages": [_pack(m) for m in messages]})
+
+
+def batch_response(src: str, request: Message, responses: list[Message | None]) -> Message:
+    """Respuesta a un COMM_BATCH: una entrada por sub-mensaje (null si no hubo respuesta)."""
+    return Message(type=BATCH_RESPONSE_TYPE, src=src, dst=request.header.get("src"),
+                   payload={"responses": [_pack(r) for r in responses]})
+
+
+def unpack_batch(message: Message) -> list[Message]:
+    """Sub-mensajes de un COMM_BATCH."""
+    return [_unpack(m) for m in message.payload.get("messages", [])]
+
+
+def unpack_batch_response(response: Message | None, count: int) -> list[Message | None]:
+    """
+    Respuestas de un COMM_BATCH_RESPONSE, alineadas con los count mensajes enviados.
+    Si no llegó un COMM_BATCH_RESPONSE válido (timeout, COMM_BUSY...) todas son None.
+    """
+    if response is None or response.header.get("type") != BATCH_RESPONSE_TYPE:
+        return [None] * count
+    responses = [_unpack(r) for r in response.payload.get("responses", [])]
+    if len(responses) != count:
+        logger.warning("COMM_BATCH_RESPONSE con %d respuestas para %d mensajes", len(responses), count)
+        responses = (responses + [None] * count)[:count]
+    return responses
@@ -0,0 +1,203 @@
+import ipaddress
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import logging
+
+logger = logging.getLogger("dftp.comm.beacon")
+
+# Configuración por entorno (leída al crear cada nodo):
+# DISCOVERY_BEACON: "broadcast" (por defecto, a la dirección de broadcast de DISCOVERY_SUBNET),
+#                   "multicast" (al grupo DISCOVERY_BEACON_GROUP) u "off" (solo barrido TCP)
+# DISCOVERY_BEACON_PORT: puerto UDP de los beacons
+# DISCOVERY_BEACON_INTERVAL: segundos entre beacons de cada DiscoveryNode
+DEFAULT_PORT = 9101
+DEFAULT_GROUP = "239.255.70.84"
+DEFAULT_INTERVAL = 1.0
+MAX_DATAGRAM = 8192
+
+
+def beacon_mode() -> str:
+    mode = os.getenv("DISCOVERY_BEACON", "broadcast").lower()
+    if mode not in ("broadcast", "multicast", "off"):
+        raise ValueError(f"DISCOVERY_BEACON inválido '{mode}'. Esperado 'broadcast', 'multicast' u 'off'")
+    return mode
+
+
+def beacon_port() -> int:
+    return int(os.getenv("DISCOVERY_BEACON_PORT", str(DEFAULT_PORT)))
+
+
+def beacon_interval() -> float:
+    return float(os.getenv("DISCOVERY_BEACON_INTERVAL", str(DEFAULT_INTERVAL)))
+
+
+def beacon_address(subnet: str, mode: str = None) -> str | None:
+    """Destino de los beacons según el modo: grupo multicast, broadcast de la subred o None si están desactivados."""
+    mode = mode or beacon_mode()
+    if mode == "multicast":
+        return os.getenv("DISCOVERY_BEACON_GROUP", DEFAULT_GROUP)
+    if mode == "broadcast":
+        return str(ipaddress.ip_network(subnet, strict=False).broadcast_address)
+    return None
+
+
+class BeaconSender:
+    """
+    Anuncia periódicamente un datagrama UDP (JSON) con los datos de contacto del nodo.
+    Un beacon por intervalo sustituye al barrido TCP de toda la subred: quien escucha
+    sabe a qué direcciones mandar sus heartbeats.
+    """
+
+    def __init__(self, address: str, port: int, payload_fn, interval: float = DEFAULT_INTERVAL):
+        """
+        address: grupo multicast o dirección de broadcast de destino
+        port: puerto UDP de destino
+        payload_fn: callable() -> dict con el contenido de cada beacon (se evalúa en cada envío)
+        interval: segundos entre beacons
+        """
+        self.address = address
+        self.port = port
+        self.payload_fn = payload_fn
+        self.interval = interval
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if ipaddress.ip_address(address).is_multicast:
+            # Solo la red local; el bucle local permite que otros nodos del host lo reciban
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        else:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._sock.close()
+
+    def send_once(self):
+        data = json.dumps(self.payload_fn()).encode()
+        self._sock.sendto(data, (self.address, self.port))
+        self.sent += 1
+
+    def _loop(self):
+        logger.debug("Enviando beacons a %s:%s cada %ss", self.address, self.port, self.interval)
+        while not self._stop.is_set():
+            try:
+                self.send_once()
+            except OSError:
+                logger.debug("No se pudo enviar beacon a %s:%s", self.address, self.port, exc_info=True)
+            self._stop.wait(self.interval)
+
+
+class BeaconListener:
+    """
+    Escucha los beacons en el puerto UDP y recuerda, por nombre, la ip y el momento del
+    último beacon de cada emisor. Varios listeners del mismo host comparten el puerto.
+    """
+
+    def __init__(self, port: int, group: str = None, accept=None, ignore: str = None):
+        """
+        port: puerto UDP donde escuchar
+        group: grupo multicast al que unirse (None para broadcast)
+        accept: callable(dict) -> bool para filtrar beacons (p.ej. por rol)
+        ignore: nombre propio de quien escucha y también emite; su beacon le vuelve por el
+                bucle local y no demuestra que la red entregue los de los demás
+        """
+        self.port = port
+        self.group = group
+        self.accept = accept
+        self.ignore = ignore
+        self.received = 0
+        self.started_at = time.monotonic()
+        self._seen: dict[str, tuple[str, dict, float]] = {}  # name -> (ip, payload, instante)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # SO_REUSEADDR (y no SO_REUSEPORT, que reparte los datagramas): todos reciben cada beacon
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("", port))
+        if group:
+            mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton("0.0.0.0"))
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        self._sock.settimeout(0.5)
+
+    @property
+    def heard_any(self) -> bool:
+        """Se recibió al menos un beacon válido: la red entrega los datagramas."""
+        return self.received > 0
+
+    def scan_needed(self, grace: float) -> bool:
+        """
+        Pasados grace segundos desde que empezó a escuchar, ningún emisor mandó un beacon en
+        los últimos grace segundos: la red no los entrega (o no hay, o ya no quedan, emisores)
+        y quien escucha debe volver al barrido de la subred.
+        """
+        return time.monotonic() - self.started_at > grace and not self.alive(grace)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._sock.close()
+
+    def alive(self, max_age: float) -> dict[str, str]:
+        """name -> ip de los emisores de los que llegó un beacon en los últimos max_age segundos."""
+        now = time.monotonic()
+        with self._lock:
+            return {name: ip for name, (ip, _, seen) in self._seen.items() if now - seen <= max_age}
+
+    def payloads(self, max_age: float) -> list[dict]:
+        """Contenido del último beacon de cada emisor vivo."""
+        now = time.monotonic()
+        with self._lock:
+            return [payload for _, payload, seen in self._seen.values() if now - seen <= max_age]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self._sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    break
+                logger.debug("Error recibiendo beacon", exc_info=True)
+                continue
+            self._handle(data, addr)
+
+    def _handle(self, data: bytes, addr):
+        try:
+            payload = json.loads(data)
+            name = payload["name"]
+            ip = payload.get("ip") or addr[0]
+        except (ValueError, KeyError, TypeError):
+            logger.debug("Beacon inválido de %s", addr)
+            return
+        if name == self.ignore:
+            return
+        if self.accept is not None and not self.accept(payload):
+            return
+        with self._lock:
+            self._seen[name] = (ip, payload, time.monotonic())
+        self.received += 1
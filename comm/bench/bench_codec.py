@@ -0,0 +1,81 @@
+"""
+Benchmark del coste de serialización de Message por codec.
+
+Mide codificar + decodificar los mensajes de las rutas calientes (heartbeat y consultas
+a discovery) con el codec JSON por línea y con el binario con prefijo de longitud.
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_codec.py [--iterations 20000] [--nodes 50] [--json]
+"""
+import argparse
+import json
+import time
+
+from comm import Message
+from comm.codec import CODECS
+from comm.framing import FrameReader
+
+
+def sample_messages(nodes: int) -> dict[str, Message]:
+    """Mensajes representativos de heartbeat y consultas a discovery."""
+    node_list = [
+        {"name": f"node{i}", "ip": f"10.0.0.{i % 250 + 2}", "type": "DATA", "last_heartbeat": 1700000000.0 + i}
+        for i in range(nodes)
+    ]
+    return {
+        "heartbeat": Message(type="DISCOVERY_HEARTBEAT", src="10.0.0.5", dst="10.0.0.2",
+                             payload={"name": "processing1", "ip": "10.0.0.5", "role": "PROCESSING"}),
+        "heartbeat_response": Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src="10.0.0.2", dst="10.0.0.5",
+                                      payload={"status": "OK", "ip": "10.0.0.2", "name": "discovery1"}),
+        "query_by_role": Message(type="DISCOVERY_QUERY_BY_ROLE", src="10.0.0.5", dst="10.0.0.2",
+                                 payload={"role": "DATA"}),
+        "query_by_role_response": Message(type="DISCOVERY_QUERY_BY_ROLE_RESPONSE", src="10.0.0.2", dst="10.0.0.5",
+                                          payload={"status": "OK", "ips": [n["ip"] for n in node_list]}),
+        "query_all_response": Message(type="DISCOVERY_QUERY_ALL_RESPONSE", src="10.0.0.2", dst="10.0.0.5",
+                                      payload={"status": "OK", "nodes": node_list}),
+    }
+
+
+def bench(codec, message: Message, iterations: int) -> dict:
+    """Devuelve tiempo medio de encode/decode (µs) y tamaño en bytes de la trama."""
+    frame = codec.encode(message)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    reader = FrameReader()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        reader.feed(frame)
+        frame_codec, body = reader.next_frame()
+        frame_codec.decode(body)
+    decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+    return {"bytes": len(frame), "encode_us": round(encode_us, 3), "decode_us": round(decode_us, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000, help="Repeticiones por mensaje y codec")
+    parser.add_argument("--nodes", type=int, default=50, help="Nodos en las respuestas de consulta")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for name, message in sample_messages(args.nodes).items():
+        results[name] = {codec_name: bench(codec, message, args.iterations) for codec_name, codec in CODECS.items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mensaje':<24} {'codec':<6} {'bytes':>7} {'encode µs':>10} {'decode µs':>10}")
+    for name, by_codec in results.items():
+        for codec_name, r in by_codec.items():
+            print(f"{name:<24} {codec_name:<6} {r['bytes']:>7} {r['encode_us']:>10.2f} {r['decode_us']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
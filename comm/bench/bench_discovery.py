@@ -0,0 +1,155 @@
+"""
+Coste del descubrimiento de DiscoveryNodes: barrido TCP de la subred frente a beacons UDP.
+
+Levanta en loopback un DiscoveryNode (127.0.0.2) y un LocationNode (127.0.0.1) con
+heartbeat_interval segundos entre rondas, primero con DISCOVERY_BEACON=off (cada ronda
+sondea las ips de --subnet y manda heartbeat a las que tienen el puerto abierto) y después
+con beacons (la ronda solo contacta a las ips anunciadas). Informa del tiempo hasta
+encontrar el DiscoveryNode, de los heartbeats TCP por segundo, de la duración media de
+cada ronda y del tiempo de CPU.
+
+En loopback una ip vacía rechaza la conexión al instante; en una red real cada ip vacía
+cuesta hasta discovery_timeout (0.8 s), así que el barrido es más caro de lo que se mide aquí.
+
+Con --sweep-subnet compara además, sobre esa subred, un barrido con connects bloqueantes
+en un pool de 32 hilos (el de antes) y el de ConnectProber (no bloqueante, un hilo).
+Conviene una subred sin hosts que no rechace conexiones (p.ej. la del interfaz de red).
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_discovery.py [--subnet 127.0.0.0/24] [--duration 10]
+        [--heartbeat-interval 2] [--beacon multicast|broadcast] [--sweep-subnet 192.168.1.0/24]
+        [--sweep-timeout 0.8] [--json]
+"""
+import argparse
+import concurrent.futures
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from app.discovery import DiscoveryNode, NodeType
+from comm.prober import ConnectProber
+from location.location_node import LocationNode
+
+
+def run_mode(mode: str, args, port: int) -> dict:
+    os.environ["DISCOVERY_SUBNET"] = args.subnet
+    os.environ["DISCOVERY_BEACON"] = mode
+    os.environ["DISCOVERY_BEACON_PORT"] = str(args.beacon_port)
+    os.environ["MEMBERSHIP_CACHE_DIR"] = ""  # siempre en frío
+
+    probes = []
+    rounds = []
+    lock = threading.Lock()
+    probe = LocationNode._probe_heartbeat_ip
+    find = LocationNode._find_discovery_nodes_in_parallel
+
+    def counted_probe(self, ip_addr):
+        with lock:
+            probes.append(ip_addr)
+        return probe(self, ip_addr)
+
+    def timed_find(self, ips=None):
+        begin = time.perf_counter()
+        try:
+            return find(self, ips)
+        finally:
+            rounds.append(time.perf_counter() - begin)
+
+    LocationNode._probe_heartbeat_ip = counted_probe
+    LocationNode._find_discovery_nodes_in_parallel = timed_find
+    discovery = DiscoveryNode("bench-discovery", "127.0.0.2", port)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    location = LocationNode("bench-location", "127.0.0.1", port + 1, discovery_port=port,
+                            heartbeat_interval=args.heartbeat_interval, node_type=NodeType.DATA)
+    try:
+        discovered_at = None
+        while time.perf_counter() - start < args.duration:
+            if discovered_at is None and location.discovery_nodes:
+                discovered_at = time.perf_counter() - start
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+    finally:
+        location.stop_server()
+        discovery.stop_server()
+        LocationNode._probe_heartbeat_ip = probe
+        LocationNode._find_discovery_nodes_in_parallel = find
+
+    return {
+        "time_to_discover_s": round(discovered_at, 3) if discovered_at is not None else None,
+        "rounds": len(rounds),
+        "tcp_heartbeats": len(probes),
+        "tcp_heartbeats_per_sec": round(len(probes) / elapsed, 1),
+        "mean_round_ms": round(sum(rounds) / len(rounds) * 1e3, 2) if rounds else 0.0,
+        "udp_beacons_per_sec": round(1 / float(os.getenv("DISCOVERY_BEACON_INTERVAL", "1")), 1) if mode != "off" else 0,
+        "cpu_s": round(cpu, 3),
+    }
+
+
+def run_sweep(subnet: str, port: int, timeout: float) -> dict:
+    """Duración de un barrido completo de subnet con el pool de connects bloqueantes y con ConnectProber."""
+    ips = [str(ip) for ip in ipaddress.ip_network(subnet, strict=False).hosts()]
+
+    def blocking_connect(ip):
+        try:
+            socket.create_connection((ip, port), timeout=timeout).close()
+            return ip
+        except OSError:
+            return None
+
+    begin = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=32) as ex:
+        threaded_open = [ip for ip in ex.map(blocking_connect, ips) if ip]
+    threaded = time.perf_counter() - begin
+
+    prober = ConnectProber(timeout=timeout)
+    begin = time.perf_counter()
+    prober_open = prober.probe(ips, port)
+    selector = time.perf_counter() - begin
+    return {"addresses": len(ips), "threaded_s": round(threaded, 3), "threaded_open": len(threaded_open),
+            "prober_s": round(selector, 3), "prober_open": len(prober_open)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subnet", default="127.0.0.0/24", help="DISCOVERY_SUBNET a barrer")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por modo")
+    parser.add_argument("--heartbeat-interval", type=float, default=2.0, help="Segundos entre rondas de heartbeat")
+    parser.add_argument("--beacon", default="multicast", choices=["multicast", "broadcast"],
+                        help="Modo de beacon (en loopback el broadcast solo llega con una subred /8)")
+    parser.add_argument("--base-port", type=int, default=9650, help="Puertos TCP de los nodos")
+    parser.add_argument("--beacon-port", type=int, default=9660, help="Puerto UDP de los beacons")
+    parser.add_argument("--sweep-subnet", help="Subred donde comparar el barrido con hilos y con ConnectProber")
+    parser.add_argument("--sweep-timeout", type=float, default=0.8, help="Timeout de connect del barrido")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {"config": vars(args), "modes": {}}
+    results["modes"]["scan"] = run_mode("off", args, args.base_port)
+    results["modes"]["beacon"] = run_mode(args.beacon, args, args.base_port + 2)
+    if args.sweep_subnet:
+        results["sweep"] = run_sweep(args.sweep_subnet, args.base_port, args.sweep_timeout)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'modo':>8} {'descubre s':>11} {'rondas':>7} {'hb TCP':>8} {'hb/s':>7} {'ronda ms':>9} {'CPU s':>7}")
+    for mode, r in results["modes"].items():
+        print(f"{mode:>8} {str(r['time_to_discover_s']):>11} {r['rounds']:>7} {r['tcp_heartbeats']:>8} "
+              f"{r['tcp_heartbeats_per_sec']:>7} {r['mean_round_ms']:>9} {r['cpu_s']:>7}")
+    if "sweep" in results:
+        r = results["sweep"]
+        print(f"\nbarrido de {r['addresses']} ips: pool de 32 hilos {r['threaded_s']} s ({r['threaded_open']} abiertas), "
+              f"ConnectProber {r['prober_s']} s ({r['prober_open']} abiertas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Microbenchmark de recepción y troceado de tramas.
+
+Compara el bucle original (recv(1024) + concatenar bytes + volver a buscar en todo el
+buffer) con FrameReader (recv_into sobre un bytearray preasignado, búsqueda incremental
+y tamaño de lectura adaptativo) recibiendo por un socketpair mensajes de 1 KB a 10 MB.
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_framing.py [--repeat 5] [--codec json|bin2] [--json]
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+
+from comm import Message
+from comm.codec import BINARY_MAGIC, CODECS, DEFAULT_CODEC, _FRAME_HEAD
+from comm.framing import FrameReader
+
+SIZES = [1024, 16 * 1024, 256 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+
+
+def legacy_split(buffer: bytes) -> tuple[list, bytes]:
+    """Troceado anterior a FrameReader: vuelve a recorrer el buffer entero en cada llamada."""
+    frames = []
+    pos = 0
+    size = len(buffer)
+    while pos < size:
+        if buffer[pos] == BINARY_MAGIC:
+            if size - pos < _FRAME_HEAD.size:
+                break
+            _, length = _FRAME_HEAD.unpack_from(buffer, pos)
+            end = pos + _FRAME_HEAD.size + length
+            if end > size:
+                break
+            frames.append((CODECS["bin2"], buffer[pos + _FRAME_HEAD.size:end]))
+            pos = end
+        else:
+            nl = buffer.find(b"\n", pos)
+            if nl < 0:
+                break
+            if nl > pos:
+                frames.append((DEFAULT_CODEC, buffer[pos:nl]))
+            pos = nl + 1
+    return frames, buffer[pos:]
+
+
+def legacy_receive(sock) -> int:
+    """Bucle de recepción anterior a FrameReader; devuelve el número de tramas."""
+    buffer = b""
+    while True:
+        data = sock.recv(1024)
+        if not data:
+            return 0
+        buffer += data
+        frames, buffer = legacy_split(buffer)
+        if frames:
+            return len(frames)
+
+
+def reader_receive(sock) -> int:
+    reader = FrameReader()
+    while True:
+        if not reader.recv_from(sock):
+            return 0
+        if reader.next_frame() is not None:
+            return 1
+
+
+def bench(receive, frame: bytes, repeat: int) -> float:
+    """Tiempo medio (ms) en recibir y trocear una trama enviada por otro hilo."""
+    total = 0.0
+    for _ in range(repeat):
+        a, b = socket.socketpair()
+        writer = threading.Thread(target=a.sendall, args=(frame,))
+        start = time.perf_counter()
+        writer.start()
+        assert receive(b) == 1
+        total += time.perf_counter() - start
+        writer.join()
+        a.close()
+        b.close()
+    return total / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por tamaño")
+    parser.add_argument("--codec", default="json", choices=sorted(CODECS), help="Codec de la trama")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    codec = CODECS[args.codec]
+    results = {}
+    for size in SIZES:
+        frame = codec.encode(Message(type="DATA_RETR_RESPONSE", src="10.0.0.2", payload={"data": "x" * size}))
+        legacy = bench(legacy_receive, frame, args.repeat)
+        reader = bench(reader_receive, frame, args.repeat)
+        results[size] = {"legacy_ms": round(legacy, 3), "frame_reader_ms": round(reader, 3),
+                         "speedup": round(legacy / reader, 2) if reader else None}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tamaño':>10} {'legacy ms':>11} {'reader ms':>11} {'speedup':>8}")
+    for size, r in results.items():
+        print(f"{size:>10} {r['legacy_ms']:>11.3f} {r['frame_reader_ms']:>11.3f} {r['speedup']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del coste de crear y serializar Message en el bucle de heartbeat.
+
+Reproduce lo que hace LocationNode._probe_heartbeat_ip por cada IP de la subred:
+construir un DISCOVERY_HEARTBEAT, codificarlo y decodificar la respuesta. Mide CPU por
+sonda y memoria retenida por Message.
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_message.py [--ips 254] [--rounds 200] [--json]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from comm import Message
+from comm.codec import CODECS
+
+
+def probe(ip_addr: str, codec, response_frame: bytes):
+    """Una sonda de heartbeat sin red: mensaje, trama y respuesta decodificada."""
+    payload = {"name": "processing1", "ip": "10.0.0.5", "role": "PROCESSING"}
+    msg = Message(type="DISCOVERY_HEARTBEAT", src="10.0.0.5", dst=ip_addr, payload=payload)
+    codec.encode(msg)
+    return codec.decode(response_frame)
+
+
+def bench(codec, ips: list[str], rounds: int) -> dict:
+    response = Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src="10.0.0.2", dst="10.0.0.5",
+                       payload={"status": "OK", "ip": "10.0.0.2", "name": "discovery1"})
+    frame = codec.encode(response)
+    # El decode recibe el cuerpo sin delimitador/cabecera de trama
+    body = frame[:-1] if codec.name == "json" else frame[5:]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for ip in ips:
+            probe(ip, codec, body)
+    probe_us = (time.perf_counter() - start) / (rounds * len(ips)) * 1e6
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [Message(type="DISCOVERY_HEARTBEAT", src="10.0.0.5", dst=ip, payload={"name": "p"}) for ip in ips]
+    for m in kept:
+        codec.encode(m)
+    per_msg = (tracemalloc.get_traced_memory()[0] - base) / len(kept)
+    tracemalloc.stop()
+
+    return {"probe_us": round(probe_us, 3), "bytes_per_message": round(per_msg, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ips", type=int, default=254, help="IPs sondeadas por ronda")
+    parser.add_argument("--rounds", type=int, default=200, help="Rondas de heartbeat")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    ips = [f"10.0.0.{i % 254 + 1}" for i in range(args.ips)]
+    start = time.perf_counter()
+    for _ in range(20000):
+        Message.new_id()
+    new_id_us = (time.perf_counter() - start) / 20000 * 1e6
+
+    results = {"new_id_us": round(new_id_us, 3)}
+    for name, codec in CODECS.items():
+        results[name] = bench(codec, ips, args.rounds)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"new_id: {results['new_id_us']:.3f} µs")
+    print(f"{'codec':<6} {'µs/sonda':>10} {'bytes/Message':>14}")
+    for name in CODECS:
+        r = results[name]
+        print(f"{name:<6} {r['probe_us']:>10.3f} {r['bytes_per_message']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de transporte entre nodos del mismo host.
+
+Mide la latencia de ida y vuelta (PING -> PONG por una conexión persistente del pool)
+contra un TCPServer que corre en otro proceso, hablando por TCP loopback y por Unix domain
+socket, con payloads pequeños y grandes.
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_transport.py [--requests 2000] [--port 9590] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+
+from comm import Message, TCPClient, TCPServer
+from comm.local_transport import uds_path_for
+
+SIZES = [64, 4 * 1024, 256 * 1024]
+
+
+def bench(client: TCPClient, port: int, size: int, requests: int) -> dict:
+    msg = Message(type="PING", src="bench", payload={"data": "x" * size})
+    client.send_message("127.0.0.1", port, msg)  # abre y negocia la conexión
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        assert client.send_message("127.0.0.1", port, msg) is not None
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+            "p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 1)}
+
+
+def serve(port: int, path: str, ready, stop):
+    server = TCPServer("127.0.0.1", port, lambda m, s: Message(type="PONG", src="server", payload=m.payload),
+                       uds_path=path)
+    server.start()
+    ready.set()
+    stop.wait()
+    server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por tamaño y transporte")
+    parser.add_argument("--port", type=int, default=9590, help="Puerto del servidor de prueba")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = uds_path_for("127.0.0.1", args.port, tmp)
+        ready, stop = multiprocessing.Event(), multiprocessing.Event()
+        server = multiprocessing.Process(target=serve, args=(args.port, path, ready, stop), daemon=True)
+        server.start()
+        ready.wait()
+        results = {}
+        try:
+            for size in SIZES:
+                tcp_client = TCPClient(max_connections_per_peer=1, compression=None)
+                uds_client = TCPClient(max_connections_per_peer=1, compression=None)
+                uds_client.register_local_endpoint("127.0.0.1", args.port, path)
+                try:
+                    tcp = bench(tcp_client, args.port, size, args.requests)
+                    uds = bench(uds_client, args.port, size, args.requests)
+                finally:
+                    tcp_client.close()
+                    uds_client.close()
+                results[size] = {"tcp": tcp, "uds": uds,
+                                 "p50_speedup": round(tcp["p50_us"] / uds["p50_us"], 2) if uds["p50_us"] else None}
+        finally:
+            stop.set()
+            server.join(timeout=5)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tamaño':>8} {'tcp p50':>9} {'tcp p99':>9} {'uds p50':>9} {'uds p99':>9} {'speedup':>8}")
+    for size, r in results.items():
+        print(f"{size:>8} {r['tcp']['p50_us']:>9} {r['tcp']['p99_us']:>9} "
+              f"{r['uds']['p50_us']:>9} {r['uds']['p99_us']:>9} {r['p50_speedup']:>8}")
+
+if __name__ == "__main__":
+    main()
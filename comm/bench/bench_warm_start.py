@@ -0,0 +1,83 @@
+"""
+Tiempo desde que arranca un LocationNode hasta que puede resolver un rol (lo primero que
+hace un RoutingNode o ProcessingNode al atender un comando FTP), en frío y en caliente.
+
+Levanta en loopback un DiscoveryNode (127.0.0.2) y, --runs veces, un LocationNode
+(127.0.0.1) que consulta query_by_role en bucle hasta obtener respuesta: primero sin
+fichero de membresía (frío) y luego reiniciándolo con el fichero que guardó (caliente).
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/bench_warm_start.py [--runs 5] [--beacon multicast|off] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from app.discovery import DiscoveryNode, NodeType
+from location.location_node import LocationNode
+from location.membership_cache import cache_path_for
+
+
+def time_to_first_answer(port: int, discovery_port: int, timeout: float = 15.0) -> float | None:
+    start = time.perf_counter()
+    node = LocationNode("bench-warm", "127.0.0.1", port, discovery_port=discovery_port, heartbeat_interval=0.2,
+                        node_type=NodeType.PROCESSING)
+    try:
+        while time.perf_counter() - start < timeout:
+            response = node.query_by_role(NodeType.DATA)
+            if response is not None and response.payload.get("status") == "OK":
+                elapsed = time.perf_counter() - start
+                # Deja que el heartbeat registre el nodo y guarde la membresía para el siguiente arranque
+                time.sleep(0.5)
+                return elapsed
+            time.sleep(0.005)
+        return None
+    finally:
+        node.stop_server()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="Arranques medidos por modo")
+    parser.add_argument("--beacon", default="multicast", choices=["multicast", "off"], help="Descubrimiento en frío")
+    parser.add_argument("--subnet", default="127.0.0.0/24", help="DISCOVERY_SUBNET")
+    parser.add_argument("--base-port", type=int, default=9670, help="Puertos TCP de los nodos")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({"DISCOVERY_SUBNET": args.subnet, "DISCOVERY_BEACON": args.beacon,
+                       "DISCOVERY_BEACON_PORT": str(args.base_port + 9), "MEMBERSHIP_CACHE_DIR": tmp.name})
+
+    discovery = DiscoveryNode("bench-discovery", "127.0.0.2", args.base_port)
+    results = {"config": vars(args), "cold_s": [], "warm_s": []}
+    try:
+        for i in range(args.runs):
+            port = args.base_port + 1 + i % 4
+            path = cache_path_for("bench-warm")
+            if os.path.exists(path):
+                os.remove(path)
+            results["cold_s"].append(time_to_first_answer(port, args.base_port))
+            results["warm_s"].append(time_to_first_answer(port, args.base_port))
+    finally:
+        discovery.stop_server()
+        tmp.cleanup()
+
+    for key in ("cold_s", "warm_s"):
+        samples = sorted(s for s in results[key] if s is not None)
+        results[key.replace("_s", "_median_ms")] = round(samples[len(samples) // 2] * 1e3, 2) if samples else None
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"arranque en frío:     mediana {results['cold_median_ms']} ms")
+    print(f"arranque en caliente: mediana {results['warm_median_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
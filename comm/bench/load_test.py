@@ -0,0 +1,166 @@
+"""
+Generador de carga del camino RPC de comm.
+
+Levanta N CommunicationNode en loopback con un handler BENCH_ECHO de coste configurable
+y los bombardea desde un nodo cliente con `--concurrency` hilos, cada uno enviando
+peticiones síncronas (send_message) en bucle cerrado durante `--duration` segundos por
+tamaño de payload. Informa mensajes/segundo, errores y latencia p50/p99/p999/max.
+
+Pensado como línea base antes de cambiar el transporte y como guarda de regresión antes
+de cada despliegue: con --json (o --out fichero.json) la salida se puede comparar entre
+versiones.
+
+Uso (desde la raíz del proyecto):
+    python3 comm/bench/load_test.py [--nodes 2] [--concurrency 16] [--sizes 64,4096,65536]
+        [--handler-us 0] [--handler-mode sleep|cpu] [--duration 5] [--server-mode thread|async]
+        [--codec json|bin2] [--multiplex] [--compression zlib|none] [--json] [--out results.json]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+
+from comm import CommunicationNode, Message
+from comm.codec import CODECS
+
+BENCH_TYPE = "BENCH_ECHO"
+
+
+def make_handler(cost_us: int, mode: str):
+    """Handler que simula cost_us microsegundos de trabajo (durmiendo o quemando CPU) y hace eco."""
+    cost = cost_us / 1e6
+
+    def handler(message: Message, client_sock):
+        if cost:
+            if mode == "cpu":
+                end = time.perf_counter() + cost
+                while time.perf_counter() < end:
+                    pass
+            else:
+                time.sleep(cost)
+        return Message(type=f"{BENCH_TYPE}_RESPONSE", src=message.header.get("dst"), payload=message.payload)
+
+    return handler
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Percentil q (0-100) de una lista ordenada, por el método del rango más cercano."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(q / 100 * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def run_load(client: CommunicationNode, targets: list[int], size: int, concurrency: int, duration: float,
+             warmup: float, timeout: float) -> dict:
+    """Mide un tamaño de payload: cada hilo envía en bucle cerrado hasta agotar duration."""
+    payload = {"data": "x" * size}
+    samples = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    state = {"measure_from": 0.0, "stop_at": 0.0}
+
+    def worker(idx: int):
+        port = targets[idx % len(targets)]
+        msg = Message(type=BENCH_TYPE, src=client.ip, dst="127.0.0.1", payload=payload)
+        local_samples = samples[idx]
+        start_barrier.wait()
+        while True:
+            begin = time.perf_counter()
+            if begin >= state["stop_at"]:
+                return
+            response = client.send_message("127.0.0.1", port, msg, await_response=True, timeout=timeout)
+            elapsed = time.perf_counter() - begin
+            if begin < state["measure_from"]:
+                continue
+            if response is None or response.header.get("type") != f"{BENCH_TYPE}_RESPONSE":
+                errors[idx] += 1
+            else:
+                local_samples.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    now = time.perf_counter()
+    state["measure_from"] = now + warmup
+    state["stop_at"] = now + warmup + duration
+    start_barrier.wait()
+    for t in threads:
+        t.join()
+
+    merged = sorted(s for local in samples for s in local)
+    total_errors = sum(errors)
+    return {
+        "requests": len(merged),
+        "errors": total_errors,
+        "msgs_per_sec": round(len(merged) / duration, 1),
+        "mean_us": round(sum(merged) / len(merged) * 1e6, 1) if merged else 0.0,
+        "p50_us": round(percentile(merged, 50) * 1e6, 1),
+        "p99_us": round(percentile(merged, 99) * 1e6, 1),
+        "p999_us": round(percentile(merged, 99.9) * 1e6, 1),
+        "max_us": round(merged[-1] * 1e6, 1) if merged else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=2, help="Servidores CommunicationNode a levantar")
+    parser.add_argument("--base-port", type=int, default=9600, help="Puerto del primer servidor")
+    parser.add_argument("--concurrency", type=int, default=16, help="Hilos cliente enviando en bucle cerrado")
+    parser.add_argument("--sizes", default="64,4096,65536", help="Tamaños de payload en bytes, separados por coma")
+    parser.add_argument("--handler-us", type=int, default=0, help="Coste simulado del handler en microsegundos")
+    parser.add_argument("--handler-mode", default="sleep", choices=["sleep", "cpu"], help="Cómo se simula el coste")
+    parser.add_argument("--duration", type=float, default=5.0, help="Segundos de medición por tamaño")
+    parser.add_argument("--warmup", type=float, default=0.5, help="Segundos de calentamiento descartados")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout por petición")
+    parser.add_argument("--server-mode", default="thread", choices=["thread", "async"], help="Servidor de los nodos")
+    parser.add_argument("--codec", default="json", choices=sorted(CODECS), help="Codec ofrecido por el cliente")
+    parser.add_argument("--multiplex", action="store_true", help="Cliente multiplexado en una conexión por destino")
+    parser.add_argument("--compression", default="none", choices=["zlib", "none"], help="Compresión negociada")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    parser.add_argument("--out", help="Escribe además el resultado JSON en este fichero")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    ports = [args.base_port + i for i in range(args.nodes)]
+    workers = max(16, args.concurrency)
+
+    servers = []
+    for i, port in enumerate(ports):
+        node = CommunicationNode(f"bench{i}", "127.0.0.1", port, server_mode=args.server_mode,
+                                 handler_workers=workers, handler_queue=workers * 4, compression=args.compression)
+        node.register_handler(BENCH_TYPE, make_handler(args.handler_us, args.handler_mode))
+        servers.append(node)
+    client = CommunicationNode("bench-client", "127.0.0.1", args.base_port + args.nodes,
+                               max_connections_per_peer=args.concurrency, multiplex=args.multiplex,
+                               codec=args.codec, compression=args.compression)
+
+    results = {"config": {k: v for k, v in vars(args).items() if k not in ("json", "out")}, "sizes": {}}
+    try:
+        for size in sizes:
+            results["sizes"][size] = run_load(client, ports, size, args.concurrency, args.duration,
+                                              args.warmup, args.timeout)
+        results["client_metrics"] = client.metrics_snapshot()
+    finally:
+        client.stop_server()
+        for node in servers:
+            node.stop_server()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tamaño':>8} {'msgs/s':>10} {'errores':>8} {'p50 us':>9} {'p99 us':>9} {'p999 us':>9} {'max us':>9}")
+    for size, r in results["sizes"].items():
+        print(f"{size:>8} {r['msgs_per_sec']:>10} {r['errors']:>8} {r['p50_us']:>9} {r['p99_us']:>9} "
+              f"{r['p999_us']:>9} {r['max_us']:>9}")
+
+
+if __name__ == "__main__":
+    main()
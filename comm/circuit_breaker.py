@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger("dftp.comm.circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _PeerState:
+    __slots__ = ("state", "failures", "timeouts", "backoff", "open_until", "probe_started", "last_failure")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.timeouts = 0
+        self.last_failure = 0.0
+        self.backoff = 0.0
+        self.open_until = 0.0
+        self.probe_started = 0.0
+
+
+class CircuitBreaker:
+    """
+    Estado de salud por destino (ip, port) para no pagar el timeout de conexión contra
+    nodos caídos o IPs vacías.
+
+    - closed: se conecta normalmente; failure_threshold fallos seguidos al conectar o enviar
+      abren el circuito. Las respuestas que no llegan a tiempo (el par puede estar vivo pero
+      lento) cuentan aparte y lo abren al llegar a timeout_threshold.
+    - open: allow() devuelve False al instante (fast-fail) durante el backoff, que se
+      duplica en cada reapertura hasta max_backoff (con jitter para no sincronizar sondas).
+    - half_open: vencido el backoff se deja pasar una única sonda; si conecta se cierra el
+      circuito y si falla se vuelve a abrir. Una sonda sin resultado en probe_timeout
+      segundos se da por perdida y se permite otra.
+
+    Los destinos sin fallos en forget_after segundos (y sin sonda en curso) se olvidan, para
+    que las IPs contactadas una vez (barridos de la subred) no se acumulen.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 1.0, max_backoff: float = 10.0,
+                 probe_timeout: float = 5.0, timeout_threshold: int = 10, forget_after: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.timeout_threshold = timeout_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.forget_after = forget_after
+
+        self._peers: dict[tuple, _PeerState] = {}
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + forget_after / 4
+
+        # Métricas
+        self.fast_failed = 0
+        self.opened = 0
+
+    # ---------------- Métodos públicos ----------------
+    def allow(self, key: tuple) -> bool:
+        """True si se puede intentar contactar key; False => fallar sin tocar la red."""
+        with self._lock:
+            peer = self._peers.get(key)
+            if peer is None or peer.state == CLOSED:
+                return True
+
+            now = time.monotonic()
+            if peer.state == OPEN and now >= peer.open_until:
+                peer.state = HALF_OPEN
+                peer.probe_started = now
+                logger.debug("Circuito de %s semiabierto, enviando sonda", key)
+                return True
+            if peer.state == HALF_OPEN and now - peer.probe_started > self.probe_timeout:
+                peer.probe_started = now
+                return True
+
+            self.fast_failed += 1
+            return False
+
+    def record_success(self, key: tuple):
+        with self._lock:
+            peer = self._peers.pop(key, None)
+        if peer is not None and peer.state != CLOSED:
+            logger.info("Circuito de %s cerrado: el destino vuelve a responder", key)
+
+    def record_failure(self, key: tuple, timeout: bool = False) -> bool:
+        """
+        Anota un fallo hacia key: timeout=True si se envió la petición pero la respuesta no
+        llegó a tiempo. Devuelve True si el circuito queda abierto.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            peer = self._peers.get(key)
+            if peer is None:
+                peer = self._peers[key] = _PeerState()
+            peer.last_failure = now
+            if timeout:
+                peer.timeouts += 1
+            else:
+                peer.failures += 1
+
+            if peer.state == HALF_OPEN:
+                peer.backoff = min(peer.backoff * 2, self.max_backoff)
+            elif peer.state == CLOSED and (peer.failures >= self.failure_threshold or peer.timeouts >= self.timeout_threshold):
+                peer.backoff = self.base_backoff
+                self.opened += 1
+                logger.debug("Circuito de %s abierto tras %d fallos y %d timeouts", key, peer.failures, peer.timeouts)
+            else:
+                return peer.state == OPEN
+            peer.state = OPEN
+            peer.open_until = now + peer.backoff * random.uniform(0.8, 1.2)
+            return True
+
+    def state(self, key: tuple) -> str:
+        with self._lock:
+            peer = self._peers.get(key)
+            return peer.state if peer else CLOSED
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune(time.monotonic())
+            states = [p.state for p in self._peers.values()]
+            return {
+                "open": states.count(OPEN),
+                "half_open": states.count(HALF_OPEN),
+                "failing": states.count(CLOSED),
+                "opened": self.opened,
+                "fast_failed": self.fast_failed,
+            }
+
+    # ---------------- Métodos internos ----------------
+    def _prune(self, now: float):
+        """Olvida los destinos sin fallos en forget_after segundos que no esperan sonda (con el lock tomado)."""
+        self._next_prune = now + self.forget_after / 4
+        for key, peer in list(self._peers.items()):
+            probing = peer.state == HALF_OPEN and now - peer.probe_started <= self.probe_timeout
+            if now - peer.last_failure > self.forget_after and not probing and now >= peer.open_until:
+                del self._peers[key]
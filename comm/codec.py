@@ -0,0 +1,135 @@
+import json
+import struct
+import logging
+from comm import Message
+
+logger = logging.getLogger("dftp.comm.codec")
+
+# Primer byte de una trama binaria. Nunca puede empezar un mensaje JSON ('{'), así que
+# el receptor distingue el codec de cada trama sin estado por conexión.
+BINARY_MAGIC = 0xDF
+
+# Tipo de mensaje usado para negociar el codec al abrir una conexión (siempre en JSON)
+HELLO_TYPE = "COMM_HELLO"
+HELLO_RESPONSE_TYPE = "COMM_HELLO_RESPONSE"
+
+# Códigos numéricos de los tipos de mensaje conocidos. El código es la posición + 1;
+# para no romper la compatibilidad entre nodos de distinta versión solo se añaden al final.
+MESSAGE_TYPES = [
+    "DISCOVERY_HEARTBEAT", "DISCOVERY_HEARTBEAT_RESPONSE",
+    "DISCOVERY_QUERY_BY_NAME", "DISCOVERY_QUERY_BY_NAME_RESPONSE",
+    "DISCOVERY_QUERY_BY_ROLE", "DISCOVERY_QUERY_BY_ROLE_RESPONSE",
+    "DISCOVERY_QUERY_ALL", "DISCOVERY_QUERY_ALL_RESPONSE",
+    "PROCESS_FTP_COMMAND", "PROCESS_FTP_RESPONSE",
+    "CHECK_USER", "CHECK_USER_RESPONSE", "CHECK_PASS", "CHECK_PASS_RESPONSE",
+    "CHECK_EXISTS", "CHECK_EXISTS_RESPONSE", "CHECK_DELE", "CHECK_DELE_RESPONSE",
+    "CHECK_MKD", "CHECK_MKD_RESPONSE", "CHECK_RMD", "CHECK_RMD_RESPONSE",
+    "CHECK_RNTO", "CHECK_RNTO_RESPONSE",
+    "OPEN_PASV", "OPEN_PASV_RESPONSE",
+    "DATA_LIST", "DATA_LIST_RESPONSE", "DATA_RETR", "DATA_RETR_RESPONSE", "DATA_STOR", "DATA_STOR_RESPONSE",
+    "COMM_BUSY",
+    "COMM_BATCH", "COMM_BATCH_RESPONSE",
+    "COMM_STREAM_CHUNK", "COMM_STREAM_END",
+]
+TYPE_CODES = {t: i + 1 for i, t in enumerate(MESSAGE_TYPES)}
+
+_FRAME_HEAD = struct.Struct("!BI")   # magic, longitud del cuerpo
+_BODY_HEAD = struct.Struct("!HBHH")  # código de tipo, flags, len(src), len(dst)
+_TYPE_LEN = struct.Struct("!H")      # longitud del nombre de tipo cuando no tiene código
+_HAS_DST = 0x01                      # flag: hay dst (dst=None no ocupa bytes)
+_MAX_FRAME = 64 * 1024 * 1024
+_compact = json.JSONEncoder(separators=(",", ":"))
+
+
+class JsonLineCodec:
+    """Codec original: un objeto JSON por línea terminada en '\\n'."""
+
+    name = "json"
+
+    def encode(self, message: Message) -> bytes:
+        return message.to_json().encode()
+
+    def decode(self, body: bytes) -> Message:
+        return Message.from_json(body.decode())
+
+
+class BinaryCodec:
+    """
+    Trama binaria con prefijo de longitud:
+
+        magic(1) | len(4) | tipo(2) | flags(1) | len_src(2) | len_dst(2) | [tipo] | src | dst | [metadata, payload]
+
+    - El tipo viaja como código numérico (tipo=0 => nombre en texto tras la cabecera, con 2 bytes de longitud).
+    - src/dst van en UTF-8 con su longitud en la cabecera; dst=None se indica con el flag
+      _HAS_DST a 0, no con una longitud reservada. metadata y payload en un único array
+      JSON compacto, para pagar una sola llamada a json.dumps/json.loads.
+    - Al no depender de '\\n' el payload puede contener saltos de línea.
+    """
+
+    name = "bin2"  # bin1 codificaba las longitudes en 1 byte: no interopera con este
+
+    def encode(self, message: Message) -> bytes:
+        header = message.header
+        type = header["type"]
+        src = (header.get("src") or "").encode()
+        dst = header.get("dst")
+        dst = None if dst is None else dst.encode()
+        data = _compact.encode([message.metadata, message.payload]).encode()
+
+        code = TYPE_CODES.get(type, 0)
+        type_bytes = b""
+        if code == 0:
+            name = type.encode()
+            type_bytes = _TYPE_LEN.pack(len(name)) + name
+
+        body = b"".join((
+            _BODY_HEAD.pack(code, 0 if dst is None else _HAS_DST, len(src), 0 if dst is None else len(dst)),
+            type_bytes, src, dst or b"", data,
+        ))
+        return _FRAME_HEAD.pack(BINARY_MAGIC, len(body)) + body
+
+    def decode(self, body: bytes) -> Message:
+        code, flags, len_src, len_dst = _BODY_HEAD.unpack_from(body, 0)
+        pos = _BODY_HEAD.size
+        if code:
+            type = MESSAGE_TYPES[code - 1]
+        else:
+            (len_type,) = _TYPE_LEN.unpack_from(body, pos)
+            pos += _TYPE_LEN.size
+            type = body[pos:pos + len_type].decode()
+            pos += len_type
+
+        src = body[pos:pos + len_src].decode()
+        pos += len_src
+        if not flags & _HAS_DST:
+            dst = None
+        else:
+            dst = body[pos:pos + len_dst].decode()
+            pos += len_dst
+        metadata, payload = json.loads(body[pos:])
+        return Message.from_parts({"type": type, "src": src, "dst": dst}, payload, metadata)
+
+
+CODECS = {
+    JsonLineCodec.name: JsonLineCodec(),
+    BinaryCodec.name: BinaryCodec(),
+}
+DEFAULT_CODEC = CODECS[JsonLineCodec.name]
+
+
+def get_codec(name: str):
+    """Devuelve el codec registrado con ese nombre (json si no existe)."""
+    return CODECS.get(name, DEFAULT_CODEC)
+
+
+def hello_message(src: str, codecs: list[str], compression: list[str] = None) -> Message:
+    """Mensaje de negociación que ofrece los codecs (y algoritmos de compresión) en orden de preferencia."""
+    return Message(type=HELLO_TYPE, src=src, payload={"codecs": codecs, "compression": compression or []})
+
+
+def choose_codec(hello: Message) -> str:
+    """Lado servidor: elige el primer codec ofrecido que este nodo soporta."""
+    for name in (hello.payload or {}).get("codecs", []):
+        if name in CODECS:
+            return name
+    return DEFAULT_CODEC.name
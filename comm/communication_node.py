@@ -1,22 +1,94 @@
+import asyncio
+import json
 import logging
-from comm import Message, TCPServer, TCPClient
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from comm import Message, TCPServer, AsyncTCPServer, TCPClient
+from comm.deadline import DEADLINE_KEY, budget, deadline_scope, is_expired, stamp
+from comm.idempotency import IdempotencyCache
+from comm.batch import BATCH_TYPE, batch_message, batch_response, unpack_batch, unpack_batch_response
+from comm.local_transport import host_id, uds_path_for
+from comm.metrics import Metrics
+from comm.retry import RETRYABLE_KEY, RetryPolicy
+from comm.single_flight import SingleFlight
+from comm.streaming import is_stream
+from comm.worker_pool import PriorityLanes, WorkerPool, WorkerPoolBusy
 
 logger = logging.getLogger("dftp.comm.communication_node")
 
+# Tipos que se atienden en el carril "control", con hilos y cola reservados: si se retrasan
+# el nodo deja de renovar su registro en discovery o los demás dejan de encontrarlo.
+CONTROL_TYPES = (
+    "DISCOVERY_HEARTBEAT", "DISCOVERY_QUERY_BY_NAME", "DISCOVERY_QUERY_BY_ROLE", "DISCOVERY_QUERY_ALL",
+)
+
 class CommunicationNode:
-    def __init__(self, node_name: str, ip: str, port: int):
+    def __init__(self, node_name: str, ip: str, port: int, max_connections_per_peer: int = 8, idle_timeout: float = 30.0,
+                 multiplex: bool = False, codec: str = "json", server_mode: str = None, handler_workers: int = 16,
+                 handler_queue: int = 64, compression: str = None, uds_dir: str = None, control_workers: int = 4,
+                 control_queue: int = 64):
         """
         node_name: identificador del nodo
         ip, port: dirección donde el nodo escucha
+        max_connections_per_peer: límite de conexiones salientes persistentes por destino
+        idle_timeout: segundos antes de cerrar una conexión saliente ociosa
+        multiplex: comparte una conexión por destino entre todas las peticiones en vuelo
+        codec: codec preferido para los mensajes salientes ("json" o "bin2"), negociado por conexión
+        server_mode: "thread" (TCPServer, un hilo por conexión) o "async" (AsyncTCPServer,
+                     event loop). Por defecto se toma de COMM_SERVER_MODE (o "thread").
+        handler_workers: hilos del pool donde se ejecutan los handlers registrados
+        handler_queue: mensajes que pueden esperar turno en el pool; con la cola llena
+                       el nodo contesta COMM_BUSY en lugar de crecer sin límite
+        compression: compresión negociada por conexión para tramas grandes ("zlib" o "none").
+                     Por defecto se toma de COMM_COMPRESSION (o "none"): negociarla cuesta un
+                     HELLO por conexión, así que solo compensa con payloads grandes.
+        control_workers, control_queue: hilos y cola reservados para CONTROL_TYPES, que no
+                                        compiten con handler_workers (ver set_priority)
+        uds_dir: directorio compartido por los nodos del mismo host donde el nodo publica además
+                 un Unix domain socket. Por defecto COMM_UDS_DIR; sin él solo se usa TCP.
         """
         self.node_name = node_name
         self.ip = ip
         self.port = port
         self.handlers = {}  # type -> callback(Message, socket) -> Message | None
 
-        # Instancia TCPServer y TCPClient
-        self.server = TCPServer(ip, port, self._on_message)
-        self.client = TCPClient()
+        # Pools acotados donde se ejecutan los handlers (backpressure): uno general y otro
+        # reservado para los tipos de control, elegido por tipo de mensaje
+        self.worker_pool = WorkerPool(max_workers=handler_workers, max_queue=handler_queue, name=f"{node_name}-handler")
+        self.control_pool = WorkerPool(max_workers=control_workers, max_queue=control_queue, name=f"{node_name}-control")
+        self.lanes = PriorityLanes({"default": self.worker_pool, "control": self.control_pool},
+                                   routes={type: "control" for type in CONTROL_TYPES})
+
+        # Latencias, tamaños y throughput por tipo de mensaje en servidor y cliente (COMM_METRICS=0 las desactiva)
+        self.metrics = Metrics()
+
+        # Peticiones idempotentes idénticas en vuelo comparten una sola llamada de red
+        self.single_flight = SingleFlight()
+
+        # Respuestas recientes a peticiones reintentables: un duplicado no re-ejecuta el handler
+        self.idempotency = IdempotencyCache(max_entries=int(os.getenv("COMM_IDEMPOTENCY_ENTRIES", "1024")),
+                                            ttl=float(os.getenv("COMM_IDEMPOTENCY_TTL", "60")))
+
+        # Endpoint alternativo para nodos del mismo host
+        self.host_id = host_id()
+        self.uds_path = uds_path_for(ip, port, uds_dir)
+
+        # Instancia el servidor (TCPServer o AsyncTCPServer) y TCPClient
+        server_mode = server_mode or os.getenv("COMM_SERVER_MODE", "thread")
+        if server_mode == "async":
+            self.server = AsyncTCPServer(ip, port, self._dispatch, executor=self.lanes, on_busy=self._busy_response,
+                                         metrics=self.metrics, uds_path=self.uds_path)
+        elif server_mode == "thread":
+            self.server = TCPServer(ip, port, self._dispatch, executor=self.lanes, on_busy=self._busy_response,
+                                    metrics=self.metrics, uds_path=self.uds_path)
+        else:
+            raise ValueError(f"server_mode inválido '{server_mode}'. Esperado 'thread' o 'async'")
+        compression = compression or os.getenv("COMM_COMPRESSION", "none")
+        self.client = TCPClient(max_connections_per_peer=max_connections_per_peer, idle_timeout=idle_timeout, multiplex=multiplex, codec=codec,
+                                metrics=self.metrics, compression=None if compression == "none" else compression,
+                                on_failure=self._on_send_failure)
         self.start_server()
 
     # ---------------- Métodos públicos ----------------
@@ -25,36 +97,319 @@ class CommunicationNode:
         self.server.start()
 
     def stop_server(self):
-        """Detiene el servidor TCP."""
+        """Detiene el servidor TCP, los pools de handlers y cierra las conexiones salientes persistentes."""
         self.server.stop()
+        self.lanes.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
         logger.info("Server stopped on %s:%s", self.ip, self.port)
 
-    def connect_to(self, dst_ip: str, dst_port: int):
+    def connect_to(self, dst_ip: str, dst_port: int, timeout: float = 1.0) -> bool:
         """
-        Placeholder para futuras conexiones persistentes.
-        Actualmente TCPClient conecta en cada send_message.
+        Abre por adelantado una conexión persistente hacia dst_ip:dst_port.
+        send_message la reutilizará desde el pool del TCPClient.
         """
-        logger.debug("Preparado para conectar a %s:%s", dst_ip, dst_port)
+        ok = self.client.connect(dst_ip, dst_port, timeout)
+        logger.debug("Conexión persistente a %s:%s -> %s", dst_ip, dst_port, ok)
+        return ok
 
-    def send_message(self, ip, port, msg, await_response=True, timeout=1.0):
+    def endpoint_info(self) -> dict:
+        """Direcciones de contacto del nodo, para anunciarlas en discovery."""
+        return {"ip": self.ip, "port": self.port, "host": self.host_id, "uds": self.uds_path}
+
+    def register_peer_endpoint(self, info: dict):
+        """
+        Recibe las direcciones anunciadas por un par (endpoint_info) y, si está en este
+        mismo host y publica un socket Unix, lo prefiere a TCP para hablarle.
+        """
+        if info.get("uds") and info.get("port") and info.get("host") == self.host_id:
+            self.client.register_local_endpoint(info["ip"], info["port"], info["uds"])
+
+    def send_message(self, ip, port, msg, await_response=True, timeout=1.0, retry: RetryPolicy = None, hedge_to=None):
+        """
+        Envía msg y, si await_response, espera la respuesta como máximo timeout segundos.
+        La petición lleva metadata["budget"] (segundos que quedan); dentro de un handler el timeout se recorta
+        al presupuesto que le queda a la petición que se está atendiendo.
+
+        retry: RetryPolicy para reintentar (con el mismo msg_id) si no hay respuesta o el
+               destino contesta COMM_BUSY; timeout es entonces por intento. El destino
+               ejecuta la petición una sola vez aunque le llegue repetida.
+        hedge_to: (ip, port) de una réplica a la que mandar una copia si el destino tarda
+                  más de retry.hedge_after en contestar; gana la primera respuesta.
+        """
+        if await_response and retry is not None:
+            return self._send_with_retry(ip, port, msg, timeout, retry, hedge_to)
+        if await_response:
+            timeout = self._apply_deadline(msg, timeout)
+            if timeout <= 0:
+                logger.debug("Deadline vencido, no se envía '%s' a %s:%s", msg.header.get("type"), ip, port)
+                return None
         # Evitar logs muy verbosos en la ruta caliente; DEBUG si se necesita traza
         logger.debug("Enviando mensaje a %s:%s tipo=%s src=%s dst=%s", ip, port, msg.header.get("type"), msg.header.get("src"), msg.header.get("dst"))
         response = self.client.send_message(ip, port, msg, await_response, timeout=timeout)
         logger.debug("Respuesta recibida de %s:%s -> %s", ip, port, getattr(response, "header", None))
         return response
 
+    def send_message_coalesced(self, ip, port, msg, timeout=1.0):
+        """
+        Como send_message (esperando respuesta), pero si ya hay en vuelo una petición idéntica
+        (mismo destino, tipo y payload) espera a esa y devuelve la misma respuesta.
+        Solo para peticiones idempotentes (consultas); la respuesta compartida no debe modificarse.
+        Solo se comparten peticiones con presupuestos parecidos (la misma potencia de 2), y cada
+        llamador espera como mucho el suyo.
+        """
+        timeout = budget(timeout)[0]
+        if timeout <= 0:
+            return None
+        key = (ip, port, msg.header.get("type"), json.dumps(msg.payload, sort_keys=True), math.ceil(math.log2(timeout)))
+        return self.single_flight.do(key, self.send_message, ip, port, msg, True, timeout, wait_timeout=timeout)
+
+    def send_message_async(self, ip, port, msg, timeout=1.0, callback=None) -> Future:
+        """
+        Versión no bloqueante de send_message: devuelve un Future con la respuesta (None si
+        no llegó). callback(respuesta) se invoca al completarse, en el hilo del envío.
+        """
+        return self._add_callback(self._send_async(ip, port, msg, timeout), msg, callback)
+
+    def send_transfer_async(self, ip, port, msg, timeout=300.0, callback=None) -> Future:
+        """
+        Como send_message_async, para peticiones cuya respuesta llega al terminar una operación
+        larga (transferencias de datos): van por una conexión propia y un pool de hilos aparte,
+        así que no ocupan las conexiones del pool ni los hilos de las RPC cortas a ese destino.
+        No hereda el deadline del handler actual: sigue en curso después de que este responda.
+        """
+        stamp(msg.metadata, time.monotonic() + timeout)
+        return self._add_callback(self.client.send_transfer_async(ip, port, msg, timeout=timeout), msg, callback)
+
+    async def send_message_aio(self, ip, port, msg, timeout=1.0):
+        """Integración con asyncio: await node.send_message_aio(...) sin bloquear el event loop."""
+        return await asyncio.wrap_future(self._send_async(ip, port, msg, timeout))
+
+    def send_stream(self, ip, port, msg, timeout=5.0):
+        """
+        Petición con respuesta en streaming: itera los chunks que produce el handler remoto
+        (registrado como función generadora). timeout es por chunk. Ver TCPClient.send_stream.
+        """
+        return self.client.send_stream(ip, port, msg, timeout=timeout)
+
+    def send_batch(self, ip, port, messages: list, timeout=1.0) -> list:
+        """
+        Envía varios mensajes a un mismo nodo en una sola trama COMM_BATCH (un viaje de ida
+        y vuelta). Devuelve una respuesta por mensaje, en el mismo orden (None si no la hubo).
+        """
+        if not messages:
+            return []
+        batch = batch_message(self.ip, ip, messages)
+        response = self.send_message(ip, port, batch, await_response=True, timeout=timeout)
+        return unpack_batch_response(response, len(messages))
 
     def register_handler(self, type: str, callback):
         """
         Registra un callback para un tipo de mensaje específico.
-        callback: función que recibe (Message, socket) y devuelve Message o None
+        callback: función que recibe (Message, socket) y devuelve Message o None; si es una
+                  función generadora sus elementos se envían como chunks de un stream (send_stream)
         """
         self.handlers[type] = callback
         logger.debug("Handler registrado para tipo '%s' en nodo %s", type, self.node_name)
 
+    def set_priority(self, type: str, lane: str):
+        """Atiende los mensajes de tipo type en el carril lane ("control", "default" o uno añadido con lanes.add_lane)."""
+        self.lanes.route(type, lane)
+
+    def handler_stats(self) -> dict:
+        """
+        Métricas del pool general de handlers (profundidad de cola, espera en cola y rechazos)
+        y, en "lanes", las de cada carril.
+        """
+        stats = self.worker_pool.stats()
+        stats["lanes"] = self.lanes.stats()
+        return stats
+
+    def metrics_snapshot(self) -> dict:
+        """Histogramas por tipo de mensaje (lado servidor y cliente), coalescencia, idempotencia y circuit breaker, listos para json.dumps."""
+        snapshot = self.metrics.snapshot()
+        snapshot["single_flight"] = self.single_flight.stats()
+        snapshot["idempotency"] = self.idempotency.stats()
+        snapshot["circuit_breaker"] = self.client.breaker.stats()
+        return snapshot
+
+    def dump_metrics(self, path: str):
+        """Vuelca metrics_snapshot() como JSON en path."""
+        self.metrics.dump(path)
+
     # ---------------- Métodos internos ----------------
+    def _on_send_failure(self, ip: str, port: int):
+        """Una petición a ip:port falló (no conectó, no se envió o no llegó respuesta a tiempo). Para subclases."""
+
+    def _apply_deadline(self, msg: Message, timeout: float) -> float:
+        """Marca msg con el presupuesto que le queda y devuelve el timeout efectivo (<= 0 si ya venció)."""
+        timeout, deadline = budget(timeout)
+        if timeout > 0:
+            stamp(msg.metadata, deadline)
+        return timeout
+
+    @staticmethod
+    def _add_callback(future: Future, msg: Message, callback) -> Future:
+        """Invoca callback(respuesta o None) al completarse future."""
+        if callback is not None:
+            def _done(f: Future):
+                try:
+                    response = None if f.cancelled() or f.exception() else f.result()
+                    callback(response)
+                except Exception:
+                    logger.exception("Error en callback de envío asíncrono (%s)", msg.header.get("type"))
+            future.add_done_callback(_done)
+        return future
+
+    def _send_async(self, ip, port, msg: Message, timeout: float) -> Future:
+        # El deadline heredado se calcula aquí: el envío corre en otro hilo que no lo conoce
+        timeout = self._apply_deadline(msg, timeout)
+        if timeout <= 0:
+            future = Future()
+            future.set_result(None)
+            return future
+        return self.client.send_message_async(ip, port, msg, timeout=timeout)
+
+    def _send_with_retry(self, ip, port, msg: Message, timeout: float, retry: RetryPolicy, hedge_to):
+        """send_message con reintentos: backoff con jitter entre intentos y sin pasarse del deadline heredado."""
+        type = msg.header.get("type")
+        msg.metadata[RETRYABLE_KEY] = True
+        response = None
+        for attempt in range(retry.attempts):
+            if attempt:
+                pause = retry.backoff(attempt)
+                if budget(pause + timeout)[0] <= pause:
+                    break  # el presupuesto no alcanza para esperar y volver a intentarlo
+                time.sleep(pause)
+                self.metrics.observe("client", type, "retries", 1)
+                logger.debug("Reintento %d de '%s' a %s:%s", attempt, type, ip, port)
+            attempt_timeout = self._apply_deadline(msg, timeout)
+            if attempt_timeout <= 0:
+                break
+            if hedge_to is not None and retry.hedge_after is not None:
+                response = self._send_hedged(ip, port, msg, attempt_timeout, retry, hedge_to)
+            else:
+                response = self.client.send_message(ip, port, msg, True, timeout=attempt_timeout)
+            if not retry.should_retry(response):
+                break
+        return response
+
+    def _send_hedged(self, ip, port, msg: Message, timeout: float, retry: RetryPolicy, hedge_to) -> Message | None:
+        """
+        Envía msg al destino y, si no contesta bien en retry.hedge_after segundos, una copia
+        (mismo msg_id) a hedge_to. Devuelve la primera respuesta válida.
+        """
+        started = time.monotonic()
+        pending = {self.client.send_message_async(ip, port, msg, timeout=timeout)}
+        done, pending = wait(pending, timeout=min(retry.hedge_after, timeout))
+        response = self._future_response(done)
+        if not retry.should_retry(response):
+            return response
+
+        remaining = timeout - (time.monotonic() - started)
+        if remaining > 0:
+            self.metrics.observe("client", msg.header.get("type"), "hedged", 1)
+            # Copia propia: el envío original puede seguir serializando msg en otro hilo
+            copy = Message(type=msg.header.get("type"), src=msg.header.get("src"), dst=hedge_to[0],
+                           payload=msg.payload, metadata=dict(msg.metadata))
+            pending.add(self.client.send_message_async(hedge_to[0], hedge_to[1], copy, timeout=remaining))
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            candidate = self._future_response(done)
+            if candidate is not None:
+                response = candidate
+                if not retry.should_retry(candidate):
+                    break
+        return response
+
+    @staticmethod
+    def _future_response(futures) -> Message | None:
+        """Primera respuesta no vacía entre futures ya completados (los rechazados cuentan como None)."""
+        for future in futures:
+            if future.exception() is None and future.result() is not None:
+                return future.result()
+        return None
+
     def _on_message(self, message: Message, client_sock):
-        """Callback interno que recibe mensajes del TCPServer."""
+        """
+        Atiende un mensaje de forma síncrona: ejecuta el handler en el carril de su tipo y
+        espera la respuesta; si la cola de admisión está llena responde COMM_BUSY.
+        Los servidores no pasan por aquí: encolan _dispatch en los carriles directamente.
+        """
+        try:
+            future = self.lanes.submit(self._timed_handle_message, message, client_sock, time.perf_counter())
+        except WorkerPoolBusy:
+            self.metrics.observe("server", message.header.get("type"), "rejected", 1)
+            return self._busy_response(message)
+        return future.result()
+
+    def _busy_response(self, message: Message) -> Message:
+        logger.warning("Nodo %s saturado, rechazando '%s'", self.node_name, message.header.get("type"))
+        return Message(type="COMM_BUSY", src=self.ip, dst=message.header.get("src"), payload={"status": "BUSY", "error_msg": "node overloaded"})
+
+    def _timed_handle_message(self, message: Message, client_sock, enqueued_at: float):
+        """_dispatch registrando espera en cola, tiempo de handler y total."""
+        started = time.perf_counter()
+        type = message.header.get("type")
+        try:
+            return self._dispatch(message, client_sock)
+        finally:
+            finished = time.perf_counter()
+            self.metrics.observe("server", type, "queue_us", started - enqueued_at)
+            self.metrics.observe("server", type, "handler_us", finished - started)
+            self.metrics.observe("server", type, "total_us", finished - enqueued_at)
+
+    def _dispatch(self, message: Message, client_sock):
+        """
+        Descarta la petición si su deadline ya pasó (quien la envió ya no espera respuesta);
+        si no, ejecuta el handler con ese deadline como presupuesto de sus llamadas anidadas.
+        Las peticiones marcadas como reintentables pasan por la caché de idempotencia.
+        """
+        deadline = message.metadata.get(DEADLINE_KEY)
+        if is_expired(deadline):
+            logger.debug("Deadline vencido, se descarta '%s' de %s", message.header.get("type"), message.header.get("src"))
+            self.metrics.observe("server", message.header.get("type"), "expired", 1)
+            return None
+        msg_id = message.metadata.get("msg_id")
+        if message.metadata.get(RETRYABLE_KEY) and msg_id:
+            # Puede ser un reintento o una copia hedged: se ejecuta una vez por msg_id
+            wait_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            return self.idempotency.run(msg_id, self._scoped_handle_message, message, client_sock, deadline,
+                                        wait_timeout=wait_timeout)
+        return self._scoped_handle_message(message, client_sock, deadline)
+
+    def _scoped_handle_message(self, message: Message, client_sock, deadline: float | None):
+        with deadline_scope(deadline):
+            response = self._handle_message(message, client_sock)
+        if is_stream(response):
+            return self._scoped_stream(response, deadline)
+        return response
+
+    @staticmethod
+    def _scoped_stream(chunks, deadline: float | None):
+        """
+        Genera los chunks de un handler en streaming con el deadline de la petición: cada
+        next() puede ejecutarse en un hilo distinto del pool y las llamadas que haga el
+        handler entre chunks heredan el presupuesto igual que las de un handler normal.
+        """
+        try:
+            while True:
+                with deadline_scope(deadline):
+                    try:
+                        data = next(chunks)
+                    except StopIteration:
+                        return
+                yield data
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def _handle_message(self, message: Message, client_sock):
+        """Busca y ejecuta el handler registrado para el tipo del mensaje."""
+        if message.header['type'] == BATCH_TYPE:
+            return self._handle_batch(message, client_sock)
         handler = self.handlers.get(message.header['type'])
         if handler:
             response = handler(message, client_sock)
@@ -62,3 +417,17 @@ class CommunicationNode:
         else:
             logger.debug("No hay handler para tipo '%s'", message.header['type'])
             return None
+
+    def _handle_batch(self, batch: Message, client_sock):
+        """
+        Reparte los sub-mensajes de un COMM_BATCH entre los handlers, en orden y en el
+        mismo hilo del pool (encolarlos de nuevo podría bloquear el pool consigo mismo).
+        """
+        responses = []
+        for message in unpack_batch(batch):
+            try:
+                responses.append(self._handle_message(message, client_sock))
+            except Exception:
+                logger.exception("Error procesando '%s' dentro de un COMM_BATCH", message.header.get("type"))
+                responses.append(None)
+        return batch_response(self.ip, batch, responses)
@@ -0,0 +1,68 @@
+import struct
+import time
+import zlib
+import logging
+
+logger = logging.getLogger("dftp.comm.compression")
+
+# Primer byte de una trama comprimida: magic(1) | algoritmo(1) | len(4) | trama original comprimida.
+# La trama original (JSON por línea o binaria) se recupera entera al descomprimir, así
+# que la compresión funciona con cualquier codec y el receptor la detecta por trama.
+COMPRESSED_MAGIC = 0xDE
+
+# Por debajo de este tamaño (bytes) comprimir no compensa: la trama viaja tal cual
+COMPRESS_THRESHOLD = 1024
+
+COMPRESSED_HEAD = struct.Struct("!BBI")
+
+
+def _zlib_decompress(data: bytes, max_size: int) -> bytes:
+    d = zlib.decompressobj()
+    out = d.decompress(data, max_size)
+    if d.unconsumed_tail:
+        raise ValueError(f"Trama descomprimida mayor que {max_size} bytes")
+    return out
+
+
+# nombre -> (id en la trama, comprimir, descomprimir). Nivel 1: en tráfico de control
+# importa más la CPU que el último byte. Los id no se reutilizan.
+COMPRESSORS = {
+    "zlib": (1, lambda data: zlib.compress(data, 1), _zlib_decompress),
+}
+_BY_ID = {algo_id: decompress for algo_id, _, decompress in COMPRESSORS.values()}
+
+
+def choose_compression(offered: list | None) -> str | None:
+    """Lado servidor: primer algoritmo ofrecido que este nodo soporta (None => sin compresión)."""
+    for name in offered or []:
+        if name in COMPRESSORS:
+            return name
+    return None
+
+
+def compress_frame(frame: bytes, compression: str | None, threshold: int = COMPRESS_THRESHOLD,
+                   metrics=None, side: str = None, type: str = None) -> bytes:
+    """
+    Comprime frame con el algoritmo negociado si supera threshold y sale más pequeño.
+    Registra en metrics el tiempo de compresión y el ratio (% del tamaño original).
+    """
+    if compression is None or len(frame) < threshold:
+        return frame
+
+    algo_id, compress, _ = COMPRESSORS[compression]
+    started = time.perf_counter()
+    compressed = compress(frame)
+    if metrics is not None:
+        metrics.observe(side, type, "compress_us", time.perf_counter() - started)
+        metrics.observe(side, type, "compress_ratio_pct", len(compressed) * 100 / len(frame))
+    if len(compressed) >= len(frame):
+        return frame
+    return COMPRESSED_HEAD.pack(COMPRESSED_MAGIC, algo_id, len(compressed)) + compressed
+
+
+def decompress_frame(algo_id: int, data, max_size: int) -> bytes:
+    """Recupera la trama original a partir del cuerpo de una trama comprimida."""
+    decompress = _BY_ID.get(algo_id)
+    if decompress is None:
+        raise ValueError(f"Algoritmo de compresión desconocido ({algo_id})")
+    return decompress(data, max_size)
@@ -0,0 +1,255 @@
+import select
+import socket
+import threading
+import time
+import logging
+
+logger = logging.getLogger("dftp.comm.connection_pool")
+
+
+def open_connection(ip: str, port: int, timeout: float) -> socket.socket | None:
+    """Crea y conecta un socket TCP al destino con timeout. Devuelve None si falla."""
+    sock = None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+        sock.connect((ip, port))
+    except Exception:
+        if sock:
+            try:
+                sock.close()
+            except Exception:
+                pass
+        return None
+    return sock
+
+
+def is_idle_socket_healthy(sock: socket.socket) -> bool:
+    """
+    True si un socket ocioso no tiene nada que leer ni errores pendientes. Usa poll() (sin
+    el límite de descriptores < 1024 de select()) y select() solo donde no hay poll.
+    """
+    fd = sock.fileno()
+    if fd < 0:
+        return False
+    try:
+        if hasattr(select, "poll"):
+            poller = select.poll()
+            poller.register(fd, select.POLLIN | select.POLLPRI)
+            return not poller.poll(0)
+        readable, _, errored = select.select([sock], [], [sock], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable and not errored
+
+
+class PooledConnection:
+    """Socket conectado a un destino (TCP o Unix), reutilizable entre mensajes."""
+
+    def __init__(self, sock: socket.socket, key: tuple):
+        self.sock = sock
+        self.key = key
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.codec = None  # codec negociado por el cliente al abrir la conexión
+        self.compression = None  # algoritmo de compresión negociado (None => sin compresión)
+
+    def is_healthy(self) -> bool:
+        """
+        Comprueba sin bloquear que la conexión sigue utilizable.
+        Un socket ocioso no debería tener nada que leer: si poll() lo marca
+        como legible es que el par lo cerró (EOF) o quedaron bytes huérfanos
+        de una respuesta anterior; en ambos casos la conexión se descarta.
+        """
+        return is_idle_socket_healthy(self.sock)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            logger.debug("Error cerrando conexión del pool %s", self.key)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones TCP persistentes por destino (ip, port).
+
+    - Reutiliza conexiones ociosas en lugar de abrir un socket por mensaje.
+    - Limita el número de conexiones abiertas por destino (max_per_peer);
+      si se alcanza el límite, acquire() espera a que se libere una.
+    - Verifica la salud de la conexión antes de entregarla.
+    - Cierra las conexiones ociosas más antiguas que idle_timeout (reaper).
+    """
+
+    def __init__(self, max_per_peer: int = 8, idle_timeout: float = 30.0, reap_interval: float = 5.0,
+                 connect=open_connection):
+        """connect(ip, port, timeout) -> socket | None abre las conexiones nuevas."""
+        self.max_per_peer = max_per_peer
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._connect = connect
+
+        self._idle: dict[tuple, list[PooledConnection]] = {}  # key -> conexiones libres (LIFO)
+        self._open: dict[tuple, int] = {}                     # key -> conexiones abiertas (libres + en uso)
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Contadores para diagnóstico
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.reaped = 0
+
+        self._reaper_stop = threading.Event()
+        self._reaper_thread = None
+
+    # ---------------- Métodos públicos ----------------
+    def acquire(self, ip: str, port: int, timeout: float) -> PooledConnection | None:
+        """
+        Devuelve una conexión a (ip, port): una ociosa si hay alguna sana, o una nueva
+        si no se alcanzó max_per_peer. Devuelve None si no se pudo conectar o si el
+        límite no se liberó dentro de timeout.
+        """
+        key = (ip, port)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._ensure_reaper()
+            while True:
+                if self._closed:
+                    return None
+
+                conn = self._pop_idle(key)
+                if conn is not None:
+                    self.reused += 1
+                    conn.uses += 1
+                    return conn
+
+                if self._open.get(key, 0) < self.max_per_peer:
+                    # Reservamos el hueco antes de conectar fuera del lock
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.debug("Pool saturado para %s:%s (%d conexiones)", ip, port, self.max_per_peer)
+                    return None
+                self._cond.wait(remaining)
+
+        sock = self._connect(ip, port, max(0.0, deadline - time.monotonic()) or timeout)
+        if sock is None:
+            self._forget(key)
+            return None
+
+        with self._cond:
+            self.created += 1
+        conn = PooledConnection(sock, key)
+        conn.uses = 1
+        return conn
+
+    def release(self, conn: PooledConnection, reusable: bool = True):
+        """Devuelve una conexión al pool. Si no es reutilizable se cierra."""
+        if not reusable:
+            self.discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._open[conn.key] = self._open.get(conn.key, 1) - 1
+                conn.close()
+                return
+            self._idle.setdefault(conn.key, []).append(conn)
+            self._cond.notify()
+
+    def discard(self, conn: PooledConnection):
+        """Cierra una conexión (rota, con respuesta pendiente, etc.) y libera su hueco."""
+        conn.close()
+        with self._cond:
+            self.discarded += 1
+        self._forget(conn.key)
+
+    def reap_idle(self) -> int:
+        """Cierra las conexiones ociosas que superaron idle_timeout. Devuelve cuántas cerró."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            for key, conns in list(self._idle.items()):
+                alive = []
+                for conn in conns:
+                    if now - conn.last_used > self.idle_timeout:
+                        expired.append(conn)
+                        self._open[key] = self._open.get(key, 1) - 1
+                    else:
+                        alive.append(conn)
+                if alive:
+                    self._idle[key] = alive
+                else:
+                    del self._idle[key]
+            self.reaped += len(expired)
+            if expired:
+                self._cond.notify_all()
+
+        for conn in expired:
+            conn.close()
+        if expired:
+            logger.debug("Reaper cerró %d conexiones ociosas", len(expired))
+        return len(expired)
+
+    def close_all(self):
+        """Cierra todas las conexiones ociosas y detiene el reaper."""
+        with self._cond:
+            self._closed = True
+            idle = [c for conns in self._idle.values() for c in conns]
+            for conn in idle:
+                self._open[conn.key] = self._open.get(conn.key, 1) - 1
+            self._idle.clear()
+            self._cond.notify_all()
+        self._reaper_stop.set()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Snapshot de contadores y conexiones por destino."""
+        with self._cond:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "reaped": self.reaped,
+                "open": {f"{ip}:{port}": n for (ip, port), n in self._open.items() if n},
+                "idle": {f"{ip}:{port}": len(c) for (ip, port), c in self._idle.items() if c},
+            }
+
+    # ---------------- Métodos internos ----------------
+    def _pop_idle(self, key) -> PooledConnection | None:
+        """Saca la conexión ociosa más reciente que siga sana (llamar con el lock tomado)."""
+        conns = self._idle.get(key)
+        while conns:
+            conn = conns.pop()
+            if conn.is_healthy():
+                return conn
+            logger.debug("Conexión ociosa a %s no está sana, descartando", key)
+            self._open[key] = self._open.get(key, 1) - 1
+            self.discarded += 1
+            conn.close()
+        return None
+
+    def _forget(self, key):
+        with self._cond:
+            self._open[key] = max(0, self._open.get(key, 0) - 1)
+            self._cond.notify()
+
+    def _ensure_reaper(self):
+        """Arranca el hilo reaper la primera vez que se usa el pool (llamar con el lock tomado)."""
+        if self._reaper_thread is None and self.idle_timeout > 0:
+            self._reaper_thread = threading.Thread(target=self._reaper_loop, daemon=True)
+            self._reaper_thread.start()
+
+    def _reaper_loop(self):
+        while not self._reaper_stop.wait(self.reap_interval):
+            try:
+                self.reap_idle()
+            except Exception:
+                logger.exception("Error en reaper del pool de conexiones")
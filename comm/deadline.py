@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# En el cable metadata["budget"] lleva los segundos que le quedaban a quien envió la petición:
+# es relativo, así que no depende de que los relojes de los nodos coincidan. Al leer la petición
+# del socket se convierte en metadata["deadline"], un instante de time.monotonic() local a partir
+# del cual quien envió la petición ya no espera la respuesta. "deadline" nunca sale del nodo.
+BUDGET_KEY = "budget"
+DEADLINE_KEY = "deadline"
+
+_local = threading.local()
+
+
+def current_deadline() -> float | None:
+    """Deadline de la petición que está atendiendo este hilo (None si no hay)."""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def deadline_scope(deadline: float | None):
+    """
+    Fija el deadline heredado por las llamadas anidadas que haga el handler desde este hilo.
+    Los hilos que cree el handler no lo heredan.
+    """
+    previous = current_deadline()
+    if deadline is not None and previous is not None:
+        deadline = min(deadline, previous)
+    _local.deadline = deadline if deadline is not None else previous
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def is_expired(deadline: float | None) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def stamp(metadata: dict, deadline: float):
+    """Escribe en metadata el presupuesto que queda hasta deadline (local) para enviarlo."""
+    metadata.pop(DEADLINE_KEY, None)
+    metadata[BUDGET_KEY] = max(0.0, deadline - time.monotonic())
+
+
+def on_arrival(message):
+    """
+    Convierte el presupuesto de una petición recién leída del socket en su deadline local.
+    Un "deadline" que venga del cable se ignora: sería la hora de otro reloj.
+    """
+    metadata = message.metadata
+    metadata.pop(DEADLINE_KEY, None)
+    remaining = metadata.pop(BUDGET_KEY, None)
+    if isinstance(remaining, (int, float)):
+        metadata[DEADLINE_KEY] = time.monotonic() + remaining
+
+
+def budget(timeout: float) -> tuple[float, float | None]:
+    """
+    Ajusta timeout al presupuesto heredado del hilo actual.
+    Devuelve (timeout efectivo, deadline en time.monotonic()); el timeout es <= 0 si ya expiró.
+    """
+    deadline = time.monotonic() + timeout
+    inherited = current_deadline()
+    if inherited is not None and inherited < deadline:
+        deadline = inherited
+        timeout = deadline - time.monotonic()
+    return timeout, deadline
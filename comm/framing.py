@@ -0,0 +1,160 @@
+import logging
+from comm.codec import BINARY_MAGIC, CODECS, DEFAULT_CODEC, _FRAME_HEAD, _MAX_FRAME
+from comm.compression import COMPRESSED_HEAD, COMPRESSED_MAGIC, decompress_frame
+
+logger = logging.getLogger("dftp.comm.framing")
+
+_BINARY = CODECS["bin2"]
+
+
+class FrameReader:
+    """
+    Lector de tramas sobre un bytearray preasignado.
+
+    - Lee con recv_into sobre un memoryview del espacio libre: sin concatenar
+      bytes ni copiar el buffer en cada recv.
+    - Busca el '\\n' de forma incremental: recuerda hasta dónde ya buscó y no
+      vuelve a escanear esos bytes cuando llega el siguiente fragmento.
+    - Tramas binarias: lee la longitud del prefijo y reserva espacio de una vez.
+    - Tamaño de lectura adaptativo: crece al doble si el recv llena lo pedido y
+      decrece si las lecturas son pequeñas.
+
+    Entiende las dos tramas de comm.codec (JSON por línea y binaria) y las tramas
+    comprimidas de comm.compression, que devuelve ya descomprimidas.
+    """
+
+    MIN_READ = 4096
+    MAX_READ = 1024 * 1024
+
+    def __init__(self, initial_size: int = 64 * 1024, max_frame: int = _MAX_FRAME):
+        self._buf = bytearray(initial_size)
+        self._view = memoryview(self._buf)
+        self._start = 0       # inicio de los bytes sin consumir
+        self._end = 0         # fin de los bytes válidos
+        self._scan = 0        # hasta aquí ya se buscó '\n' sin éxito
+        self.max_frame = max_frame
+        self.read_size = self.MIN_READ
+
+    # ---------------- Métodos públicos ----------------
+    def recv_from(self, sock) -> int:
+        """
+        Hace un único recv_into desde sock al espacio libre del buffer.
+        Devuelve los bytes leídos (0 => EOF). Propaga socket.timeout y demás errores.
+        """
+        self._reserve(self.read_size)
+        n = sock.recv_into(self._view[self._end:self._end + self.read_size])
+        self._end += n
+        self._adapt(n)
+        return n
+
+    def feed(self, data: bytes):
+        """Añade bytes recibidos por otra vía (p.ej. asyncio.Protocol.data_received)."""
+        size = len(data)
+        self._reserve(size)
+        self._buf[self._end:self._end + size] = data
+        self._end += size
+
+    def next_frame(self):
+        """
+        Extrae la siguiente trama completa como (codec, cuerpo) o None si aún no hay ninguna.
+        Lanza ValueError si la trama supera max_frame.
+        """
+        while self._start < self._end:
+            first = self._buf[self._start]
+            if first == BINARY_MAGIC:
+                return self._next_binary()
+            if first == COMPRESSED_MAGIC:
+                return self._next_compressed()
+
+            nl = self._buf.find(b"\n", max(self._scan, self._start), self._end)
+            if nl < 0:
+                self._scan = self._end
+                if self._end - self._start > self.max_frame:
+                    raise ValueError(f"Trama JSON sin fin de línea mayor que {self.max_frame} bytes")
+                return None
+
+            body = bytes(self._view[self._start:nl])
+            self._consume(nl + 1)
+            if body:
+                return DEFAULT_CODEC, body
+        return None
+
+    def pending(self) -> int:
+        """Bytes recibidos que aún no forman parte de ninguna trama extraída."""
+        return self._end - self._start
+
+    # ---------------- Métodos internos ----------------
+    def _next_binary(self):
+        if self._end - self._start < _FRAME_HEAD.size:
+            return None
+        _, length = _FRAME_HEAD.unpack_from(self._buf, self._start)
+        if length > self.max_frame:
+            raise ValueError(f"Trama binaria demasiado grande ({length} bytes)")
+
+        end = self._start + _FRAME_HEAD.size + length
+        if end > self._end:
+            # Reserva ya el espacio de la trama completa para no crecer a trozos
+            self._reserve(end - self._end)
+            return None
+
+        body = bytes(self._view[self._start + _FRAME_HEAD.size:end])
+        self._consume(end)
+        return _BINARY, body
+
+    def _next_compressed(self):
+        if self._end - self._start < COMPRESSED_HEAD.size:
+            return None
+        _, algo_id, length = COMPRESSED_HEAD.unpack_from(self._buf, self._start)
+        if length > self.max_frame:
+            raise ValueError(f"Trama comprimida demasiado grande ({length} bytes)")
+
+        end = self._start + COMPRESSED_HEAD.size + length
+        if end > self._end:
+            self._reserve(end - self._end)
+            return None
+
+        frame = decompress_frame(algo_id, self._view[self._start + COMPRESSED_HEAD.size:end], self.max_frame)
+        self._consume(end)
+        # Dentro va una trama completa (binaria o JSON por línea)
+        if frame[:1] == bytes([BINARY_MAGIC]):
+            return _BINARY, frame[_FRAME_HEAD.size:]
+        return DEFAULT_CODEC, frame.rstrip(b"\n")
+
+    def _consume(self, pos: int):
+        self._start = pos
+        self._scan = pos
+        if self._start == self._end:
+            # Buffer vacío: se vuelve al principio sin copiar nada
+            self._start = self._end = self._scan = 0
+
+    def _reserve(self, size: int):
+        """Garantiza size bytes libres tras _end, compactando o creciendo el buffer."""
+        if len(self._buf) - self._end >= size:
+            return
+
+        pending = self._end - self._start
+        if self._start and len(self._buf) - pending >= size:
+            # Compactar: mover los bytes pendientes al principio
+            self._view.release()
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._view = memoryview(self._buf)
+        else:
+            capacity = len(self._buf)
+            while capacity - pending < size:
+                capacity *= 2
+            new_buf = bytearray(capacity)
+            new_buf[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buf = new_buf
+            self._view = memoryview(self._buf)
+
+        self._scan -= self._start
+        self._end = pending
+        self._start = 0
+
+    def _adapt(self, n: int):
+        """Ajusta el tamaño de lectura según lo que devolvió el último recv."""
+        if n == self.read_size and self.read_size < self.MAX_READ:
+            self.read_size *= 2
+        elif n < self.read_size // 4 and self.read_size > self.MIN_READ:
+            self.read_size //= 2
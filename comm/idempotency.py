@@ -0,0 +1,98 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("dftp.comm.idempotency")
+
+
+class _Entry:
+    __slots__ = ("event", "response", "created")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.created = time.monotonic()
+
+
+class IdempotencyCache:
+    """
+    Caché LRU acotada de respuestas por msg_id, para peticiones que pueden llegar repetidas
+    (reintentos, copias hedged). La primera copia ejecuta el handler; las siguientes esperan
+    a que termine (si sigue en curso) y reciben la misma respuesta sin ejecutarlo de nuevo.
+
+    Guarda como mucho max_entries respuestas durante ttl segundos (la ventana en la que un
+    cliente puede reintentar). Si el handler falla la entrada se borra y un reintento lo
+    vuelve a ejecutar.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def run(self, msg_id: str, fn, *args, wait_timeout: float = None):
+        """
+        Devuelve la respuesta cacheada para msg_id o ejecuta fn(*args) y la guarda.
+        Una copia que llega mientras el original se ejecuta espera hasta wait_timeout
+        segundos (None = sin límite); si vence devuelve None.
+        """
+        with self._lock:
+            entry = self._entries.get(msg_id)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                del self._entries[msg_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(msg_id)
+                self.hits += 1
+                leader = False
+            else:
+                entry = self._entries[msg_id] = _Entry()
+                self.misses += 1
+                leader = True
+                self._evict()
+
+        if not leader:
+            logger.debug("Petición repetida %s, se contesta desde la caché", msg_id)
+            entry.event.wait(wait_timeout)
+            return entry.response
+
+        try:
+            entry.response = fn(*args)
+        except BaseException:
+            with self._lock:
+                if self._entries.get(msg_id) is entry:
+                    del self._entries[msg_id]
+            raise
+        finally:
+            entry.event.set()
+        return entry.response
+
+    def _evict(self):
+        """
+        Descarta las respuestas menos usadas hasta volver a max_entries (llamar con el lock).
+        Las entradas cuyo handler sigue en curso no se tocan: una copia que llegara después
+        lo ejecutaría otra vez. Mientras haya muchas en curso la caché puede pasarse del tope.
+        """
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        victims = []
+        for msg_id, entry in self._entries.items():
+            if entry.event.is_set():
+                victims.append(msg_id)
+                if len(victims) == excess:
+                    break
+        for msg_id in victims:
+            del self._entries[msg_id]
+        self.evicted += len(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
@@ -0,0 +1,65 @@
+import os
+import socket
+import logging
+
+logger = logging.getLogger("dftp.comm.local_transport")
+
+
+def host_id() -> str:
+    """
+    Identificador de la máquina física. Dos nodos con el mismo host_id pueden hablar por
+    Unix domain socket si comparten COMM_UDS_DIR (p.ej. un volumen montado en todos los
+    contenedores del host). Se toma de COMM_HOST_ID; sin él, del hostname.
+    """
+    return os.getenv("COMM_HOST_ID") or socket.gethostname()
+
+
+def uds_dir() -> str | None:
+    """Directorio compartido donde los nodos del host publican su socket (COMM_UDS_DIR)."""
+    return os.getenv("COMM_UDS_DIR") or None
+
+
+def uds_path_for(ip: str, port: int, directory: str = None) -> str | None:
+    """Ruta del socket Unix del nodo que escucha en ip:port (None si no hay directorio)."""
+    directory = directory or uds_dir()
+    if not directory:
+        return None
+    return os.path.join(directory, f"{ip}_{port}.sock")
+
+
+def open_unix_connection(path: str, timeout: float) -> socket.socket | None:
+    """Conecta al socket Unix path con timeout. Devuelve None si falla."""
+    sock = None
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(path)
+    except Exception:
+        if sock:
+            try:
+                sock.close()
+            except Exception:
+                pass
+        return None
+    return sock
+
+
+def bind_unix_socket(path: str) -> socket.socket:
+    """Crea el socket Unix de escucha en path, borrando un socket huérfano de una ejecución anterior."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    return sock
+
+
+def remove_unix_socket(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.debug("No se pudo borrar el socket Unix %s", path)
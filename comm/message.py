@@ -1,8 +1,29 @@
+import itertools
 import json
+import os
 import time
 import uuid
 
+# Los msg_id son "<prefijo del proceso>-<contador>": el prefijo aleatorio los hace únicos
+# entre nodos y reinicios, y el contador evita pagar uuid4() en cada mensaje.
+_id_prefix = uuid.uuid4().hex[:16]
+_id_counter = itertools.count(1)
+
+
+def _reset_ids():
+    """Tras un fork el hijo necesita su propio prefijo para no repetir msg_id del padre."""
+    global _id_prefix, _id_counter
+    _id_prefix = uuid.uuid4().hex[:16]
+    _id_counter = itertools.count(1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_ids)
+
+
 class Message:
+    __slots__ = ("header", "payload", "_metadata")
+
     def __init__(self, type: str, src: str, dst: str = None, payload: dict = None,
                  metadata: dict = None):
         """
@@ -11,7 +32,8 @@ class Message:
         src: id del nodo origen
         dst: id del nodo destino (opcional)
         payload: contenido del mensaje
-        metadata: diccionario opcional, si no se pasa se genera msg_id y timestamp automáticamente
+        metadata: diccionario opcional, si no se pasa se genera msg_id y timestamp la primera
+                  vez que se lee (al serializar o al acceder a msg.metadata)
         """
         self.header = {
             "type": type,
@@ -19,10 +41,25 @@ class Message:
             "dst": dst
         }
         self.payload = payload or {}
-        self.metadata = metadata or {
-            "msg_id": str(uuid.uuid4()),
-            "timestamp": int(time.time())
-        }
+        self._metadata = metadata or None
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = {
+                "msg_id": Message.new_id(),
+                "timestamp": int(time.time())
+            }
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: dict):
+        self._metadata = value or None
+
+    @staticmethod
+    def new_id() -> str:
+        """Genera un msg_id único (prefijo aleatorio del proceso + contador)."""
+        return f"{_id_prefix}-{next(_id_counter):x}"
 
     def to_json(self) -> str:
         """
@@ -38,15 +75,21 @@ class Message:
     def from_json(raw: str) -> "Message":
         """
         Deserializa un JSON recibido y devuelve un objeto Mensaje.
+        Reutiliza los diccionarios ya decodificados en lugar de reconstruirlos.
         """
         data = json.loads(raw)
-        return Message(
-            type=data["header"]["type"],
-            src=data["header"]["src"],
-            dst=data["header"].get("dst"),
-            payload=data.get("payload"),
-            metadata=data.get("metadata")
-        )
+        header = data["header"]
+        header.setdefault("dst", None)
+        return Message.from_parts(header, data.get("payload"), data.get("metadata"))
+
+    @staticmethod
+    def from_parts(header: dict, payload: dict, metadata: dict) -> "Message":
+        """Construye un Message a partir de diccionarios ya formados, sin copiarlos."""
+        msg = Message.__new__(Message)
+        msg.header = header
+        msg.payload = payload or {}
+        msg._metadata = metadata or None
+        return msg
 
     def __repr__(self):
         return f"Mensaje(type={self.header['type']}, src={self.header['src']}, dst={self.header.get('dst')}, payload={self.payload})"
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger("dftp.comm.metrics")
+
+_BUCKETS = 40  # bucket b cuenta valores en [2^(b-1), 2^b); el último acumula el resto
+
+
+class Histogram:
+    """
+    Histograma logarítmico (potencias de 2) de enteros: latencias en µs o tamaños en bytes.
+    Registrar un valor es O(1) y sin locks; lo usa un único hilo (ver Metrics).
+    """
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        self.buckets[min(value.bit_length(), _BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, p: float) -> int:
+        """Cota superior (inclusiva) del bucket que contiene el percentil p (0-100)."""
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << b) - 1, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": round(self.total / self.count, 1) if self.count else 0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            # clave: cota superior inclusiva del bucket
+            "buckets": {str((1 << b) - 1): n for b, n in enumerate(self.buckets) if n},
+        }
+
+
+class Metrics:
+    """
+    Contadores e histogramas por tipo de mensaje, agregados por hilo.
+
+    Cada hilo escribe solo en su propio diccionario (threading.local), así que la ruta
+    caliente no toma locks; snapshot() suma los de todos los hilos. Los datos de hilos
+    ya terminados se pliegan en un acumulado para no crecer con cada hilo de conexión.
+
+    Claves: (lado, tipo, métrica), p.ej. ("server", "CHECK_USER", "handler_us").
+    Las métricas *_us son latencias en microsegundos y las *_bytes tamaños en bytes.
+    Se desactiva con COMM_METRICS=0.
+    """
+
+    def __init__(self, enabled: bool = None):
+        if enabled is None:
+            enabled = os.getenv("COMM_METRICS", "1") != "0"
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._local = threading.local()
+        self._stores: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    # ---------------- Métodos públicos ----------------
+    def observe(self, side: str, type: str, name: str, value: float):
+        """
+        Registra value en el histograma (side, type, name).
+        Si name acaba en _us, value es una duración en segundos y se guarda en µs.
+        """
+        if not self.enabled:
+            return
+        store = getattr(self._local, "store", None)
+        if store is None:
+            store = self._new_store()
+        key = (side, type, name)
+        hist = store.get(key)
+        if hist is None:
+            hist = store[key] = Histogram()
+        hist.record(int(value * 1_000_000) if name.endswith("_us") else int(value))
+
+    def snapshot(self) -> dict:
+        """Agrega todos los hilos: {lado: {tipo: {métrica: histograma}}} más uptime_s."""
+        merged: dict = {}
+        with self._lock:
+            alive = []
+            for thread, store in self._stores:
+                if thread.is_alive():
+                    alive.append((thread, store))
+                    self._merge_into(merged, store)
+                else:
+                    self._merge_into(self._retired, store)
+            self._stores = alive
+            self._merge_into(merged, self._retired)
+
+        uptime = max(time.time() - self.started_at, 1e-9)
+        result = {"uptime_s": round(uptime, 3)}
+        for (side, type, name), hist in sorted(merged.items()):
+            entry = result.setdefault(side, {}).setdefault(type, {})
+            entry[name] = hist.to_dict()
+            if name == "total_us":
+                entry["per_second"] = round(hist.count / uptime, 3)
+        return result
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def dump(self, path: str):
+        """Escribe el snapshot como JSON en path."""
+        with open(path, "w") as f:
+            f.write(self.to_json(indent=2))
+
+    # ---------------- Métodos internos ----------------
+    def _new_store(self) -> dict:
+        store = {}
+        self._local.store = store
+        with self._lock:
+            self._stores.append((threading.current_thread(), store))
+        return store
+
+    @staticmethod
+    def _merge_into(target: dict, store: dict):
+        # El hilo dueño puede estar añadiendo claves: se itera sobre una copia
+        for key, hist in list(store.items()):
+            merged = target.get(key)
+            if merged is None:
+                merged = target[key] = Histogram()
+            merged.merge(hist)
@@ -0,0 +1,162 @@
+import socket
+import threading
+import time
+import logging
+from collections import OrderedDict
+from comm import Message
+from comm.codec import DEFAULT_CODEC
+from comm.compression import COMPRESS_THRESHOLD, compress_frame
+from comm.framing import FrameReader
+
+logger = logging.getLogger("dftp.comm.multiplex")
+
+
+class _PendingRequest:
+    """Hueco donde el hilo lector deja la respuesta de una petición en vuelo."""
+
+    __slots__ = ("event", "response")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+
+
+class MultiplexedConnection:
+    """
+    Conexión TCP compartida por varios hilos con muchas peticiones en vuelo a la vez.
+
+    Cada petición se marca con metadata["mux"] para que el servidor la atienda de forma
+    concurrente; el servidor contesta con metadata["reply_to"] = msg_id de la petición
+    y un hilo lector entrega cada respuesta a quien la espera, sin importar el orden
+    en que lleguen. Así una petición lenta (p.ej. DATA_LIST) no bloquea a otra rápida
+    hacia el mismo nodo.
+    """
+
+    def __init__(self, sock: socket.socket, key: tuple, codec=DEFAULT_CODEC, compression: str = None,
+                 compress_threshold: int = COMPRESS_THRESHOLD):
+        self.sock = sock
+        self.key = key
+        self.codec = codec
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.last_used = time.monotonic()
+        self.closed = False
+
+        self._pending: OrderedDict[str, _PendingRequest] = OrderedDict()  # msg_id -> petición en vuelo
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+        self.sock.settimeout(None)
+        self._reader = threading.Thread(target=self._reader_loop, daemon=True)
+        self._reader.start()
+
+    # ---------------- Métodos públicos ----------------
+    def request(self, message: Message, timeout: float) -> Message | None:
+        """Envía message y espera su respuesta como máximo timeout segundos."""
+        msg_id = message.metadata.setdefault("msg_id", Message.new_id())
+        message.metadata["mux"] = True
+
+        pending = _PendingRequest()
+        with self._pending_lock:
+            if self.closed:
+                return None
+            self._pending[msg_id] = pending
+
+        if not self._send(message):
+            self._forget(msg_id)
+            return None
+
+        if not pending.event.wait(timeout):
+            logger.debug("Timeout esperando respuesta %s de %s", msg_id, self.key)
+            self._forget(msg_id)
+            return None
+        return pending.response
+
+    def send(self, message: Message) -> bool:
+        """Envía message sin esperar respuesta; si llega alguna, se descarta."""
+        message.metadata["mux"] = True
+        return self._send(message)
+
+    def in_flight(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def close(self):
+        """Cierra el socket; el hilo lector despierta a todas las peticiones pendientes."""
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        try:
+            self.sock.close()
+        except Exception:
+            logger.debug("Error cerrando conexión multiplexada %s", self.key)
+
+    # ---------------- Métodos internos ----------------
+    def _send(self, message: Message) -> bool:
+        data = compress_frame(self.codec.encode(message), self.compression, self.compress_threshold)
+        try:
+            with self._send_lock:
+                self.sock.sendall(data)
+            self.last_used = time.monotonic()
+            return True
+        except Exception:
+            logger.debug("Error enviando por conexión multiplexada %s", self.key, exc_info=True)
+            self.close()
+            return False
+
+    def _forget(self, msg_id: str):
+        with self._pending_lock:
+            self._pending.pop(msg_id, None)
+
+    def _deliver(self, response: Message):
+        """Entrega una respuesta a la petición que la espera (por reply_to)."""
+        reply_to = response.metadata.get("reply_to") if response.metadata else None
+        with self._pending_lock:
+            if reply_to is not None:
+                pending = self._pending.pop(reply_to, None)
+            elif self._pending:
+                # Servidor sin soporte de reply_to: contesta en orden, la más antigua primero
+                _, pending = self._pending.popitem(last=False)
+            else:
+                pending = None
+
+        if pending is None:
+            logger.debug("Respuesta sin petición pendiente en %s (reply_to=%s), descartada", self.key, reply_to)
+            return
+        pending.response = response
+        pending.event.set()
+
+    def _reader_loop(self):
+        reader = FrameReader()
+        try:
+            while not self.closed:
+                try:
+                    n = reader.recv_from(self.sock)
+                except Exception:
+                    break
+                if not n:
+                    break
+                try:
+                    frames = list(iter(reader.next_frame, None))
+                except ValueError:
+                    logger.exception("Trama inválida en conexión multiplexada %s", self.key)
+                    break
+                for codec, body in frames:
+                    try:
+                        self._deliver(codec.decode(body))
+                    except Exception:
+                        logger.exception("Error parseando respuesta multiplexada de %s", self.key)
+        finally:
+            self.closed = True
+            with self._pending_lock:
+                pending = list(self._pending.values())
+                self._pending.clear()
+            for p in pending:
+                p.event.set()
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+            logger.debug("Conexión multiplexada %s cerrada (%d peticiones abortadas)", self.key, len(pending))
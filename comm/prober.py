@@ -0,0 +1,169 @@
+import errno
+import selectors
+import socket
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger("dftp.comm.prober")
+
+try:
+    import resource
+except ImportError:  # sin RLIMIT_NOFILE (Windows)
+    resource = None
+
+# Errores de socket() que indican falta de descriptores o memoria, no un problema de la ip
+_OUT_OF_FDS = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+# Descriptores que el sondeo deja libres para el resto del nodo (servidor, pool de conexiones, logs)
+FD_MARGIN = 256
+
+
+def fd_budget(margin: int = FD_MARGIN) -> int | None:
+    """Descriptores que puede ocupar un sondeo: el límite blando del proceso menos margin (None si no hay límite)."""
+    if resource is None:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return max(1, soft - margin)
+
+
+class ConnectProber:
+    """
+    Comprueba qué direcciones tienen un puerto TCP abierto con connects no bloqueantes
+    sobre un único selector: miles de conexiones en vuelo desde un solo hilo, en lugar de
+    un connect bloqueante por hilo. Una dirección vacía cuesta un descriptor durante timeout
+    segundos, no un hilo.
+    """
+
+    def __init__(self, timeout: float = 0.8, max_in_flight: int = 1024):
+        """
+        timeout: espera máxima de cada connect
+        max_in_flight: connects simultáneos; se recorta a RLIMIT_NOFILE menos FD_MARGIN
+        """
+        self.timeout = timeout
+        budget = fd_budget()
+        self.max_in_flight = max_in_flight if budget is None else min(max_in_flight, budget)
+
+        # Métricas del último sondeo
+        self.last_skipped: list[str] = []  # ips que no se pudieron sondear (sin descriptores)
+        self.last_probed = 0
+        self.last_open = 0
+        self.last_elapsed = 0.0
+
+    def probe(self, ips: list[str], port: int) -> list[str]:
+        """
+        Devuelve las ips de la lista que aceptaron la conexión a port, en el mismo orden.
+        Si el proceso se queda sin descriptores las ips que faltan no se sondean en esta ronda
+        (quedan en last_skipped, ni abiertas ni cerradas).
+        """
+        started = time.monotonic()
+        pending = iter(ips)
+        in_flight: deque[tuple[float, socket.socket]] = deque()  # mismo timeout para todos: FIFO por deadline
+        open_ips = set()
+        skipped = []
+
+        with selectors.DefaultSelector() as selector:
+            exhausted = False
+            while True:
+                while not exhausted and len(selector.get_map()) < self.max_in_flight:
+                    ip = next(pending, None)
+                    if ip is None:
+                        exhausted = True
+                        break
+                    try:
+                        sock = self._start_connect(ip, port)
+                    except OSError as e:
+                        logger.debug("No se pudo sondear %s:%s: %s", ip, port, e)
+                        skipped.append(ip)
+                        if e.errno in _OUT_OF_FDS and selector.get_map():
+                            break  # se espera a que los connects en vuelo liberen descriptores
+                        continue
+                    if sock is not None:
+                        selector.register(sock, selectors.EVENT_WRITE, ip)
+                        in_flight.append((time.monotonic() + self.timeout, sock))
+                if not selector.get_map():
+                    break
+
+                # Los ya resueltos se quedan en in_flight (cerrados) hasta llegar al frente
+                while in_flight[0][1].fileno() == -1:
+                    in_flight.popleft()
+                wait = max(0.0, in_flight[0][0] - time.monotonic())
+                for key, _ in selector.select(wait):
+                    sock = key.fileobj
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        open_ips.add(key.data)
+                    selector.unregister(sock)
+                    sock.close()
+
+                # Los que agotaron su timeout se abandonan
+                now = time.monotonic()
+                while in_flight and (in_flight[0][1].fileno() == -1 or in_flight[0][0] <= now):
+                    _, sock = in_flight.popleft()
+                    if sock.fileno() != -1:
+                        selector.unregister(sock)
+                        sock.close()
+
+        self.last_skipped = skipped
+        self.last_probed = len(ips) - len(skipped)
+        self.last_open = len(open_ips)
+        self.last_elapsed = time.monotonic() - started
+        logger.debug("Sondeadas %d ips en el puerto %s: %d abiertas en %.3fs",
+                     self.last_probed, port, self.last_open, self.last_elapsed)
+        return [ip for ip in ips if ip in open_ips]
+
+    @staticmethod
+    def _start_connect(ip: str, port: int) -> socket.socket | None:
+        """
+        Inicia el connect no bloqueante; None si falla de inmediato (rechazo, sin ruta...).
+        Lanza OSError si no se pudo ni intentar (p.ej. sin descriptores libres).
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setblocking(False)
+            err = sock.connect_ex((ip, port))
+        except OSError:
+            sock.close()
+            raise
+        if err in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            return sock
+        sock.close()
+        return None
+
+
+class SubnetSweep:
+    """
+    Barrido incremental de una lista de direcciones: cada llamada a next_window devuelve
+    las direcciones prioritarias (las que respondieron en barridos anteriores) seguidas de la
+    siguiente ventana de window direcciones, dando la vuelta al final. Con window=None cada
+    ventana es la subred entera.
+    """
+
+    def __init__(self, ips: list[str], window: int = None):
+        self.ips = ips
+        self.window = window if window and window < len(ips) else len(ips)
+        self.cursor = 0
+        self.cycles = 0  # barridos completos de la subred
+        self.seen: set[str] = set()
+
+    def next_window(self, priority=()) -> list[str]:
+        """Direcciones a sondear en esta ronda: priority, las vistas abiertas y la siguiente ventana."""
+        chunk = self.ips[self.cursor:self.cursor + self.window]
+        if self.cursor + self.window >= len(self.ips):
+            chunk += self.ips[:self.cursor + self.window - len(self.ips)]
+            self.cycles += 1
+        self.cursor = (self.cursor + self.window) % len(self.ips) if self.ips else 0
+
+        return list(dict.fromkeys([*priority, *sorted(self.seen), *chunk]))
+
+    def update(self, probed: list[str], open_ips: list[str], skipped=()):
+        """
+        Recuerda las direcciones abiertas y olvida las vistas que ya no responden. Las de
+        skipped no llegaron a sondearse y conservan lo que se sabía de ellas.
+        """
+        if skipped:
+            skipped = set(skipped)
+            probed = [ip for ip in probed if ip not in skipped]
+        self.seen.difference_update(probed)
+        self.seen.update(open_ips)
@@ -0,0 +1,39 @@
+import random
+
+# metadata["retryable"]: la petición puede llegar repetida (reintento o copia hedged) con el
+# mismo msg_id; el servidor la ejecuta una sola vez y contesta las copias desde su caché.
+RETRYABLE_KEY = "retryable"
+
+
+class RetryPolicy:
+    """
+    Política de reintentos de send_message.
+
+    - attempts: intentos en total (1 => sin reintentos). Se reintenta si no llegó respuesta
+      o si el destino contestó COMM_BUSY.
+    - Entre intentos se espera un backoff exponencial con jitter completo:
+      uniforme en [0, min(max_backoff, base_backoff * 2**(intento-1))].
+    - hedge_after: si se envía con una réplica alternativa, segundos sin respuesta tras los
+      cuales se manda una copia a la réplica y gana la primera respuesta.
+
+    Todas las copias llevan el mismo msg_id y metadata["retryable"], así que un mismo nodo
+    no aplica dos veces una operación que modifica estado (CHECK_MKD, CHECK_RNTO...). Entre
+    réplicas distintas no hay esa garantía: hedging solo para operaciones idempotentes.
+    """
+
+    def __init__(self, attempts: int = 3, base_backoff: float = 0.05, max_backoff: float = 1.0,
+                 hedge_after: float = None):
+        if attempts < 1:
+            raise ValueError("attempts debe ser >= 1")
+        self.attempts = attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del intento número attempt (1 = primer reintento)."""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def should_retry(response) -> bool:
+        return response is None or response.header.get("type") == "COMM_BUSY"
@@ -0,0 +1,79 @@
+import threading
+import logging
+
+logger = logging.getLogger("dftp.comm.single_flight")
+
+
+class _Call:
+    """Llamada en vuelo: el primer hilo la ejecuta y los demás esperan su resultado."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas idénticas concurrentes: mientras una llamada con cierta clave
+    está en vuelo, las demás con la misma clave no la repiten, esperan y reciben el mismo
+    resultado (o la misma excepción). Solo apto para peticiones idempotentes; el resultado
+    se comparte entre todos los llamadores, así que no debe modificarse.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+        self.calls = 0       # llamadas recibidas
+        self.executions = 0  # llamadas realmente ejecutadas
+        self.timeouts = 0    # llamadas que dejaron de esperar antes de que terminara la ejecutada
+
+    def do(self, key, fn, *args, wait_timeout: float = None, **kwargs):
+        """
+        Ejecuta fn(*args, **kwargs) salvo que ya haya una llamada con key en vuelo. Quien se
+        suma a una llamada en vuelo espera como mucho wait_timeout segundos (None = sin
+        límite); si vence devuelve None sin esperar más al que la ejecuta.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            if not call.event.wait(wait_timeout):
+                with self._lock:
+                    self.timeouts += 1
+                return None
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """calls, executions y coalescing_ratio = fracción de llamadas resueltas sin ir a la red."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.calls - self.executions,
+                "timeouts": self.timeouts,
+                "coalescing_ratio": round((self.calls - self.executions) / self.calls, 4) if self.calls else 0.0,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,74 @@
+import socket
+import time
+import logging
+from collections.abc import Iterator
+from comm import Message
+
+logger = logging.getLogger("dftp.comm.streaming")
+
+# Respuesta en streaming: el handler devuelve un iterador (p.ej. es una función generadora)
+# y el servidor envía un COMM_STREAM_CHUNK por elemento y un COMM_STREAM_END al final, todos
+# con reply_to = msg_id de la petición, por la misma conexión.
+STREAM_CHUNK_TYPE = "COMM_STREAM_CHUNK"
+STREAM_END_TYPE = "COMM_STREAM_END"
+
+# Segundos que el servidor espera a que un cliente que no consume vuelva a leer antes de abortar el stream
+STREAM_STALL_TIMEOUT = 30.0
+
+
+class StreamError(Exception):
+    """El stream no terminó bien: conexión caída, timeout, error del handler o respuesta no streaming."""
+
+    def __init__(self, message: str, response: Message = None):
+        super().__init__(message)
+        self.response = response  # respuesta normal recibida en lugar del stream, si la hubo
+
+
+def is_stream(response) -> bool:
+    """True si el handler devolvió un iterador de chunks en lugar de un Message."""
+    return isinstance(response, Iterator)
+
+
+def stream_messages(src: str, request: Message, chunks: Iterator):
+    """
+    Convierte los chunks del handler en los mensajes del stream. El handler se ejecuta
+    perezosamente: cada chunk se genera cuando el anterior ya se pudo enviar, así que nunca
+    hay más de uno en memoria. Un error del handler cierra el stream con status ERROR.
+    """
+    dst = request.header.get("src")
+    seq = 0
+    try:
+        for data in chunks:
+            yield Message(type=STREAM_CHUNK_TYPE, src=src, dst=dst, payload={"seq": seq, "data": data})
+            seq += 1
+    except Exception as e:
+        logger.exception("Error generando el stream de '%s'", request.header.get("type"))
+        yield Message(type=STREAM_END_TYPE, src=src, dst=dst, payload={"status": "ERROR", "error_msg": str(e), "count": seq})
+        return
+    finally:
+        # Si el stream se corta (cliente desconectado) el handler ejecuta sus finally
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    yield Message(type=STREAM_END_TYPE, src=src, dst=dst, payload={"status": "OK", "count": seq})
+
+
+def send_with_backpressure(sock: socket.socket, data: bytes, alive=lambda: True, stall_timeout: float = STREAM_STALL_TIMEOUT):
+    """
+    sendall para sockets con timeout corto: si el buffer de envío está lleno porque el cliente
+    no consume, sigue esperando (en lugar de fallar al primer timeout) mientras alive() y
+    mientras no pasen stall_timeout segundos sin poder escribir nada.
+    """
+    view = memoryview(data)
+    stalled_since = None
+    while view:
+        try:
+            sent = sock.send(view)
+        except socket.timeout:
+            now = time.monotonic()
+            stalled_since = stalled_since or now
+            if not alive() or now - stalled_since > stall_timeout:
+                raise
+            continue
+        stalled_since = None
+        view = view[sent:]
@@ -1,84 +1,508 @@
+import os
 import socket
+import threading
+import time
 import logging
+from concurrent.futures import Future
 from comm import Message
+from comm.codec import DEFAULT_CODEC, HELLO_RESPONSE_TYPE, get_codec, hello_message
+from comm.framing import FrameReader
+from comm.circuit_breaker import CircuitBreaker
+from comm.compression import COMPRESS_THRESHOLD, compress_frame
+from comm.connection_pool import ConnectionPool, open_connection
+from comm.local_transport import open_unix_connection, uds_path_for
+from comm.multiplex import MultiplexedConnection
+from comm.streaming import STREAM_CHUNK_TYPE, STREAM_END_TYPE, StreamError
+from comm.worker_pool import WorkerPool, WorkerPoolBusy
 
 logger = logging.getLogger("dftp.comm.tcp_client")
 
 class TCPClient:
-    def __init__(self):
-        pass  # Sin estado persistente por ahora
+    def __init__(self, max_connections_per_peer: int = 8, idle_timeout: float = 30.0, multiplex: bool = False,
+                 codec: str = "json", async_workers: int = 16, async_queue: int = 256, metrics=None,
+                 compression: str = None, compress_threshold: int = COMPRESS_THRESHOLD, breaker: CircuitBreaker = None, transfer_workers: int = 64,
+                 on_failure=None):
+        """
+        max_connections_per_peer: máximo de conexiones abiertas simultáneas hacia un mismo destino
+        idle_timeout: segundos que una conexión ociosa (del pool o multiplexada) permanece abierta antes de cerrarse
+        multiplex: si es True se usa una única conexión por destino con varias peticiones
+                   en vuelo, correlacionando respuestas por msg_id
+        codec: codec preferido ("json" o "bin2"). Con un codec distinto de json cada conexión
+               nueva lo negocia con el servidor y vuelve a JSON si el par no lo soporta.
+        async_workers: hilos que atienden send_message_async (se crean bajo demanda)
+        async_queue: envíos asíncronos que pueden esperar turno; con la cola llena el
+                     future falla con WorkerPoolBusy
+        transfer_workers: hilos de send_transfer_async (peticiones largas con conexión propia)
+        metrics: comm.metrics.Metrics donde registrar tiempos de conexión, envío y espera por tipo
+        compression: algoritmo de compresión a negociar por conexión ("zlib") o None. Solo se
+                     comprimen las tramas de al menos compress_threshold bytes, en ambos sentidos.
+        breaker: CircuitBreaker por destino; mientras el circuito está abierto send_message
+                 devuelve None al instante en lugar de esperar el timeout de conexión
+        on_failure: callback(ip, port) cuando no se puede conectar o enviar a ese destino, o
+                    cuando sus respuestas que no llegan a tiempo abren el circuito; un timeout
+                    suelto (par vivo pero lento) o un fast-fail con el circuito abierto no lo llaman
+        """
+        self.breaker = breaker or CircuitBreaker()
+        self.on_failure = on_failure
+        self._local_endpoints: dict[tuple, str] = {}  # (ip, port) -> socket Unix del par en este host
+        self.pool = ConnectionPool(max_per_peer=max_connections_per_peer, idle_timeout=idle_timeout, connect=self._connect)
+        self.multiplex = multiplex
+        self.codec = get_codec(codec)
+        self._mux_conns: dict[tuple, MultiplexedConnection] = {}
+        self._mux_lock = threading.Lock()  # protege los dicts, nunca se toma durante I/O
+        self._mux_key_locks: dict[tuple, threading.Lock] = {}  # uno por destino: serializa su conexión
+        self._mux_reaper: threading.Thread | None = None  # cierra las multiplexadas ociosas (idle_timeout del pool)
+        self._mux_reaper_stop = threading.Event()
+        self._json_only_peers: set[tuple] = set()  # destinos que no respondieron a la negociación
+        self._async_workers = async_workers
+        self._async_queue = async_queue
+        self._async_pool: WorkerPool | None = None  # se crea con el primer send_message_async
+        self._transfer_workers = transfer_workers
+        self._transfer_pool: WorkerPool | None = None  # se crea con el primer send_transfer_async
+        self.metrics = metrics
+        self.compression = compression
+        self.compress_threshold = compress_threshold
 
     def send_message(self, dst_ip: str, dst_port: int, message: Message, await_response: bool = True, timeout: float = 1.0):
         """
-        Envía un Message a un nodo destino.
+        Envía un Message a un nodo destino usando una conexión persistente del pool.
         timeout: tiempo máximo para conectar y recibir respuesta
         """
-        sock = None
+        if not self.breaker.allow((dst_ip, dst_port)):
+            logger.debug("Circuito abierto hacia %s:%s, fast-fail de '%s'", dst_ip, dst_port, message.header.get("type"))
+            self._observe(message, "fast_fail", 1)
+            return None
+
+        started = time.perf_counter()
+        if self.multiplex:
+            response, sent = self._send_multiplexed(dst_ip, dst_port, message, await_response, timeout)
+        else:
+            response, sent = self._send_pooled(dst_ip, dst_port, message, await_response, timeout)
+        self._record_outcome((dst_ip, dst_port), sent and (response is not None or not await_response), timeout=sent)
+
+        if self.metrics is not None:
+            type = message.header.get("type")
+            self.metrics.observe("client", type, "total_us", time.perf_counter() - started)
+            if await_response and response is None:
+                self.metrics.observe("client", type, "failed", 1)
+        return response
+
+    def send_message_async(self, dst_ip: str, dst_port: int, message: Message, timeout: float = 1.0) -> Future:
+        """
+        Envía un Message sin bloquear al llamador y devuelve un Future con la respuesta
+        (None si no llegó). Permite lanzar peticiones a varios nodos en paralelo y luego
+        recoger los resultados (concurrent.futures.wait / as_completed, asyncio.wrap_future).
+        """
+        with self._mux_lock:
+            if self._async_pool is None:
+                self._async_pool = WorkerPool(max_workers=self._async_workers, max_queue=self._async_queue, name="send-async")
+            pool = self._async_pool
         try:
-            sock = self._connect(dst_ip, dst_port, timeout)
-            if sock is None:
-                return None
-            
-            self._send_raw(sock, message)
-            if await_response:
-                response = self._recv_response(sock, timeout)
-                return response
+            return pool.submit(self.send_message, dst_ip, dst_port, message, True, timeout)
+        except WorkerPoolBusy as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def send_message_dedicated(self, dst_ip: str, dst_port: int, message: Message, timeout: float = 1.0,
+                               connect_timeout: float = 1.0):
+        """
+        Envía por una conexión propia, fuera del pool, y la cierra al recibir la respuesta.
+        Para peticiones que esperan mucho (transferencias): no ocupan ninguna de las
+        max_connections_per_peer conexiones que usan las RPC cortas hacia ese destino.
+        La conexión no negocia codec ni compresión (JSON).
+        """
+        key = (dst_ip, dst_port)
+        if not self.breaker.allow(key):
+            self._observe(message, "fast_fail", 1)
             return None
+        started = time.perf_counter()
+        response = None
+        sent = False
+        sock = self._connect(dst_ip, dst_port, min(timeout, connect_timeout))
+        if sock is not None:
+            try:
+                sent = self._send_raw(sock, message)
+                if sent:
+                    response, _ = self._recv_response(sock, timeout)
+            finally:
+                sock.close()
+        self._record_outcome(key, response is not None, timeout=sent)
+        self._observe(message, "total_us", time.perf_counter() - started)
+        if response is None:
+            self._observe(message, "failed", 1)
+        return response
+
+    def send_transfer_async(self, dst_ip: str, dst_port: int, message: Message, timeout: float) -> Future:
+        """
+        send_message_dedicated en un pool propio (transfer_workers hilos): las peticiones
+        largas no ocupan los hilos de send_message_async.
+        """
+        with self._mux_lock:
+            if self._transfer_pool is None:
+                self._transfer_pool = WorkerPool(max_workers=self._transfer_workers, max_queue=self._async_queue, name="send-transfer")
+            pool = self._transfer_pool
+        try:
+            return pool.submit(self.send_message_dedicated, dst_ip, dst_port, message, timeout)
+        except WorkerPoolBusy as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def send_stream(self, dst_ip: str, dst_port: int, message: Message, timeout: float = 5.0):
+        """
+        Envía una petición cuyo handler responde en streaming y devuelve un iterador sobre
+        los datos de cada chunk. La petición se envía al pedir el primer chunk y cada uno se
+        lee del socket solo cuando se pide: si el consumidor va lento, el servidor se frena
+        (control de flujo de TCP) y ningún lado acumula la respuesta entera en memoria.
+
+        timeout: espera máxima por cada chunk (no por el stream completo).
+        Lanza StreamError si el stream no termina bien. Si se deja de iterar antes del final
+        la conexión se descarta en lugar de volver al pool.
+        Siempre usa una conexión del pool, también con multiplex=True.
+        """
+        key = (dst_ip, dst_port)
+        if not self.breaker.allow(key):
+            self._observe(message, "fast_fail", 1)
+            raise StreamError(f"circuito abierto hacia {dst_ip}:{dst_port}")
+
+        conn = self._acquire(dst_ip, dst_port, timeout)
+        if conn is None:
+            self._record_outcome(key, False)
+            raise StreamError(f"no se pudo conectar a {dst_ip}:{dst_port}")
+        if not self._send_raw(conn.sock, message, conn.codec, conn.compression):
+            self.pool.discard(conn)
+            self._record_outcome(key, False)
+            raise StreamError(f"error enviando '{message.header.get('type')}' a {dst_ip}:{dst_port}")
+
+        clean = False
+        answered = False
+        count = 0
+        try:
+            for response in self._recv_stream(conn.sock, timeout):
+                if not answered:
+                    answered = True
+                    self._record_outcome(key, True)
+                type = response.header.get("type")
+                payload = response.payload or {}
+                if type == STREAM_CHUNK_TYPE:
+                    if payload.get("seq") != count:
+                        raise StreamError(f"chunk fuera de orden: {payload.get('seq')} (esperado {count})")
+                    count += 1
+                    yield payload.get("data")
+                    continue
+
+                clean = True
+                if type != STREAM_END_TYPE:
+                    raise StreamError(f"respuesta no streaming '{type}'", response=response)
+                if payload.get("status") != "OK":
+                    raise StreamError(payload.get("error_msg") or "error en el stream", response=response)
+                if payload.get("count") != count:
+                    clean = False
+                    raise StreamError(f"stream incompleto: {count} de {payload.get('count')} chunks")
+                return
+            raise StreamError(f"conexión cerrada tras {count} chunks")
         finally:
-            if sock is not None:
-                try:
-                    sock.close()
-                except Exception:
-                    logger.exception("Error cerrando socket")
+            if not answered:
+                self._record_outcome(key, False, timeout=True)
+            self._observe(message, "stream_chunks", count)
+            self.pool.release(conn, reusable=clean)
+
+    def register_local_endpoint(self, ip: str, port: int, path: str):
+        """Indica que el nodo ip:port está en este host y escucha también en el socket Unix path."""
+        if self._local_endpoints.get((ip, port)) != path:
+            logger.debug("Endpoint local para %s:%s -> %s", ip, port, path)
+            self._local_endpoints[(ip, port)] = path
+
+    def connect(self, dst_ip: str, dst_port: int, timeout: float = 1.0) -> bool:
+        """Abre por adelantado una conexión persistente hacia el destino."""
+        conn = self._acquire(dst_ip, dst_port, timeout)
+        self._record_outcome((dst_ip, dst_port), conn is not None)
+        if conn is None:
+            return False
+        self.pool.release(conn)
+        return True
+
+    def reap_idle_mux(self) -> int:
+        """
+        Cierra las conexiones multiplexadas sin peticiones en vuelo y sin usar en más de
+        idle_timeout (el del pool), y olvida las que ya cerró el par. Devuelve cuántas quitó.
+        """
+        now = time.monotonic()
+        with self._mux_lock:
+            expired = [key for key, conn in self._mux_conns.items()
+                       if conn.closed or (conn.in_flight() == 0 and now - conn.last_used > self.pool.idle_timeout)]
+            conns = [self._mux_conns.pop(key) for key in expired]
+            for key in expired:
+                key_lock = self._mux_key_locks.get(key)
+                if key_lock is not None and not key_lock.locked():
+                    del self._mux_key_locks[key]
+        for conn in conns:
+            conn.close()
+        if conns:
+            logger.debug("Reaper cerró %d conexiones multiplexadas", len(conns))
+        return len(conns)
+
+    def close(self):
+        """Cierra todas las conexiones persistentes."""
+        self.pool.close_all()
+        self._mux_reaper_stop.set()
+        with self._mux_lock:
+            conns = list(self._mux_conns.values())
+            self._mux_conns.clear()
+            pools = (self._async_pool, self._transfer_pool)
+            self._async_pool = self._transfer_pool = None
+        for conn in conns:
+            conn.close()
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
 
     # ---------------- Métodos internos ----------------
-    def _connect(self, ip: str, port: int, timeout: float):
-        """Crea y conecta un socket TCP al destino con timeout."""
-        sock = None
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect((ip, port))
-        except Exception:
-            if sock:
-                try:
-                    sock.close()
-                except Exception:
-                    pass
+    def _send_pooled(self, dst_ip: str, dst_port: int, message: Message, await_response: bool, timeout: float):
+        """
+        Envía por una conexión persistente del pool y espera la respuesta en el mismo socket.
+        Devuelve (respuesta, si se llegó a enviar la petición).
+        """
+        started = time.perf_counter()
+        conn = self._acquire(dst_ip, dst_port, timeout)
+        if conn is None:
+            return None, False
+        self._observe(message, "connect_us", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        if not self._send_raw(conn.sock, message, conn.codec, conn.compression):
+            self.pool.discard(conn)
+            if conn.uses <= 1:
+                return None, False
+            # La conexión reutilizada pudo ser cerrada por el par: reintento único con una nueva
+            conn = self._acquire(dst_ip, dst_port, timeout)
+            if conn is None:
+                return None, False
+            if not self._send_raw(conn.sock, message, conn.codec, conn.compression):
+                self.pool.discard(conn)
+                return None, False
+        self._observe(message, "send_us", time.perf_counter() - started)
+
+        if not await_response:
+            # El servidor puede contestar igualmente; esa respuesta quedaría en el socket
+            # y se confundiría con la del siguiente mensaje, así que no se reutiliza.
+            self.pool.discard(conn)
+            return None, True
+
+        started = time.perf_counter()
+        response, clean = self._recv_response(conn.sock, timeout)
+        self.pool.release(conn, reusable=clean)
+        self._observe(message, "wait_us", time.perf_counter() - started)
+        return response, True
+
+    def _acquire(self, ip: str, port: int, timeout: float):
+        """Obtiene una conexión del pool; si es nueva negocia antes su codec y compresión."""
+        conn = self.pool.acquire(ip, port, timeout)
+        if conn is None or conn.codec is not None:
+            return conn
+
+        agreed = self._negotiate(conn.sock, conn.key, timeout)
+        if agreed is None:
+            # Sin respuesta a la negociación: puede llegar tarde, así que el socket no se reutiliza
+            self.pool.discard(conn)
+            conn = self.pool.acquire(ip, port, timeout)
+            if conn is None:
+                return None
+            agreed = (DEFAULT_CODEC, None)
+        conn.codec, conn.compression = agreed
+        return conn
+
+    def _negotiate(self, sock, key: tuple, timeout: float):
+        """
+        Ofrece self.codec y self.compression al servidor y devuelve (codec, compresión) acordados.
+        Devuelve None si el servidor no contestó (se recuerda y no se vuelve a intentar).
+        """
+        # Por un socket Unix comprimir solo gasta CPU
+        compression = None if sock.family == socket.AF_UNIX else self.compression
+        if (self.codec is DEFAULT_CODEC and compression is None) or key in self._json_only_peers:
+            return DEFAULT_CODEC, None
+
+        hello = hello_message(src=None, codecs=[self.codec.name, DEFAULT_CODEC.name],
+                              compression=[compression] if compression else None)
+        if not self._send_raw(sock, hello, DEFAULT_CODEC):
             return None
-        return sock
+        response, _ = self._recv_response(sock, timeout)
+        if response is None or response.header.get("type") != HELLO_RESPONSE_TYPE:
+            logger.debug("%s:%s no negoció codec, usando JSON", *key)
+            self._json_only_peers.add(key)
+            return None
+        return get_codec(response.payload.get("codec")), response.payload.get("compression")
+
+    def _send_multiplexed(self, dst_ip: str, dst_port: int, message: Message, await_response: bool, timeout: float):
+        """
+        Envía por la conexión multiplexada del destino, creándola si no existe o se cerró.
+        Devuelve (respuesta, si se llegó a enviar la petición).
+        """
+        started = time.perf_counter()
+        conn = self._get_mux_connection(dst_ip, dst_port, timeout)
+        if conn is None:
+            return None, False
+        self._observe(message, "connect_us", time.perf_counter() - started)
+        if not await_response:
+            return None, conn.send(message)
+        started = time.perf_counter()
+        response = conn.request(message, timeout)
+        self._observe(message, "wait_us", time.perf_counter() - started)
+        return response, True
+
+    def _get_mux_connection(self, ip: str, port: int, timeout: float) -> MultiplexedConnection | None:
+        key = (ip, port)
+        with self._mux_lock:
+            conn = self._mux_conns.get(key)
+            if conn is not None and not conn.closed:
+                conn.last_used = time.monotonic()  # con el lock: el reaper ya no la cierra
+                return conn
+            key_lock = self._mux_key_locks.setdefault(key, threading.Lock())
+
+        # Se conecta con el lock de ese destino para no abrir dos conexiones al mismo par;
+        # un destino que no responde solo hace esperar a quien le habla a él
+        if not key_lock.acquire(timeout=timeout):
+            return None
+        try:
+            with self._mux_lock:
+                conn = self._mux_conns.get(key)
+                if conn is not None and not conn.closed:
+                    conn.last_used = time.monotonic()
+                    return conn
+
+            sock = self._connect(ip, port, timeout)
+            if sock is None:
+                with self._mux_lock:
+                    self._mux_conns.pop(key, None)
+                return None
+            agreed = self._negotiate(sock, key, timeout)
+            if agreed is None:
+                sock.close()
+                sock = self._connect(ip, port, timeout)
+                if sock is None:
+                    return None
+                agreed = (DEFAULT_CODEC, None)
+            codec, compression = agreed
+            conn = MultiplexedConnection(sock, key, codec, compression, self.compress_threshold)
+            with self._mux_lock:
+                self._mux_conns[key] = conn
+                self._ensure_mux_reaper()
+            return conn
+        finally:
+            key_lock.release()
+
+    def _ensure_mux_reaper(self):
+        """Arranca el reaper de conexiones multiplexadas con la primera (llamar con _mux_lock tomado)."""
+        if self._mux_reaper is None and self.pool.idle_timeout > 0 and not self._mux_reaper_stop.is_set():
+            self._mux_reaper = threading.Thread(target=self._mux_reaper_loop, daemon=True)
+            self._mux_reaper.start()
+
+    def _mux_reaper_loop(self):
+        while not self._mux_reaper_stop.wait(self.pool.reap_interval):
+            try:
+                self.reap_idle_mux()
+            except Exception:
+                logger.exception("Error en reaper de conexiones multiplexadas")
 
-    def _send_raw(self, sock, message: Message):
-        """Envía el mensaje serializado por TCP."""
-        data = message.to_json().encode()
+    def _connect(self, ip: str, port: int, timeout: float):
+        """
+        Abre una conexión al destino. El resultado no se registra en el circuit breaker: lo hace
+        quien envía la petición, al saber si hubo respuesta (la conexión puede venir del pool).
+        Si el par está en el mismo host (endpoint registrado o socket publicado en COMM_UDS_DIR)
+        se usa su Unix domain socket, con TCP como respaldo.
+        """
+        key = (ip, port)
+        path = self._local_endpoints.get(key) or uds_path_for(ip, port)
+        if path and os.path.exists(path):
+            sock = open_unix_connection(path, timeout)
+            if sock is not None:
+                return sock
+            logger.debug("Socket Unix %s no disponible, usando TCP hacia %s:%s", path, ip, port)
+            self._local_endpoints.pop(key, None)
+
+        return open_connection(ip, port, timeout)
+
+    def _record_outcome(self, key: tuple, ok: bool, timeout: bool = False):
+        """
+        Resultado de una petición para el circuit breaker del destino (también cierra o reabre la sonda).
+        timeout: la petición se envió pero la respuesta no llegó a tiempo (cuenta aparte).
+        """
+        if ok:
+            self.breaker.record_success(key)
+            return
+        opened = self.breaker.record_failure(key, timeout=timeout)
+        if self.on_failure is not None and (opened or not timeout):
+            try:
+                self.on_failure(*key)
+            except Exception:
+                logger.exception("Error en on_failure para %s:%s", *key)
+
+    def _observe(self, message: Message, name: str, value: float):
+        if self.metrics is not None:
+            self.metrics.observe("client", message.header.get("type"), name, value)
+
+    def _send_raw(self, sock, message: Message, codec=DEFAULT_CODEC, compression: str = None) -> bool:
+        """Envía el mensaje serializado (y comprimido si procede) por TCP. Devuelve False si falló el envío."""
+        data = compress_frame(codec.encode(message), compression, self.compress_threshold,
+                              metrics=self.metrics, side="client", type=message.header.get("type"))
+        self._observe(message, "request_bytes", len(data))
         try:
-            sock.send(data)
+            sock.sendall(data)
+            return True
         except Exception:
-            logger.exception("Error enviando mensaje a %s", message.header.get("dst"))
+            logger.debug("Error enviando mensaje a %s", message.header.get("dst"), exc_info=True)
+            return False
 
-    def _recv_response(self, sock, timeout: float) -> Message:
-        """Recibe un Message de respuesta del servidor con timeout."""
+    def _recv_stream(self, sock, timeout: float):
+        """Genera los mensajes que llegan por sock hasta que se deje de iterar; timeout por mensaje."""
         sock.settimeout(timeout)
-        buffer = ""
+        reader = FrameReader(initial_size=4096)
         while True:
             try:
-                data = sock.recv(1024).decode()
+                frame = reader.next_frame()
+                if frame is None:
+                    if not reader.recv_from(sock):
+                        return
+                    continue
+            except socket.timeout:
+                raise StreamError("timeout esperando el siguiente chunk")
+            except (OSError, ValueError) as e:
+                raise StreamError(f"error recibiendo el stream: {e}")
+            codec, body = frame
+            yield codec.decode(body)
+
+    def _recv_response(self, sock, timeout: float) -> tuple[Message | None, bool]:
+        """
+        Recibe un Message de respuesta del servidor con timeout, en el codec en que llegue.
+        Devuelve (respuesta, limpia): limpia indica si la conexión quedó sin bytes
+        pendientes y puede volver al pool.
+        """
+        sock.settimeout(timeout)
+        reader = FrameReader(initial_size=4096)
+        while True:
+            try:
+                n = reader.recv_from(sock)
             except socket.timeout:
                 logger.debug("Timeout esperando respuesta")
-                return None
+                return None, False
             except Exception:
                 logger.exception("Error recibiendo respuesta")
-                return None
-            if not data:
+                return None, False
+            if not n:
                 break
-            buffer += data
-            if "\n" in buffer:
-                line, _ = buffer.split("\n", 1)
+            try:
+                frame = reader.next_frame()
+            except ValueError:
+                logger.exception("Trama de respuesta inválida")
+                return None, False
+            if frame:
+                codec, body = frame
                 try:
-                    response = Message.from_json(line)
+                    response = codec.decode(body)
                     logger.debug("Respuesta recibida de %s: %s", response.header.get("src"), response.header.get("type"))
-                    return response
+                    return response, not reader.pending()
                 except Exception:
                     logger.exception("Error parseando respuesta")
-                    return None
-        return None
\ No newline at end of file
+                    return None, False
+        return None, False
@@ -1,62 +1,111 @@
 import socket
+import struct
 import threading
+import time
 import logging
 from comm import Message
+from comm.codec import DEFAULT_CODEC, HELLO_TYPE, HELLO_RESPONSE_TYPE, choose_codec
+from comm.compression import choose_compression, compress_frame
+from comm.deadline import on_arrival
+from comm.framing import FrameReader
+from comm.local_transport import bind_unix_socket, remove_unix_socket
+from comm.streaming import is_stream, send_with_backpressure, stream_messages
+from comm.worker_pool import WorkerPool, WorkerPoolBusy
 
 logger = logging.getLogger("dftp.comm.tcp_server")
 
 class TCPServer:
-    def __init__(self, ip: str, port: int, on_message):
+    def __init__(self, ip: str, port: int, on_message, metrics=None, uds_path: str = None, max_workers: int = 16,
+                 executor=None, on_busy=None):
         """
         ip: dirección del servidor
         port: puerto del servidor
         on_message: callback que recibe Message y socket cliente
                     debe devolver un objeto Message como respuesta, o None
+                    (o un iterador de chunks para responder en streaming, ver comm.streaming)
+        metrics: comm.metrics.Metrics donde registrar tamaños, espera en cola y tiempo de handler por tipo
+        uds_path: si se indica, escucha además en ese Unix domain socket (nodos del mismo host)
+        max_workers: hilos del WorkerPool propio donde se ejecuta on_message
+        executor: pool externo para on_message (p.ej. los carriles del nodo); si se pasa se
+                  ignora max_workers y el servidor no lo detiene
+        on_busy: callback(Message) -> Message para contestar cuando executor rechaza la tarea
         """
         self.ip = ip
         self.port = port
         self.on_message = on_message
+        self.metrics = metrics
+        self.uds_path = uds_path
+        self.max_workers = max_workers
+        self.on_busy = on_busy
+        self._own_executor = executor is None
+        self._executor = executor
         self.running = False
         self.server_thread = None
         self.listen_socket = None
+        self.uds_thread = None
+        self.uds_socket = None
 
     # ---------------- Métodos públicos ----------------
     def start(self):
         """Inicia el servidor en un hilo independiente."""
+        if self.running:
+            return
         self._create_socket()
+        if self._own_executor:
+            self._executor = WorkerPool(max_workers=self.max_workers, max_queue=256, name=f"tcp-{self.port}")
         self.running = True
-        self.server_thread = threading.Thread(target=self._server_loop, daemon=True)
+        self.server_thread = threading.Thread(target=self._server_loop, args=(self.listen_socket,), daemon=True)
         self.server_thread.start()
+        if self.uds_path:
+            self.uds_socket = bind_unix_socket(self.uds_path)
+            self.uds_socket.listen(128)
+            self.uds_socket.settimeout(0.5)
+            self.uds_thread = threading.Thread(target=self._server_loop, args=(self.uds_socket,), daemon=True)
+            self.uds_thread.start()
 
     def stop(self):
         """Detiene el servidor y cierra conexiones."""
         self.running = False
-        if self.listen_socket:
-            try:
-                self.listen_socket.close()
-            except Exception:
-                logger.exception("Error cerrando socket de escucha")
+        for sock in (self.listen_socket, self.uds_socket):
+            if sock:
+                try:
+                    sock.close()
+                except Exception:
+                    logger.exception("Error cerrando socket de escucha")
+        # El puerto no queda libre hasta que el hilo sale de accept()
+        for thread in (self.server_thread, self.uds_thread):
+            if thread and thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        if self.uds_socket:
+            remove_unix_socket(self.uds_path)
+            self.uds_socket = None
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
         logger.info("TCPServer detenido")
 
     # ---------------- Métodos internos ----------------
     def _create_socket(self):
         """Crea y configura el socket de escucha."""
         self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.listen_socket.bind((self.ip, self.port))
         self.listen_socket.listen(5)
         self.listen_socket.settimeout(0.5) 
 
-    def _server_loop(self):
+    def _server_loop(self, listen_socket):
         logger.debug("Entrando a server_loop")
         while self.running:
             logger.debug("Esperando accept()... Running:%s", self.running)
             try:
-                client_sock, addr = self.listen_socket.accept()
+                client_sock, addr = listen_socket.accept()
             except socket.timeout:
                 # demasiado ruidoso para INFO; dejar DEBUG
                 logger.debug("accept() timeout")
                 continue
             except Exception:
+                if not self.running:
+                    break
                 logger.exception("Error en accept()")
                 continue
             
@@ -67,12 +116,15 @@ class TCPServer:
 
     def _handle_client(self, client_sock, addr):
         logger.debug("Hilo de cliente iniciado: %s", addr)
-        buffer = b""
+        reader = FrameReader()
+        send_lock = threading.Lock()  # varias respuestas multiplexadas pueden escribirse a la vez
+        compression = None  # algoritmo acordado en COMM_HELLO para las respuestas de esta conexión
+        pending = None  # última petición no multiplexada en el pool
         client_sock.settimeout(0.5)
         try:
             while self.running:
                 try:
-                    data = client_sock.recv(1024)
+                    n = reader.recv_from(client_sock)
                 except socket.timeout:
                     logger.debug("recv() timeout %s", addr)
                     continue
@@ -80,24 +132,129 @@ class TCPServer:
                     logger.exception("Error en recv()")
                     break
 
-                if not data:
+                if not n:
                     logger.debug("recv() devolvió 0 bytes, desconectando %s", addr)
                     break
-                logger.debug("Datos recibidos de %s: %d bytes", addr, len(data))
-                buffer += data
-                while b"\n" in buffer:
-                    line, buffer = buffer.split(b"\n", 1)
+                logger.debug("Datos recibidos de %s: %d bytes", addr, n)
+                try:
+                    frames = list(iter(reader.next_frame, None))
+                except ValueError:
+                    logger.exception("Trama inválida de %s, cerrando conexión", addr)
+                    break
+
+                for codec, body in frames:
                     try:
-                        msg = Message.from_json(line.decode())
-                        response = self.on_message(msg, client_sock)
-                        if response:
-                            logger.debug("Enviando respuesta a %s: %s", addr, response.header.get("type"))
-                            client_sock.sendall(response.to_json().encode())
+                        msg = codec.decode(body)
                     except Exception:
-                        logger.exception("Error procesando mensaje de %s", addr)
+                        logger.exception("Error parseando mensaje de %s", addr)
+                        continue
+                    on_arrival(msg)
+                    if self.metrics is not None:
+                        self.metrics.observe("server", msg.header.get("type"), "request_bytes", len(body))
+
+                    if msg.header.get("type") == HELLO_TYPE:
+                        compression = self._answer_hello(msg, client_sock, send_lock)
+                    elif msg.metadata.get("mux"):
+                        # Petición multiplexada: se atiende en el pool y la respuesta se
+                        # correlaciona por reply_to, sin bloquear las siguientes del socket.
+                        self._submit(msg, codec, client_sock, addr, send_lock, compression)
+                    else:
+                        # El worker envía la respuesta: este hilo sigue leyendo sin esperar al
+                        # handler. Sin mux el cliente no manda otra petición hasta tener la
+                        # respuesta; si aun así llega, se espera a la anterior para contestar en orden.
+                        if pending is not None:
+                            pending.result()
+                        pending = self._submit(msg, codec, client_sock, addr, send_lock, compression)
         finally:
+            if not self.running:
+                # Al detenerse es el servidor quien cierra las conexiones persistentes de
+                # los clientes: cierre abortivo (RST) para no dejar el puerto en TIME_WAIT.
+                try:
+                    client_sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                except Exception:
+                    pass
             try:
                 client_sock.close()
             except Exception:
                 logger.exception("Error cerrando socket cliente %s", addr)
             logger.debug("Cliente %s desconectado", addr)
+
+    def _answer_hello(self, hello: Message, client_sock, send_lock) -> str | None:
+        """
+        Negociación de codec y compresión: responde (siempre en JSON) con lo elegido
+        y devuelve el algoritmo de compresión acordado para la conexión.
+        """
+        compression = choose_compression(hello.payload.get("compression"))
+        response = Message(type=HELLO_RESPONSE_TYPE, src=self.ip, dst=hello.header.get("src"),
+                           payload={"codec": choose_codec(hello), "compression": compression})
+        with send_lock:
+            client_sock.sendall(DEFAULT_CODEC.encode(response))
+        return compression
+
+    def _submit(self, msg: Message, codec, client_sock, addr, send_lock, compression):
+        """
+        Encola _process_message en el pool. Si la cola está llena contesta on_busy (COMM_BUSY)
+        desde este hilo y devuelve None.
+        """
+        try:
+            return self._executor.submit(self._process_message, msg, codec, client_sock, addr, send_lock, compression,
+                                         time.perf_counter())
+        except WorkerPoolBusy:
+            if self.metrics is not None:
+                self.metrics.observe("server", msg.header.get("type"), "rejected", 1)
+            busy = self.on_busy(msg) if self.on_busy else None
+            if busy is not None:
+                try:
+                    self._send_response(msg, busy, codec, client_sock, send_lock, compression)
+                except OSError:
+                    logger.debug("Conexión con %s cerrada al rechazar la petición", addr)
+            return None
+
+    def _process_message(self, msg: Message, codec, client_sock, addr, send_lock, compression=None, enqueued_at: float = None):
+        """
+        Ejecuta on_message (en un hilo del pool) y envía la respuesta, en el mismo codec que
+        la petición, marcada con reply_to = msg_id de la petición y comprimida si se negoció.
+        Si on_message devuelve un iterador la respuesta se envía en streaming desde este hilo.
+        """
+        try:
+            response = self._timed_handler(msg, client_sock, enqueued_at)
+            if is_stream(response):
+                messages = stream_messages(self.ip, msg, response)
+                try:
+                    for chunk in messages:
+                        self._send_response(msg, chunk, codec, client_sock, send_lock, compression)
+                finally:
+                    messages.close()
+            elif response:
+                logger.debug("Enviando respuesta a %s: %s", addr, response.header.get("type"))
+                self._send_response(msg, response, codec, client_sock, send_lock, compression)
+        except OSError:
+            # El cliente cerró la conexión (p.ej. abandonó un stream a medias)
+            logger.debug("Conexión con %s cerrada al enviar la respuesta", addr)
+        except Exception:
+            logger.exception("Error procesando mensaje de %s", addr)
+
+    def _timed_handler(self, msg: Message, client_sock, enqueued_at: float | None):
+        """Ejecuta on_message registrando espera en cola, tiempo de handler y total."""
+        if self.metrics is None or enqueued_at is None:
+            return self.on_message(msg, client_sock)
+        started = time.perf_counter()
+        type = msg.header.get("type")
+        try:
+            return self.on_message(msg, client_sock)
+        finally:
+            finished = time.perf_counter()
+            self.metrics.observe("server", type, "queue_us", started - enqueued_at)
+            self.metrics.observe("server", type, "handler_us", finished - started)
+            self.metrics.observe("server", type, "total_us", finished - enqueued_at)
+
+    def _send_response(self, msg: Message, response: Message, codec, client_sock, send_lock, compression):
+        msg_id = msg.metadata.get("msg_id")
+        if msg_id is not None:
+            response.metadata["reply_to"] = msg_id
+        data = compress_frame(codec.encode(response), compression, metrics=self.metrics, side="server", type=msg.header.get("type"))
+        if self.metrics is not None:
+            self.metrics.observe("server", msg.header.get("type"), "response_bytes", len(data))
+        with send_lock:
+            # Un cliente lento llena el buffer de envío: se espera a que lea (control de flujo de TCP)
+            send_with_backpressure(client_sock, data, alive=lambda: self.running)
@@ -0,0 +1,72 @@
+import unittest
+import socket
+import threading
+import time
+from comm import Message, AsyncTCPServer, TCPClient, CommunicationNode
+
+class TestAsyncTCPServer(unittest.TestCase):
+
+    def setUp(self):
+        """Levanta un AsyncTCPServer con un handler síncrono de eco."""
+        self.ip = "127.0.0.1"
+        self.port = 9440
+
+        def handler(msg, sock):
+            if msg.header["type"] == "SLOW":
+                time.sleep(0.3)
+            return Message(type="RESPONSE", src="server", dst=msg.header["src"], payload=msg.payload)
+
+        self.server = AsyncTCPServer(self.ip, self.port, handler, max_workers=4)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_send_receive(self):
+        """La API de callbacks de TCPServer funciona igual sobre el event loop."""
+        client = TCPClient()
+        msg = Message(type="TEST", src="client", dst="server", payload={"data": 123})
+        response = client.send_message(self.ip, self.port, msg)
+        self.assertEqual(response.payload["data"], 123)
+        self.assertEqual(response.metadata["reply_to"], msg.metadata["msg_id"])
+        client.close()
+
+    def test_many_concurrent_connections(self):
+        """Muchas conexiones simultáneas se atienden sin crear un hilo por conexión."""
+        threads_before = threading.active_count()
+        socks = [socket.create_connection((self.ip, self.port)) for _ in range(50)]
+        for i, sock in enumerate(socks):
+            sock.sendall(Message(type="TEST", src="client", payload={"i": i}).to_json().encode())
+        for i, sock in enumerate(socks):
+            line = sock.makefile("rb").readline()
+            self.assertEqual(Message.from_json(line.decode()).payload["i"], i)
+
+        # 50 conexiones abiertas; como mucho crecen los hilos del pool de handlers
+        self.assertLessEqual(threading.active_count() - threads_before, 4)
+        for sock in socks:
+            sock.close()
+
+    def test_multiplexed_requests_run_concurrently(self):
+        """Las peticiones multiplexadas de una misma conexión se ejecutan en paralelo en el pool."""
+        client = TCPClient(multiplex=True)
+        start = time.monotonic()
+        threads = [threading.Thread(target=client.send_message, args=(self.ip, self.port, Message(type="SLOW", src="c", payload={})), kwargs={"timeout": 2.0}) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.monotonic() - start, 1.0)
+        client.close()
+
+    def test_communication_node_async_mode(self):
+        """CommunicationNode acepta server_mode='async' con handlers registrados como siempre."""
+        node = CommunicationNode(node_name="node_async", ip=self.ip, port=9441, server_mode="async")
+        node.register_handler("ECHO", lambda msg, sock: Message(type="ECHO_RESPONSE", src="node_async", dst=msg.header["src"], payload=msg.payload))
+        try:
+            response = node.send_message(self.ip, 9441, Message(type="ECHO", src="client", payload={"text": "hola"}))
+            self.assertEqual(response.payload["text"], "hola")
+        finally:
+            node.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
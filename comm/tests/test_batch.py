@@ -0,0 +1,46 @@
+import unittest
+from comm import CommunicationNode, Message
+from comm.batch import batch_message, unpack_batch
+
+class TestBatch(unittest.TestCase):
+
+    def test_pack_unpack(self):
+        """Los sub-mensajes de un COMM_BATCH conservan header, payload y msg_id."""
+        messages = [Message(type="CHECK_USER", src="p", dst="d", payload={"user": f"u{i}"}) for i in range(3)]
+        batch = batch_message("p", "d", messages)
+        unpacked = unpack_batch(Message.from_json(batch.to_json()))
+        self.assertEqual([m.payload for m in unpacked], [m.payload for m in messages])
+        self.assertEqual([m.metadata["msg_id"] for m in unpacked], [m.metadata["msg_id"] for m in messages])
+
+    def test_send_batch_fans_out_to_handlers(self):
+        """send_batch devuelve una respuesta por mensaje, en orden, con None donde no hay handler."""
+        for mode in ("thread", "async"):
+            with self.subTest(mode=mode):
+                # Un único worker: si el batch reencolara sus sub-mensajes se bloquearía
+                server = CommunicationNode("server", "127.0.0.1", 9470, server_mode=mode, handler_workers=1)
+                client = CommunicationNode("client", "127.0.0.1", 9471)
+                server.register_handler("ECHO", lambda msg, sock: Message(type="ECHO_RESPONSE", src="server", payload=msg.payload))
+                try:
+                    messages = [
+                        Message(type="ECHO", src="client", payload={"i": 0}),
+                        Message(type="UNKNOWN", src="client"),
+                        Message(type="ECHO", src="client", payload={"i": 2}),
+                    ]
+                    responses = client.send_batch("127.0.0.1", 9470, messages)
+                    self.assertEqual(responses[0].payload, {"i": 0})
+                    self.assertIsNone(responses[1])
+                    self.assertEqual(responses[2].payload, {"i": 2})
+                finally:
+                    client.stop_server()
+                    server.stop_server()
+
+    def test_send_batch_without_peer(self):
+        """Sin respuesta del destino todas las respuestas son None."""
+        client = CommunicationNode("client", "127.0.0.1", 9472)
+        try:
+            self.assertEqual(client.send_batch("127.0.0.1", 9473, [Message(type="A", src="c")] * 2, timeout=0.3), [None, None])
+        finally:
+            client.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import time
+from comm.beacon import BeaconListener, BeaconSender, beacon_address
+
+
+class TestBeacon(unittest.TestCase):
+
+    def _wait_for(self, predicate, timeout=2.0):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if predicate():
+                return True
+            time.sleep(0.02)
+        return False
+
+    def test_broadcast_beacon_is_heard(self):
+        """Los beacons enviados al broadcast de la subred llegan a los listeners del puerto."""
+        listener = BeaconListener(9590, accept=lambda p: p.get("role") == "DISCOVERY")
+        listener.start()
+        sender = BeaconSender(beacon_address("127.0.0.0/8", "broadcast"), 9590,
+                              lambda: {"name": "d1", "ip": "127.0.0.1", "role": "DISCOVERY"}, interval=0.05)
+        sender.start()
+        try:
+            self.assertTrue(self._wait_for(lambda: listener.alive(1.0) == {"d1": "127.0.0.1"}))
+            self.assertTrue(listener.heard_any)
+            self.assertFalse(listener.scan_needed(1.0))
+        finally:
+            sender.stop()
+            listener.stop()
+
+    def test_multicast_and_filter(self):
+        """En multicast el listener se une al grupo; los beacons que no acepta se ignoran."""
+        group = beacon_address("127.0.0.0/8", "multicast")
+        listener = BeaconListener(9591, group=group, accept=lambda p: p.get("role") == "DISCOVERY")
+        listener.start()
+        other = BeaconSender(group, 9591, lambda: {"name": "x", "role": "DATA"}, interval=0.05)
+        other.start()
+        try:
+            time.sleep(0.3)
+            self.assertFalse(listener.heard_any)
+            self.assertTrue(listener.scan_needed(0.1))
+
+            other.payload_fn = lambda: {"name": "d2", "ip": "10.0.0.7", "role": "DISCOVERY"}
+            self.assertTrue(self._wait_for(lambda: "d2" in listener.alive(1.0)))
+            time.sleep(0.1)
+            other.stop()
+            self.assertEqual(listener.alive(0.0), {})  # caducado
+        finally:
+            listener.stop()
+
+
+    def test_own_beacon_ignored(self):
+        """El beacon propio no cuenta; sin beacons ajenos recientes hay que volver a barrer."""
+        listener = BeaconListener(9592, accept=lambda p: p.get("role") == "DISCOVERY", ignore="d1")
+        listener.start()
+        own = BeaconSender(beacon_address("127.0.0.0/8", "broadcast"), 9592,
+                           lambda: {"name": "d1", "ip": "127.0.0.1", "role": "DISCOVERY"}, interval=0.05)
+        own.start()
+        try:
+            time.sleep(0.3)
+            self.assertFalse(listener.heard_any)
+            self.assertTrue(listener.scan_needed(0.2))
+
+            other = BeaconSender(beacon_address("127.0.0.0/8", "broadcast"), 9592,
+                                 lambda: {"name": "d2", "ip": "127.0.0.2", "role": "DISCOVERY"}, interval=0.05)
+            other.start()
+            self.assertTrue(self._wait_for(lambda: not listener.scan_needed(0.2)))
+            other.stop()
+            self.assertTrue(self._wait_for(lambda: listener.scan_needed(0.2)))  # el otro dejó de anunciarse
+        finally:
+            own.stop()
+            listener.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
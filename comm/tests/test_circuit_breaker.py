@@ -0,0 +1,119 @@
+import time
+import unittest
+from comm import Message, TCPClient, TCPServer
+from comm.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_state_transitions(self):
+        """closed -> open tras el umbral, half_open al vencer el backoff, closed si la sonda conecta."""
+        breaker = CircuitBreaker(failure_threshold=2, base_backoff=0.1, max_backoff=1.0)
+        key = ("10.0.0.9", 9000)
+        breaker.record_failure(key)
+        self.assertEqual(breaker.state(key), CLOSED)
+        breaker.record_failure(key)
+        self.assertEqual(breaker.state(key), OPEN)
+        self.assertFalse(breaker.allow(key))
+
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow(key))
+        self.assertEqual(breaker.state(key), HALF_OPEN)
+        self.assertFalse(breaker.allow(key))  # una sola sonda a la vez
+
+        breaker.record_failure(key)  # la sonda falla: se reabre con más backoff
+        self.assertEqual(breaker.state(key), OPEN)
+        time.sleep(0.3)
+        self.assertTrue(breaker.allow(key))
+        breaker.record_success(key)
+        self.assertEqual(breaker.state(key), CLOSED)
+        self.assertEqual(breaker.stats()["fast_failed"], 2)
+
+    def test_timeouts_count_apart(self):
+        """Las respuestas que no llegan a tiempo tienen su propio umbral, más alto que el de conexión."""
+        breaker = CircuitBreaker(failure_threshold=2, timeout_threshold=3)
+        key = ("10.0.0.9", 9000)
+        self.assertFalse(breaker.record_failure(key, timeout=True))
+        self.assertFalse(breaker.record_failure(key, timeout=True))
+        self.assertFalse(breaker.record_failure(key))
+        self.assertEqual(breaker.state(key), CLOSED)
+        self.assertTrue(breaker.record_failure(key, timeout=True))
+        self.assertEqual(breaker.state(key), OPEN)
+
+    def test_idle_peers_are_forgotten(self):
+        """Los destinos sin fallos recientes (p.ej. IPs de un barrido) no se acumulan."""
+        breaker = CircuitBreaker(failure_threshold=1, base_backoff=0.05, forget_after=0.2)
+        for i in range(50):
+            breaker.record_failure((f"10.0.1.{i}", 9000))
+        self.assertEqual(breaker.stats()["open"], 50)
+        time.sleep(0.25)
+        breaker.record_failure(("10.0.2.1", 9000))
+        self.assertEqual(breaker.stats()["open"], 1)
+        self.assertEqual(breaker.state(("10.0.1.0", 9000)), CLOSED)
+
+    def test_dead_peer_fails_fast(self):
+        """Con el circuito abierto send_message no espera el timeout; al volver el par se recupera."""
+        client = TCPClient(breaker=CircuitBreaker(failure_threshold=2, base_backoff=0.3))
+        msg = Message(type="PING", src="client")
+        try:
+            for _ in range(2):
+                self.assertIsNone(client.send_message("127.0.0.1", 9530, msg, timeout=0.5))
+
+            start = time.perf_counter()
+            self.assertIsNone(client.send_message("127.0.0.1", 9530, msg, timeout=0.5))
+            self.assertLess(time.perf_counter() - start, 0.01)
+
+            server = TCPServer("127.0.0.1", 9530, lambda m, s: Message(type="PONG", src="server"))
+            server.start()
+            try:
+                time.sleep(0.4)
+                self.assertEqual(client.send_message("127.0.0.1", 9530, msg).header["type"], "PONG")
+                self.assertEqual(client.breaker.state(("127.0.0.1", 9530)), CLOSED)
+            finally:
+                client.close()
+                server.stop()
+        finally:
+            client.close()
+
+    def test_outcome_recorded_per_request(self):
+        """Un par que acepta conexiones pero no contesta abre el circuito, aunque reutilice la del pool."""
+        server = TCPServer("127.0.0.1", 9531, lambda m, s: time.sleep(m.payload["sleep"]) or Message(type="PONG", src="server"))
+        server.start()
+        failures = []
+        client = TCPClient(breaker=CircuitBreaker(failure_threshold=2, timeout_threshold=2, base_backoff=0.3),
+                           on_failure=lambda ip, port: failures.append((ip, port)))
+        key = ("127.0.0.1", 9531)
+        try:
+            self.assertIsNotNone(client.send_message("127.0.0.1", 9531, Message(type="PING", src="c", payload={"sleep": 0})))
+            for _ in range(2):
+                self.assertIsNone(client.send_message("127.0.0.1", 9531, Message(type="PING", src="c", payload={"sleep": 0.5}), timeout=0.1))
+            self.assertEqual(client.breaker.state(key), OPEN)
+
+            # Solo el timeout que abre el circuito avisa; con el circuito abierto ni se intenta
+            self.assertIsNone(client.send_message("127.0.0.1", 9531, Message(type="PING", src="c", payload={"sleep": 0})))
+            self.assertEqual(failures, [key])
+
+            # La sonda conecta pero no recibe respuesta: el circuito se reabre
+            time.sleep(0.4)
+            self.assertIsNone(client.send_message("127.0.0.1", 9531, Message(type="PING", src="c", payload={"sleep": 0.5}), timeout=0.1))
+            self.assertEqual(client.breaker.state(key), OPEN)
+            self.assertEqual(len(failures), 2)
+        finally:
+            client.close()
+            server.stop()
+
+    def test_slow_peer_keeps_circuit_closed(self):
+        """Unos pocos handlers lentos no abren el circuito: el par sigue atendiendo lo demás."""
+        server = TCPServer("127.0.0.1", 9532, lambda m, s: time.sleep(m.payload["sleep"]) or Message(type="PONG", src="server"))
+        server.start()
+        client = TCPClient(breaker=CircuitBreaker(failure_threshold=2))
+        try:
+            for _ in range(3):
+                self.assertIsNone(client.send_message("127.0.0.1", 9532, Message(type="PING", src="c", payload={"sleep": 0.3}), timeout=0.1))
+            self.assertEqual(client.breaker.state(("127.0.0.1", 9532)), CLOSED)
+            self.assertIsNotNone(client.send_message("127.0.0.1", 9532, Message(type="PING", src="c", payload={"sleep": 0})))
+        finally:
+            client.close()
+            server.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from comm import Message, TCPServer, TCPClient
+from comm.codec import BinaryCodec, JsonLineCodec
+from comm.framing import FrameReader
+
+
+def read_frames(data: bytes, reader: FrameReader = None) -> list:
+    """Tramas completas (codec, cuerpo) de data, leídas con FrameReader como en los servidores."""
+    reader = reader or FrameReader()
+    reader.feed(data)
+    return list(iter(reader.next_frame, None))
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_binary_roundtrip(self):
+        """Un Message codificado en binario se decodifica idéntico, incluso con saltos de línea."""
+        codec = BinaryCodec()
+        msg = Message(type="DISCOVERY_HEARTBEAT", src="10.0.0.2", dst=None, payload={"name": "n1", "text": "a\nb"})
+        frames = read_frames(codec.encode(msg))
+        self.assertEqual(len(frames), 1)
+        msg2 = frames[0][0].decode(frames[0][1])
+        self.assertEqual(msg2.header, msg.header)
+        self.assertEqual(msg2.payload, msg.payload)
+        self.assertEqual(msg2.metadata, msg.metadata)
+
+    def test_unknown_type_roundtrip(self):
+        """Los tipos sin código numérico viajan con su nombre en texto."""
+        codec = BinaryCodec()
+        msg = Message(type="CUSTOM_TYPE", src="a", dst="b", payload={})
+        frames = read_frames(codec.encode(msg))
+        self.assertEqual(frames[0][0].decode(frames[0][1]).header["type"], "CUSTOM_TYPE")
+
+    def test_long_fields_roundtrip(self):
+        """src, dst y nombres de tipo de más de 255 bytes, y un dst de exactamente 255, se conservan."""
+        codec = BinaryCodec()
+        for msg in (Message(type="T" * 300, src="s" * 300, dst="d" * 1000, payload={}),
+                    Message(type="CUSTOM_TYPE", src="a", dst="d" * 255, payload={}),
+                    Message(type="CUSTOM_TYPE", src="a", dst="", payload={})):
+            frames = read_frames(codec.encode(msg))
+            self.assertEqual(frames[0][0].decode(frames[0][1]).header, msg.header)
+
+    def test_split_mixed_and_partial_frames(self):
+        """FrameReader separa tramas JSON y binarias y deja el resto incompleto pendiente."""
+        m1 = Message(type="A", src="x", payload={"i": 1})
+        m2 = Message(type="B", src="x", payload={"i": 2})
+        data = JsonLineCodec().encode(m1) + BinaryCodec().encode(m2)
+        reader = FrameReader()
+        self.assertEqual(len(read_frames(data[:-3], reader)), 1)
+        frames = read_frames(data[-3:], reader)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0][0].name, "bin2")
+        self.assertEqual(reader.pending(), 0)
+
+    def test_negotiated_binary_over_tcp(self):
+        """El cliente negocia bin2 con el servidor y el servidor contesta en el mismo codec."""
+        seen = []
+
+        def handler(msg, sock):
+            seen.append(msg.payload)
+            return Message(type="RESPONSE", src="server", dst=msg.header["src"], payload={"echo": msg.payload["text"]})
+
+        server = TCPServer("127.0.0.1", 9430, handler)
+        server.start()
+        client = TCPClient(codec="bin2")
+        try:
+            msg = Message(type="TEST", src="client", dst="server", payload={"text": "line1\nline2"})
+            response = client.send_message("127.0.0.1", 9430, msg)
+            self.assertEqual(response.payload["echo"], "line1\nline2")
+            conn = client.pool._idle[("127.0.0.1", 9430)][0]
+            self.assertEqual(conn.codec.name, "bin2")
+        finally:
+            client.close()
+            server.stop()
+
+if __name__ == "__main__":
+    unittest.main()
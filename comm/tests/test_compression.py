@@ -0,0 +1,60 @@
+import unittest
+from comm import CommunicationNode, Message
+from comm.codec import CODECS
+from comm.compression import COMPRESSED_MAGIC, compress_frame
+from comm.framing import FrameReader
+
+class TestCompression(unittest.TestCase):
+
+    def test_threshold_and_roundtrip(self):
+        """Las tramas pequeñas viajan tal cual; las grandes se comprimen y se recuperan idénticas."""
+        small = CODECS["json"].encode(Message(type="A", src="x", payload={"i": 1}))
+        self.assertEqual(compress_frame(small, "zlib"), small)
+
+        for codec in CODECS.values():
+            msg = Message(type="DISCOVERY_QUERY_ALL_RESPONSE", src="x", payload={"nodes": [{"name": f"n{i}", "ip": f"10.0.0.{i}"} for i in range(200)]})
+            frame = codec.encode(msg)
+            compressed = compress_frame(frame, "zlib")
+            self.assertEqual(compressed[0], COMPRESSED_MAGIC)
+            self.assertLess(len(compressed), len(frame) // 3)
+
+            reader = FrameReader()
+            reader.feed(compressed)
+            got_codec, body = reader.next_frame()
+            self.assertIs(got_codec, codec)
+            self.assertEqual(got_codec.decode(body).payload, msg.payload)
+
+    def test_negotiated_between_nodes(self):
+        """Dos nodos negocian zlib: la respuesta grande llega comprimida y queda en las métricas."""
+        nodes = [{"name": f"node{i}", "ip": f"10.0.0.{i}", "type": "DATA"} for i in range(300)]
+        for multiplex in (False, True):
+            with self.subTest(multiplex=multiplex):
+                server = CommunicationNode("server", "127.0.0.1", 9500, compression="zlib")
+                client = CommunicationNode("client", "127.0.0.1", 9501, compression="zlib", multiplex=multiplex)
+                server.register_handler("DISCOVERY_QUERY_ALL", lambda msg, sock: Message(type="DISCOVERY_QUERY_ALL_RESPONSE", src="server", payload={"nodes": nodes}))
+                try:
+                    response = client.send_message("127.0.0.1", 9500, Message(type="DISCOVERY_QUERY_ALL", src="client"))
+                    self.assertEqual(response.payload["nodes"], nodes)
+
+                    stats = server.metrics_snapshot()["server"]["DISCOVERY_QUERY_ALL"]
+                    self.assertLess(stats["compress_ratio_pct"]["max"], 30)
+                    self.assertEqual(stats["compress_us"]["count"], 1)
+                finally:
+                    client.stop_server()
+                    server.stop_server()
+
+    def test_disabled(self):
+        """Por defecto no se negocia compresión y las respuestas viajan sin comprimir."""
+        server = CommunicationNode("server", "127.0.0.1", 9502)
+        client = CommunicationNode("client", "127.0.0.1", 9503)
+        server.register_handler("BIG", lambda msg, sock: Message(type="BIG_RESPONSE", src="server", payload={"d": "x" * 5000}))
+        try:
+            self.assertEqual(len(client.send_message("127.0.0.1", 9502, Message(type="BIG", src="client")).payload["d"]), 5000)
+            self.assertNotIn("compress_us", server.metrics_snapshot()["server"]["BIG"])
+            self.assertIsNone(client.client.compression)
+        finally:
+            client.stop_server()
+            server.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import resource
+import socket
+import time
+from comm import Message, TCPServer, TCPClient
+from comm.connection_pool import PooledConnection
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        """Levanta un servidor TCP de eco para probar la reutilización de conexiones."""
+        self.ip = "127.0.0.1"
+        self.port = 9410
+
+        def handler(msg, sock):
+            return Message(type="RESPONSE", src="server", dst=msg.header["src"], payload=msg.payload)
+
+        self.server = TCPServer(self.ip, self.port, handler)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        time.sleep(0.6)
+
+    def test_connection_is_reused(self):
+        """Varios mensajes seguidos al mismo destino comparten una única conexión."""
+        client = TCPClient()
+        for i in range(5):
+            msg = Message(type="TEST", src="client", dst="server", payload={"i": i})
+            response = client.send_message(self.ip, self.port, msg, await_response=True)
+            self.assertEqual(response.payload["i"], i)
+
+        stats = client.pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["reused"], 4)
+        client.close()
+
+    def test_no_response_connection_is_not_reused(self):
+        """Un envío sin esperar respuesta no devuelve la conexión al pool."""
+        client = TCPClient()
+        msg = Message(type="TEST", src="client", dst="server", payload={})
+        client.send_message(self.ip, self.port, msg, await_response=False)
+        response = client.send_message(self.ip, self.port, msg, await_response=True)
+        self.assertIsNotNone(response)
+        self.assertEqual(client.pool.stats()["created"], 2)
+        client.close()
+
+    def test_max_connections_per_peer(self):
+        """Con el límite agotado acquire() espera y devuelve None al vencer el timeout."""
+        client = TCPClient(max_connections_per_peer=1)
+        conn = client.pool.acquire(self.ip, self.port, timeout=0.5)
+        self.assertIsNotNone(conn)
+        self.assertIsNone(client.pool.acquire(self.ip, self.port, timeout=0.2))
+        client.pool.release(conn)
+        self.assertIsNotNone(client.pool.acquire(self.ip, self.port, timeout=0.2))
+        client.close()
+
+    def test_idle_connections_are_reaped(self):
+        """Las conexiones ociosas más antiguas que idle_timeout se cierran."""
+        client = TCPClient(idle_timeout=0.1)
+        self.assertTrue(client.connect(self.ip, self.port))
+        time.sleep(0.2)
+        self.assertEqual(client.pool.reap_idle(), 1)
+        self.assertEqual(client.pool.stats()["idle"], {})
+        client.close()
+
+    def test_closed_peer_connection_is_discarded(self):
+        """Una conexión ociosa cerrada por el servidor no se entrega de nuevo."""
+        client = TCPClient()
+        msg = Message(type="TEST", src="client", dst="server", payload={})
+        self.assertIsNotNone(client.send_message(self.ip, self.port, msg))
+        self.server.stop()
+        time.sleep(0.7)
+        self.assertIsNone(client.pool.acquire(self.ip, self.port, timeout=0.2))
+        self.assertGreaterEqual(client.pool.stats()["discarded"], 1)
+        client.close()
+
+    @unittest.skipIf(resource.getrlimit(resource.RLIMIT_NOFILE)[0] <= 2048, "límite de descriptores bajo")
+    def test_health_check_with_high_fd(self):
+        """Un socket con descriptor >= 1024 (fuera del alcance de select()) también se comprueba."""
+        client, server = socket.socketpair()
+        high = socket.socket(fileno=os.dup2(client.fileno(), 2000))
+        client.close()
+        conn = PooledConnection(high, ("127.0.0.1", 0))
+        try:
+            self.assertTrue(conn.is_healthy())
+            server.close()
+            self.assertFalse(conn.is_healthy())
+        finally:
+            conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+from comm import CommunicationNode, Message
+from comm.deadline import BUDGET_KEY, DEADLINE_KEY, budget, deadline_scope, on_arrival, stamp
+
+class TestDeadline(unittest.TestCase):
+
+    def test_budget_inherits_scope(self):
+        """Dentro de un scope el timeout se recorta al presupuesto restante."""
+        self.assertAlmostEqual(budget(2.0)[0], 2.0)
+        with deadline_scope(time.monotonic() + 0.5):
+            timeout, deadline = budget(2.0)
+            self.assertLessEqual(timeout, 0.5)
+            with deadline_scope(time.monotonic() + 10):
+                self.assertLessEqual(budget(2.0)[0], 0.5)
+        with deadline_scope(time.monotonic() - 1):
+            self.assertLessEqual(budget(2.0)[0], 0)
+
+    def test_budget_is_relative_on_the_wire(self):
+        """Se envían los segundos que quedan y el receptor los ancla a su propio reloj."""
+        msg = Message(type="WORK", src="client")
+        stamp(msg.metadata, time.monotonic() + 0.5)
+        self.assertNotIn(DEADLINE_KEY, msg.metadata)
+        self.assertAlmostEqual(msg.metadata[BUDGET_KEY], 0.5, delta=0.05)
+
+        # Un deadline de hora de pared (otro reloj, desfasado) no cuenta
+        arrived = Message.from_json(msg.to_json())
+        arrived.metadata[DEADLINE_KEY] = time.time() - 3600
+        on_arrival(arrived)
+        self.assertNotIn(BUDGET_KEY, arrived.metadata)
+        self.assertAlmostEqual(arrived.metadata[DEADLINE_KEY] - time.monotonic(), 0.5, delta=0.05)
+
+    def test_expired_request_is_skipped(self):
+        """Una petición cuyo llamador ya se rindió no llega a ejecutar el handler."""
+        calls = []
+        server = CommunicationNode("server", "127.0.0.1", 9510, handler_workers=1)
+        client = CommunicationNode("client", "127.0.0.1", 9511)
+
+        def handler(msg, sock):
+            calls.append(msg.payload["i"])
+            time.sleep(msg.payload["sleep"])
+            return Message(type="WORK_RESPONSE", src="server")
+
+        server.register_handler("WORK", handler)
+        try:
+            slow = threading.Thread(target=client.send_message, args=("127.0.0.1", 9510, Message(type="WORK", src="client", payload={"i": 0, "sleep": 0.6})), kwargs={"timeout": 2.0})
+            slow.start()
+            time.sleep(0.1)
+            # Espera en cola detrás de la lenta y vence antes de que quede un worker libre
+            self.assertIsNone(client.send_message("127.0.0.1", 9510, Message(type="WORK", src="client", payload={"i": 1, "sleep": 0}), timeout=0.2))
+            slow.join()
+            time.sleep(0.1)
+            self.assertEqual(calls, [0])
+            self.assertEqual(server.metrics_snapshot()["server"]["WORK"]["expired"]["count"], 1)
+        finally:
+            client.stop_server()
+            server.stop_server()
+
+    def test_nested_call_inherits_deadline(self):
+        """Un handler que llama a otro nodo le pasa el presupuesto restante, no su propio timeout."""
+        seen = []
+        front = CommunicationNode("front", "127.0.0.1", 9512)
+        back = CommunicationNode("back", "127.0.0.1", 9513)
+        client = CommunicationNode("client", "127.0.0.1", 9514)
+        back.register_handler("INNER", lambda msg, sock: seen.append(msg.metadata["deadline"]) or Message(type="INNER_RESPONSE", src="back"))
+        front.register_handler("OUTER", lambda msg, sock: front.send_message("127.0.0.1", 9513, Message(type="INNER", src="front"), timeout=5.0))
+        try:
+            before = time.monotonic()
+            response = client.send_message("127.0.0.1", 9512, Message(type="OUTER", src="client"), timeout=1.0)
+            self.assertEqual(response.header["type"], "INNER_RESPONSE")
+            self.assertLessEqual(seen[0], before + 1.1)
+        finally:
+            client.stop_server()
+            front.stop_server()
+            back.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
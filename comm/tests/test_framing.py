@@ -0,0 +1,78 @@
+import socket
+import threading
+import unittest
+from comm import Message, TCPServer, TCPClient
+from comm.codec import BinaryCodec, JsonLineCodec
+from comm.framing import FrameReader
+
+class TestFrameReader(unittest.TestCase):
+
+    def test_fragmented_json_and_binary(self):
+        """Las tramas llegan byte a byte y se extraen completas, en orden y con su codec."""
+        m1 = Message(type="A", src="x", payload={"i": 1})
+        m2 = Message(type="B", src="x", payload={"text": "a\nb"})
+        data = JsonLineCodec().encode(m1) + BinaryCodec().encode(m2)
+
+        reader = FrameReader(initial_size=16)
+        frames = []
+        for i in range(len(data)):
+            reader.feed(data[i:i + 1])
+            frames.extend(iter(reader.next_frame, None))
+
+        self.assertEqual([codec.name for codec, _ in frames], ["json", "bin2"])
+        self.assertEqual(frames[1][0].decode(frames[1][1]).payload, {"text": "a\nb"})
+        self.assertEqual(reader.pending(), 0)
+
+    def test_partial_frame_stays_pending(self):
+        """Lo que no forma una trama completa queda pendiente para el siguiente recv."""
+        data = JsonLineCodec().encode(Message(type="A", src="x"))
+        reader = FrameReader()
+        reader.feed(data + data[:5])
+        self.assertIsNotNone(reader.next_frame())
+        self.assertIsNone(reader.next_frame())
+        self.assertEqual(reader.pending(), 5)
+
+    def test_oversized_frame_rejected(self):
+        """Una trama mayor que max_frame lanza ValueError en lugar de crecer sin límite."""
+        reader = FrameReader(initial_size=64, max_frame=100)
+        reader.feed(b"{" + b"x" * 200)
+        with self.assertRaises(ValueError):
+            reader.next_frame()
+
+    def test_large_message_over_socket(self):
+        """Un mensaje de varios MB se recibe con recv_into y el tamaño de lectura crece."""
+        msg = Message(type="DATA_RETR_RESPONSE", src="a", payload={"data": "x" * (4 * 1024 * 1024)})
+        data = BinaryCodec().encode(msg)
+        a, b = socket.socketpair()
+        writer = threading.Thread(target=a.sendall, args=(data,))
+        writer.start()
+        try:
+            reader = FrameReader()
+            frame = None
+            while frame is None:
+                self.assertTrue(reader.recv_from(b))
+                frame = reader.next_frame()
+            self.assertEqual(frame[0].decode(frame[1]).payload, msg.payload)
+            self.assertGreater(reader.read_size, FrameReader.MIN_READ)
+        finally:
+            writer.join()
+            a.close()
+            b.close()
+
+    def test_large_response_over_tcp(self):
+        """El cliente recibe por TCP una respuesta de 1 MB en JSON por línea."""
+        def handler(msg, sock):
+            return Message(type="RESPONSE", src="server", payload={"data": "y" * (1024 * 1024)})
+
+        server = TCPServer("127.0.0.1", 9460, handler)
+        server.start()
+        client = TCPClient()
+        try:
+            response = client.send_message("127.0.0.1", 9460, Message(type="TEST", src="client"), timeout=5.0)
+            self.assertEqual(len(response.payload["data"]), 1024 * 1024)
+        finally:
+            client.close()
+            server.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import socket
+import tempfile
+import unittest
+from comm import Message, TCPClient, TCPServer, AsyncTCPServer
+from comm.local_transport import uds_path_for
+
+class TestLocalTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.handler = lambda m, s: Message(type="PONG", src="server", payload=m.payload)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _check_uses_uds(self, server_cls, port):
+        path = uds_path_for("127.0.0.1", port, self.tmp.name)
+        server = server_cls("127.0.0.1", port, self.handler, uds_path=path)
+        server.start()
+        client = TCPClient()
+        try:
+            self.assertTrue(os.path.exists(path))
+            client.register_local_endpoint("127.0.0.1", server.port, path)
+            response = client.send_message("127.0.0.1", server.port, Message(type="PING", src="c", payload={"x": 1}))
+            self.assertEqual(response.payload, {"x": 1})
+
+            conn = client.pool.acquire("127.0.0.1", server.port, 1.0)
+            self.assertEqual(conn.sock.family, socket.AF_UNIX)
+            client.pool.release(conn)
+        finally:
+            client.close()
+            server.stop()
+        self.assertFalse(os.path.exists(path))
+
+    def test_thread_server_over_uds(self):
+        self._check_uses_uds(TCPServer, 9540)
+
+    def test_async_server_over_uds(self):
+        self._check_uses_uds(AsyncTCPServer, 9541)
+
+    def test_falls_back_to_tcp(self):
+        """Un endpoint local que ya no existe no impide hablar por TCP."""
+        server = TCPServer("127.0.0.1", 9542, self.handler)
+        server.start()
+        client = TCPClient()
+        try:
+            client.register_local_endpoint("127.0.0.1", 9542, os.path.join(self.tmp.name, "missing.sock"))
+            response = client.send_message("127.0.0.1", 9542, Message(type="PING", src="c", payload={"x": 2}))
+            self.assertEqual(response.payload, {"x": 2})
+        finally:
+            client.close()
+            server.stop()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,5 +22,15 @@ class TestMessage(unittest.TestCase):
         self.assertEqual(msg.payload, msg2.payload)
         self.assertEqual(msg.metadata["msg_id"], msg2.metadata["msg_id"])
 
+    def test_lazy_metadata_and_unique_ids(self):
+        """La metadata se genera al primer acceso y los msg_id no se repiten."""
+        msg = Message(type="TEST", src="node1")
+        self.assertIsNone(msg._metadata)
+        self.assertIn("msg_id", msg.metadata)
+        self.assertIs(msg.metadata, msg.metadata)
+        ids = {Message.new_id() for _ in range(1000)}
+        self.assertEqual(len(ids), 1000)
+        self.assertFalse(hasattr(msg, "__dict__"))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+import json
+import threading
+import unittest
+from comm import CommunicationNode, Message
+from comm.metrics import Histogram, Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_percentiles(self):
+        """Los percentiles devuelven la cota superior del bucket (potencias de 2)."""
+        hist = Histogram()
+        for v in [1] * 90 + [1000] * 10:
+            hist.record(v)
+        self.assertEqual(hist.percentile(50), 1)
+        self.assertEqual(hist.percentile(99), 1000)
+        self.assertEqual(hist.to_dict()["count"], 100)
+
+    def test_per_thread_aggregation(self):
+        """Lo registrado por muchos hilos (vivos o ya terminados) se suma en el snapshot."""
+        metrics = Metrics(enabled=True)
+
+        def work():
+            for _ in range(100):
+                metrics.observe("server", "PING", "handler_us", 0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        work()  # hilo principal, sigue vivo
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["server"]["PING"]["handler_us"]["count"], 900)
+        self.assertEqual(metrics.snapshot()["server"]["PING"]["handler_us"]["count"], 900)
+
+    def test_node_records_both_sides(self):
+        """Una petición entre nodos deja métricas de servidor y de cliente, serializables a JSON."""
+        server = CommunicationNode("server", "127.0.0.1", 9490)
+        client = CommunicationNode("client", "127.0.0.1", 9491)
+        server.register_handler("PING", lambda msg, sock: Message(type="PONG", src="server"))
+        try:
+            for _ in range(3):
+                self.assertIsNotNone(client.send_message("127.0.0.1", 9490, Message(type="PING", src="client")))
+
+            server_side = server.metrics_snapshot()["server"]["PING"]
+            for name in ("request_bytes", "response_bytes", "queue_us", "handler_us", "total_us"):
+                self.assertEqual(server_side[name]["count"], 3, name)
+            client_side = client.metrics_snapshot()["client"]["PING"]
+            for name in ("connect_us", "send_us", "wait_us", "total_us"):
+                self.assertEqual(client_side[name]["count"], 3, name)
+            json.loads(json.dumps(client.metrics_snapshot()))
+        finally:
+            client.stop_server()
+            server.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
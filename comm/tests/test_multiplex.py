@@ -0,0 +1,99 @@
+import unittest
+import socket
+import threading
+import time
+from comm import Message, TCPServer, TCPClient
+
+class TestMultiplex(unittest.TestCase):
+
+    def setUp(self):
+        """Servidor con un handler lento y otro rápido para probar respuestas fuera de orden."""
+        self.ip = "127.0.0.1"
+        self.port = 9420
+
+        def handler(msg, sock):
+            if msg.header["type"] == "SLOW":
+                time.sleep(0.5)
+            return Message(type=msg.header["type"] + "_RESPONSE", src="server", dst=msg.header["src"], payload=msg.payload)
+
+        self.server = TCPServer(self.ip, self.port, handler)
+        self.server.start()
+        self.client = TCPClient(multiplex=True)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_fast_request_not_blocked_by_slow(self):
+        """Una petición rápida termina antes que una lenta enviada antes por la misma conexión."""
+        finished = []
+
+        def send(type):
+            msg = Message(type=type, src="client", dst="server", payload={"type": type})
+            response = self.client.send_message(self.ip, self.port, msg, timeout=2.0)
+            finished.append(response.payload["type"])
+
+        slow = threading.Thread(target=send, args=("SLOW",))
+        slow.start()
+        time.sleep(0.05)
+        send("FAST")
+        slow.join()
+
+        self.assertEqual(finished, ["FAST", "SLOW"])
+        self.assertEqual(len(self.client._mux_conns), 1)
+
+    def test_responses_matched_by_msg_id(self):
+        """Muchas peticiones concurrentes reciben cada una su propia respuesta."""
+        results = {}
+
+        def send(i):
+            msg = Message(type="ECHO", src="client", dst="server", payload={"i": i})
+            response = self.client.send_message(self.ip, self.port, msg, timeout=2.0)
+            results[i] = (response.payload["i"], response.metadata["reply_to"] == msg.metadata["msg_id"])
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: (i, True) for i in range(20)})
+
+    def test_idle_connections_are_reaped(self):
+        """La conexión multiplexada ociosa más de idle_timeout se cierra; la siguiente petición abre otra."""
+        client = TCPClient(multiplex=True, idle_timeout=0.1)
+        try:
+            msg = Message(type="FAST", src="client", dst="server", payload={})
+            self.assertIsNotNone(client.send_message(self.ip, self.port, msg))
+            self.assertEqual(client.reap_idle_mux(), 0)
+            time.sleep(0.2)
+            self.assertEqual(client.reap_idle_mux(), 1)
+            self.assertEqual(client._mux_conns, {})
+            self.assertIsNotNone(client.send_message(self.ip, self.port, msg))
+        finally:
+            client.close()
+
+    def test_unresponsive_peer_does_not_block_others(self):
+        """Conectar con un par que no contesta la negociación no frena los envíos a otros pares."""
+        mute = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        mute.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        mute.bind((self.ip, 9421))
+        mute.listen(8)  # acepta en el kernel pero nunca contesta el COMM_HELLO
+        client = TCPClient(multiplex=True, codec="bin2")
+        try:
+            blocked = threading.Thread(target=client.send_message,
+                                       args=(self.ip, 9421, Message(type="ECHO", src="client", dst="mute"), True, 2.0))
+            blocked.start()
+            time.sleep(0.1)
+            started = time.monotonic()
+            response = client.send_message(self.ip, self.port, Message(type="ECHO", src="client", dst="server", payload={}), timeout=2.0)
+            self.assertIsNotNone(response)
+            self.assertLess(time.monotonic() - started, 1.0)
+            blocked.join()
+        finally:
+            client.close()
+            mute.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
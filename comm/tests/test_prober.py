@@ -0,0 +1,94 @@
+import errno
+import unittest
+import socket
+import time
+from unittest import mock
+from comm.prober import ConnectProber, SubnetSweep, fd_budget
+
+
+class TestConnectProber(unittest.TestCase):
+
+    def setUp(self):
+        self.listeners = []
+        for ip in ("127.0.0.5", "127.0.0.9"):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((ip, 9598))
+            sock.listen(16)
+            self.listeners.append(sock)
+
+    def tearDown(self):
+        for sock in self.listeners:
+            sock.close()
+
+    def test_finds_open_ports(self):
+        """Solo devuelve las ips con el puerto abierto, en el orden de entrada."""
+        prober = ConnectProber(timeout=0.5, max_in_flight=16)
+        ips = [f"127.0.0.{i}" for i in range(1, 255)]
+        self.assertEqual(prober.probe(ips, 9598), ["127.0.0.5", "127.0.0.9"])
+        self.assertEqual(prober.last_probed, 254)
+        self.assertEqual(prober.last_open, 2)
+
+    def test_silent_addresses_cost_one_timeout(self):
+        """Las direcciones que no contestan se sondean a la vez: el total ronda un timeout, no uno por ip."""
+        prober = ConnectProber(timeout=0.3)
+        ips = [f"192.0.2.{i}" for i in range(100, 164)] + ["127.0.0.9"]
+        started = time.monotonic()
+        self.assertEqual(prober.probe(ips, 9598), ["127.0.0.9"])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+    def test_in_flight_clamped_to_fd_limit(self):
+        budget = fd_budget()
+        if budget is None:
+            self.skipTest("sin límite de descriptores")
+        self.assertEqual(ConnectProber(max_in_flight=10 ** 7).max_in_flight, budget)
+
+    def test_out_of_descriptors_skips_address(self):
+        """Un connect que no se puede ni intentar (EMFILE) deja la ip sin sondear, sin abortar el resto."""
+        prober = ConnectProber(timeout=0.5, max_in_flight=4)
+        start_connect = ConnectProber._start_connect
+
+        def flaky(ip, port):
+            if ip == "127.0.0.5":
+                raise OSError(errno.EMFILE, "Too many open files")
+            return start_connect(ip, port)
+
+        with mock.patch.object(prober, "_start_connect", side_effect=flaky):
+            ips = [f"127.0.0.{i}" for i in range(1, 21)]
+            self.assertEqual(prober.probe(ips, 9598), ["127.0.0.9"])
+        self.assertEqual(prober.last_skipped, ["127.0.0.5"])
+        self.assertEqual(prober.last_probed, 19)
+
+
+class TestSubnetSweep(unittest.TestCase):
+
+    def test_windows_cycle_and_prioritise_seen(self):
+        ips = [f"10.0.0.{i}" for i in range(1, 11)]
+        sweep = SubnetSweep(ips, window=4)
+        first = sweep.next_window()
+        self.assertEqual(first, ips[0:4])
+        sweep.update(first, ["10.0.0.2"])
+
+        self.assertEqual(sweep.next_window(priority=["10.0.0.9"]), ["10.0.0.9", "10.0.0.2"] + ips[4:8])
+        self.assertEqual(sweep.next_window(), ["10.0.0.2"] + ips[8:10] + ips[0:1])  # sin repetir la vista
+        self.assertEqual(sweep.cycles, 1)
+
+        sweep.update(["10.0.0.2"], [])  # dejó de responder
+        self.assertNotIn("10.0.0.2", sweep.next_window()[:1])
+
+    def test_skipped_keep_what_was_known(self):
+        sweep = SubnetSweep([f"10.0.0.{i}" for i in range(1, 5)])
+        sweep.update(["10.0.0.1", "10.0.0.2"], ["10.0.0.2"])
+        sweep.update(["10.0.0.1", "10.0.0.2"], [], skipped=["10.0.0.2"])
+        self.assertEqual(sweep.seen, {"10.0.0.2"})
+
+    def test_whole_subnet_by_default(self):
+        ips = [f"10.0.0.{i}" for i in range(1, 6)]
+        sweep = SubnetSweep(ips)
+        self.assertEqual(sweep.next_window(), ips)
+        self.assertEqual(sweep.next_window(), ips)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import threading
+import time
+from comm import CommunicationNode, Message
+from comm.idempotency import IdempotencyCache
+from comm.retry import RetryPolicy
+
+
+class TestIdempotencyCache(unittest.TestCase):
+
+    def test_duplicate_waits_for_original(self):
+        """Una copia que llega mientras el original se ejecuta recibe su respuesta sin re-ejecutarlo."""
+        cache = IdempotencyCache()
+        calls = []
+        release = threading.Event()
+
+        def work():
+            calls.append(1)
+            release.wait(1)
+            return "done"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.run("id-1", work))) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(timeout=2)
+
+        self.assertEqual(results, ["done"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_bounded_and_failures_not_cached(self):
+        """Se descartan las entradas más antiguas y un handler que falla puede reintentarse."""
+        cache = IdempotencyCache(max_entries=2)
+        for i in range(3):
+            cache.run(f"id-{i}", lambda: i)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.stats()["evicted"], 1)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            cache.run("id-x", fail)
+        self.assertEqual(cache.run("id-x", lambda: "ok"), "ok")
+
+    def test_running_entries_not_evicted(self):
+        """Una entrada cuyo handler sigue en curso no se desaloja aunque sea la más antigua."""
+        cache = IdempotencyCache(max_entries=1)
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(1)
+            return "slow"
+
+        original = threading.Thread(target=cache.run, args=("id-slow", slow))
+        original.start()
+        time.sleep(0.05)
+        cache.run("id-1", lambda: 1)
+        cache.run("id-2", lambda: 2)
+        self.assertEqual(cache.stats()["evicted"], 1)
+
+        duplicate = []
+        copy = threading.Thread(target=lambda: duplicate.append(cache.run("id-slow", slow)))
+        copy.start()
+        release.set()
+        original.join(timeout=2)
+        copy.join(timeout=2)
+        self.assertEqual(duplicate, ["slow"])
+        self.assertEqual(len(calls), 1)
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(attempts=5, base_backoff=0.1, max_backoff=0.3)
+        for attempt in range(1, 6):
+            self.assertLessEqual(policy.backoff(attempt), min(0.3, 0.1 * 2 ** (attempt - 1)))
+
+
+class TestSendWithRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop_server()
+
+    def _node(self, name, port, **kwargs):
+        node = CommunicationNode(node_name=name, ip="127.0.0.1", port=port, **kwargs)
+        self.nodes.append(node)
+        return node
+
+    def test_retry_after_timeout_applies_once(self):
+        """El reintento tras un timeout obtiene la respuesta del original: la operación se aplica una vez."""
+        for mode, port in (("thread", 9580), ("async", 9581)):
+            with self.subTest(mode=mode):
+                server = self._node(f"data-{mode}", port, server_mode=mode)
+                created = []
+
+                def mkd(message, sock):
+                    created.append(message.payload["dir"])
+                    time.sleep(0.3)
+                    return Message(type="CHECK_MKD_RESPONSE", src="data", payload={"msg": "created"})
+
+                server.register_handler("CHECK_MKD", mkd)
+                client = self._node(f"proc-{mode}", port + 10)
+                msg = Message(type="CHECK_MKD", src="proc", dst="127.0.0.1", payload={"dir": "docs"})
+                response = client.send_message("127.0.0.1", port, msg, True, 0.2,
+                                               retry=RetryPolicy(attempts=4, base_backoff=0.01))
+
+                self.assertIsNotNone(response)
+                self.assertEqual(response.payload["msg"], "created")
+                self.assertEqual(created, ["docs"])
+                self.assertGreaterEqual(server.metrics_snapshot()["idempotency"]["hits"], 1)
+
+    def test_retry_on_busy(self):
+        """COMM_BUSY se reintenta con backoff hasta que el nodo tiene hueco."""
+        server = self._node("busy", 9582, handler_workers=1, handler_queue=1)
+        release = threading.Event()
+        server.register_handler("SLOW", lambda m, s: release.wait(2) and None)
+        server.register_handler("FAST", lambda m, s: Message(type="FAST_RESPONSE", src="busy"))
+        client = self._node("client", 9583)
+
+        for _ in range(2):  # uno ocupa el hilo y otro la cola
+            client.send_message_async("127.0.0.1", 9582, Message(type="SLOW", src="client"), timeout=2.0)
+        time.sleep(0.1)
+        threading.Timer(0.2, release.set).start()
+
+        response = client.send_message("127.0.0.1", 9582, Message(type="FAST", src="client"), True, 1.0,
+                                       retry=RetryPolicy(attempts=6, base_backoff=0.2, max_backoff=0.4))
+        self.assertEqual(response.header["type"], "FAST_RESPONSE")
+
+    def test_hedged_request_uses_faster_replica(self):
+        """Si el destino no contesta en hedge_after, la copia a la réplica gana."""
+        slow = self._node("slow", 9584)
+        fast = self._node("fast", 9585)
+        slow.register_handler("QUERY", lambda m, s: time.sleep(0.8) or Message(type="QUERY_RESPONSE", src="slow"))
+        fast.register_handler("QUERY", lambda m, s: Message(type="QUERY_RESPONSE", src="fast"))
+        client = self._node("client", 9586)
+
+        started = time.monotonic()
+        response = client.send_message("127.0.0.1", 9584, Message(type="QUERY", src="client"), True, 1.0,
+                                       retry=RetryPolicy(attempts=1, hedge_after=0.05), hedge_to=("127.0.0.1", 9585))
+        self.assertEqual(response.header["src"], "fast")
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
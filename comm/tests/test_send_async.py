@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+import unittest
+from comm import CommunicationNode, Message
+
+class TestSendMessageAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        for i in range(3):
+            node = CommunicationNode(f"server{i}", "127.0.0.1", 9480 + i)
+            node.register_handler("SLOW", self._slow_handler(i))
+            node.register_handler("LONG", lambda msg, sock: (time.sleep(1.0), Message(type="LONG_RESPONSE", src="server"))[1])
+            self.servers.append(node)
+        self.client = CommunicationNode("client", "127.0.0.1", 9485)
+
+    def tearDown(self):
+        self.client.stop_server()
+        for node in self.servers:
+            node.stop_server()
+
+    @staticmethod
+    def _slow_handler(i):
+        def handler(msg, sock):
+            time.sleep(0.3)
+            return Message(type="SLOW_RESPONSE", src=f"server{i}", payload={"i": i})
+        return handler
+
+    def test_fan_out_in_parallel(self):
+        """Tres peticiones lentas a tres nodos tardan lo que una, no la suma."""
+        start = time.monotonic()
+        futures = [self.client.send_message_async("127.0.0.1", 9480 + i, Message(type="SLOW", src="client"), timeout=2.0) for i in range(3)]
+        results = [f.result(timeout=3).payload["i"] for f in futures]
+        self.assertEqual(results, [0, 1, 2])
+        self.assertLess(time.monotonic() - start, 0.8)
+
+    def test_callback_and_asyncio(self):
+        """El callback recibe la respuesta y send_message_aio se puede combinar con asyncio.gather."""
+        done = threading.Event()
+        received = []
+        self.client.send_message_async("127.0.0.1", 9480, Message(type="SLOW", src="client"), timeout=2.0,
+                                       callback=lambda r: (received.append(r.payload["i"]), done.set()))
+
+        async def gather():
+            return await asyncio.gather(*(self.client.send_message_aio("127.0.0.1", 9480 + i, Message(type="SLOW", src="client"), timeout=2.0) for i in range(3)))
+
+        responses = asyncio.run(gather())
+        self.assertEqual([r.payload["i"] for r in responses], [0, 1, 2])
+        self.assertTrue(done.wait(2))
+        self.assertEqual(received, [0])
+
+    def test_unreachable_peer_resolves_none(self):
+        """Si el destino no responde el future se completa con None."""
+        future = self.client.send_message_async("127.0.0.1", 9489, Message(type="SLOW", src="client"), timeout=0.3)
+        self.assertIsNone(future.result(timeout=2))
+    def test_transfers_do_not_take_pooled_connections(self):
+        """Más transferencias largas que conexiones del pool no frenan las RPC cortas al mismo nodo."""
+        client = CommunicationNode("client2", "127.0.0.1", 9486, max_connections_per_peer=2)
+        self.addCleanup(client.stop_server)
+        done = threading.Event()
+        transfers = [client.send_transfer_async("127.0.0.1", 9480, Message(type="LONG", src="client"), timeout=3.0)
+                     for _ in range(3)]
+        client.send_transfer_async("127.0.0.1", 9480, Message(type="LONG", src="client"), timeout=3.0,
+                                   callback=lambda response: done.set())
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        response = client.send_message("127.0.0.1", 9480, Message(type="SLOW", src="client"), timeout=2.0)
+        self.assertEqual(response.payload["i"], 0)
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertTrue(all(f.result(timeout=3) is not None for f in transfers))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(client.client.pool.stats()["open"], {"127.0.0.1:9480": 1})
+
+if __name__ == "__main__":
+    unittest.main()
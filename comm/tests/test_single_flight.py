@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+from comm import CommunicationNode, Message
+from comm.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Las llamadas con la misma clave en vuelo esperan y reciben el mismo resultado."""
+        flight = SingleFlight()
+        executions = []
+
+        def slow(x):
+            executions.append(x)
+            time.sleep(0.2)
+            return x * 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 21))) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [42] * 10)
+        self.assertEqual(executions, [21])
+        stats = flight.stats()
+        self.assertEqual(stats["calls"], 10)
+        self.assertEqual(stats["coalescing_ratio"], 0.9)
+        # Terminada la llamada, la siguiente vuelve a ejecutarse
+        self.assertEqual(flight.do("k", slow, 1), 2)
+
+    def test_error_is_shared(self):
+        """Si la llamada falla, todos los que esperaban reciben la excepción."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        errors = []
+        def call():
+            try:
+                flight.do("k", fail)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertEqual(errors, ["boom", "boom"])
+
+    def test_follower_wait_is_bounded(self):
+        """Quien se suma a una llamada lenta deja de esperar al vencer su propio wait_timeout."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.5)
+            return "ok"
+
+        leader = threading.Thread(target=flight.do, args=("k", slow))
+        leader.start()
+        started.wait()
+        begin = time.monotonic()
+        self.assertIsNone(flight.do("k", slow, wait_timeout=0.1))
+        self.assertLess(time.monotonic() - begin, 0.3)
+        leader.join()
+        self.assertEqual(flight.stats()["timeouts"], 1)
+
+    def test_node_coalesces_identical_queries(self):
+        """Consultas idénticas concurrentes entre nodos generan una sola petición de red."""
+        calls = []
+        server = CommunicationNode("server", "127.0.0.1", 9520)
+        client = CommunicationNode("client", "127.0.0.1", 9521)
+
+        def handler(msg, sock):
+            calls.append(msg.payload["role"])
+            time.sleep(0.2)
+            return Message(type="DISCOVERY_QUERY_BY_ROLE_RESPONSE", src="server", payload={"status": "OK", "ips": ["10.0.0.2"]})
+
+        server.register_handler("DISCOVERY_QUERY_BY_ROLE", handler)
+        try:
+            results = []
+            def query(role):
+                msg = Message(type="DISCOVERY_QUERY_BY_ROLE", src="client", payload={"role": role})
+                results.append(client.send_message_coalesced("127.0.0.1", 9520, msg))
+
+            threads = [threading.Thread(target=query, args=("DATA",)) for _ in range(8)] + [threading.Thread(target=query, args=("AUTH",))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual(sorted(calls), ["AUTH", "DATA"])
+            self.assertTrue(all(r.payload["status"] == "OK" for r in results))
+            self.assertEqual(client.metrics_snapshot()["single_flight"]["coalesced"], 7)
+
+            # Un presupuesto mucho mayor no se cuelga de una petición que puede rendirse antes
+            calls.clear()
+            short = threading.Thread(target=query, args=("DATA",))
+            short.start()
+            time.sleep(0.05)
+            msg = Message(type="DISCOVERY_QUERY_BY_ROLE", src="client", payload={"role": "DATA"})
+            self.assertEqual(client.send_message_coalesced("127.0.0.1", 9520, msg, timeout=5.0).payload["status"], "OK")
+            short.join()
+            self.assertEqual(calls, ["DATA", "DATA"])
+        finally:
+            client.stop_server()
+            server.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import threading
+import time
+import unittest
+from comm import CommunicationNode, Message, TCPClient
+from comm.deadline import current_deadline, stamp
+from comm.streaming import StreamError
+
+class TestStreaming(unittest.TestCase):
+
+    def _nodes(self, port, server_mode, compression=None):
+        server = CommunicationNode("server", "127.0.0.1", port, server_mode=server_mode, compression=compression)
+        client = CommunicationNode("client", "127.0.0.1", port + 1, compression=compression)
+        self.addCleanup(server.stop_server)
+        self.addCleanup(client.stop_server)
+        return server, client
+
+    def _check_listing(self, port, server_mode):
+        server, client = self._nodes(port, server_mode)
+
+        def listing(msg, sock):
+            for i in range(msg.payload["n"]):
+                yield {"name": f"file{i}", "size": i}
+
+        server.register_handler("LIST", listing)
+        chunks = list(client.send_stream("127.0.0.1", port, Message(type="LIST", src="client", payload={"n": 500})))
+        self.assertEqual(len(chunks), 500)
+        self.assertEqual(chunks[499], {"name": "file499", "size": 499})
+
+        # La conexión vuelve limpia al pool y sirve para la siguiente petición
+        self.assertEqual(list(client.send_stream("127.0.0.1", port, Message(type="LIST", src="client", payload={"n": 0}))), [])
+        self.assertEqual(client.client.pool.stats()["reused"], 1)
+
+    def test_thread_server(self):
+        self._check_listing(9550, "thread")
+
+    def test_async_server(self):
+        self._check_listing(9552, "async")
+
+    def test_flow_control(self):
+        """Si el cliente no consume, el handler se frena en lugar de generar todo el stream."""
+        for port, mode in ((9554, "thread"), (9556, "async")):
+            with self.subTest(mode=mode):
+                # Sin compresión, para que los chunks ocupen de verdad los buffers del socket
+                server, client = self._nodes(port, mode, compression="none")
+                produced = []
+
+                def big(msg, sock):
+                    for i in range(200):
+                        produced.append(i)
+                        yield "x" * 65536
+
+                server.register_handler("BIG", big)
+                stream = client.send_stream("127.0.0.1", port, Message(type="BIG", src="client"))
+                next(stream)
+                time.sleep(0.5)
+                self.assertLess(len(produced), 200)
+                self.assertEqual(sum(1 for _ in stream), 199)
+                self.assertEqual(len(produced), 200)
+
+    def test_handler_error_and_early_stop(self):
+        server, client = self._nodes(9558, "thread")
+
+        def failing(msg, sock):
+            yield 1
+            yield 2
+            raise RuntimeError("disco lleno")
+
+        server.register_handler("FAIL", failing)
+        server.register_handler("LIST", lambda msg, sock: iter(range(1000)))
+        received = []
+        with self.assertRaises(StreamError) as ctx:
+            for chunk in client.send_stream("127.0.0.1", 9558, Message(type="FAIL", src="client")):
+                received.append(chunk)
+        self.assertEqual(received, [1, 2])
+        self.assertIn("disco lleno", str(ctx.exception))
+
+        # Abandonar el stream a medias descarta la conexión (quedan chunks en vuelo)
+        stream = client.send_stream("127.0.0.1", 9558, Message(type="LIST", src="client"))
+        self.assertEqual([next(stream) for _ in range(3)], [0, 1, 2])
+        stream.close()
+        self.assertEqual(client.client.pool.stats()["discarded"], 1)
+        self.assertEqual(sum(1 for _ in client.send_stream("127.0.0.1", 9558, Message(type="LIST", src="client"))), 1000)
+
+    def test_chunks_run_in_pool_with_deadline(self):
+        """Cada chunk se genera en el pool de handlers del nodo y con el deadline de la petición."""
+        for port, mode in ((9562, "thread"), (9564, "async")):
+            with self.subTest(mode=mode):
+                server, client = self._nodes(port, mode)
+                seen = []
+
+                def listing(msg, sock):
+                    for i in range(3):
+                        seen.append((threading.current_thread().name, current_deadline()))
+                        yield i
+
+                server.register_handler("LIST", listing)
+                msg = Message(type="LIST", src="client")
+                stamp(msg.metadata, time.monotonic() + 5)
+                self.assertEqual(list(client.send_stream("127.0.0.1", port, msg)), [0, 1, 2])
+                self.assertEqual(len(seen), 3)
+                self.assertTrue(all(name.startswith("server-handler") for name, _ in seen), seen)
+                self.assertTrue(all(deadline is not None and deadline > time.monotonic() for _, deadline in seen))
+
+    def test_non_stream_response(self):
+        """Un handler normal contestado a send_stream se reporta como StreamError con la respuesta."""
+        server, _ = self._nodes(9560, "thread")
+        server.register_handler("PING", lambda msg, sock: Message(type="PONG", src="server"))
+        client = TCPClient()
+        self.addCleanup(client.close)
+        with self.assertRaises(StreamError) as ctx:
+            list(client.send_stream("127.0.0.1", 9560, Message(type="PING", src="client")))
+        self.assertEqual(ctx.exception.response.header["type"], "PONG")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,9 @@
 import unittest
+import socket
+import threading
+import time
 from comm import Message, TCPServer, TCPClient
+from comm.framing import FrameReader
 
 class TestTCP(unittest.TestCase):
 
@@ -9,8 +13,13 @@ class TestTCP(unittest.TestCase):
         self.port = 9000
 
         # Handler que responde siempre con un mensaje de confirmación
+        self.handler_threads = []
+
         def handler(msg, sock):
-            return Message(type="RESPONSE", src="server", dst=msg.header["src"], payload={"ok": True})
+            self.handler_threads.append(threading.current_thread().name)
+            if msg.payload.get("slow"):
+                time.sleep(0.3)
+            return Message(type="RESPONSE", src="server", dst=msg.header["src"], payload={"ok": True, **msg.payload})
 
         self.server = TCPServer(self.ip, self.port, handler)
         self.server.start()
@@ -28,5 +37,22 @@ class TestTCP(unittest.TestCase):
         self.assertEqual(response.header["type"], "RESPONSE")
         self.assertEqual(response.payload["ok"], True)
 
+    def test_pipelined_requests_answered_in_order(self):
+        """El handler corre en el pool del servidor y dos peticiones seguidas por un socket se contestan en orden."""
+        sock = socket.create_connection((self.ip, self.port), timeout=2)
+        try:
+            for i, slow in enumerate((True, False)):
+                sock.sendall(Message(type="TEST", src="raw", dst="server", payload={"i": i, "slow": slow}).to_json().encode())
+            reader = FrameReader()
+            order = []
+            while len(order) < 2:
+                reader.recv_from(sock)
+                for codec, body in iter(reader.next_frame, None):
+                    order.append(codec.decode(body).payload["i"])
+        finally:
+            sock.close()
+        self.assertEqual(order, [0, 1])
+        self.assertTrue(all(name.startswith("tcp-") for name in self.handler_threads))
+
 if __name__ == "__main__":
     unittest.main()
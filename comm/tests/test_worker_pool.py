@@ -0,0 +1,151 @@
+import unittest
+import threading
+import time
+from comm import CommunicationNode, Message
+from comm.worker_pool import PriorityLanes, WorkerPool, WorkerPoolBusy
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_rejects_when_queue_full(self):
+        """Con todos los hilos ocupados y la cola llena submit() lanza WorkerPoolBusy."""
+        pool = WorkerPool(max_workers=1, max_queue=1)
+        release = threading.Event()
+        first = pool.submit(release.wait)
+        time.sleep(0.05)  # el primer trabajo ya salió de la cola
+        second = pool.submit(lambda: "queued")
+        with self.assertRaises(WorkerPoolBusy):
+            pool.submit(lambda: "rejected")
+
+        release.set()
+        self.assertTrue(first.result(timeout=1))
+        self.assertEqual(second.result(timeout=1), "queued")
+
+        stats = pool.stats()
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["max_queue_depth"], 1)
+        self.assertGreater(stats["max_wait_ms"], 0)
+        pool.shutdown()
+
+    def test_threads_are_bounded(self):
+        """Nunca se crean más de max_workers hilos."""
+        pool = WorkerPool(max_workers=3, max_queue=100)
+        futures = [pool.submit(time.sleep, 0.01) for _ in range(50)]
+        for f in futures:
+            f.result(timeout=2)
+        self.assertLessEqual(pool.stats()["workers"], 3)
+        pool.shutdown()
+
+    def test_tasks_do_not_wait_for_busy_workers(self):
+        """Con hilos libres por crear, una tarea nunca espera a que termine otra."""
+        for _ in range(20):
+            pool = WorkerPool(max_workers=8, max_queue=100)
+            barrier = threading.Barrier(8, timeout=2)
+            futures = [pool.submit(barrier.wait) for _ in range(8)]
+            for f in futures:
+                f.result(timeout=3)
+            pool.shutdown()
+
+    def test_shutdown_does_not_block_on_busy_workers(self):
+        """shutdown(wait=False) vuelve enseguida aunque no quepa un centinela por hilo; los hilos salen al acabar."""
+        pool = WorkerPool(max_workers=4, max_queue=1)
+        release = threading.Event()
+        futures = [pool.submit(release.wait) for _ in range(4)]
+        started = time.monotonic()
+        pool.shutdown(wait=False)
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        for f in futures:
+            self.assertTrue(f.result(timeout=1))
+        deadline = time.monotonic() + 2
+        while pool.stats()["workers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.stats()["workers"], 0)
+
+    def test_stop_server_releases_handler_threads(self):
+        """Al detener el nodo terminan los hilos de todos sus carriles."""
+        node = CommunicationNode(node_name="stop", ip="127.0.0.1", port=9454)
+        node.register_handler("ECHO", lambda msg, sock: Message(type="ECHO_RESPONSE", src="stop", payload={"status": "OK"}))
+        node.register_handler("DISCOVERY_HEARTBEAT", lambda msg, sock: Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src="stop"))
+        for type in ("ECHO", "DISCOVERY_HEARTBEAT"):
+            self.assertIsNotNone(node.send_message("127.0.0.1", 9454, Message(type=type, src="client")))
+        node.stop_server()
+
+        deadline = time.monotonic() + 2
+        workers = lambda: sum(lane["workers"] for lane in node.handler_stats()["lanes"].values())
+        while workers() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(workers(), 0)
+
+    def test_priority_lanes_route_by_type(self):
+        """Cada tipo va a su carril; los no asignados al carril por defecto."""
+        lanes = PriorityLanes({"default": WorkerPool(max_workers=1, max_queue=1, name="default"),
+                               "control": WorkerPool(max_workers=1, max_queue=1, name="control")},
+                              routes={"DISCOVERY_HEARTBEAT": "control"})
+        self.assertIs(lanes.lane_for("DISCOVERY_HEARTBEAT"), lanes.lanes["control"])
+        self.assertIs(lanes.lane_for("DATA_RETR"), lanes.lanes["default"])
+        with self.assertRaises(ValueError):
+            lanes.route("DATA_RETR", "bulk")
+
+        msg = Message(type="DISCOVERY_HEARTBEAT", src="a")
+        self.assertIs(lanes.submit(lambda m: m, msg).result(timeout=1), msg)
+        self.assertEqual(lanes.stats()["control"]["completed"], 1)
+        self.assertEqual(lanes.stats()["default"]["submitted"], 0)
+        lanes.shutdown()
+
+
+class TestCommunicationNodeBackpressure(unittest.TestCase):
+
+    def test_overloaded_node_answers_busy(self):
+        """Un nodo con el pool saturado contesta COMM_BUSY en lugar de encolar sin límite."""
+        for mode, port in (("thread", 9450), ("async", 9451)):
+            node = CommunicationNode(node_name="busy", ip="127.0.0.1", port=port, server_mode=mode, handler_workers=1, handler_queue=1)
+            node.register_handler("SLOW", lambda msg, sock: (time.sleep(0.3), Message(type="SLOW_RESPONSE", src="busy", payload={"status": "OK"}))[1])
+            results = []
+
+            def send():
+                response = node.send_message("127.0.0.1", port, Message(type="SLOW", src="client", payload={}), timeout=2.0)
+                results.append(response.payload["status"])
+
+            threads = [threading.Thread(target=send) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            node.stop_server()
+
+            self.assertEqual(results.count("OK"), 2, mode)
+            self.assertEqual(results.count("BUSY"), 2, mode)
+            self.assertEqual(node.handler_stats()["rejected"], 2, mode)
+
+    def test_heartbeat_not_starved(self):
+        """Con el pool general saturado por handlers lentos los heartbeats se atienden en su carril."""
+        for mode, port in (("thread", 9452), ("async", 9453)):
+            node = CommunicationNode(node_name="data", ip="127.0.0.1", port=port, server_mode=mode, handler_workers=1, handler_queue=4)
+            release = threading.Event()
+            node.register_handler("DATA_RETR", lambda msg, sock: (release.wait(2), Message(type="DATA_RETR_RESPONSE", src="data"))[1])
+            node.register_handler("DISCOVERY_HEARTBEAT", lambda msg, sock: Message(type="DISCOVERY_HEARTBEAT_RESPONSE", src="data", payload={"status": "OK"}))
+
+            slow = [threading.Thread(target=node.send_message, args=("127.0.0.1", port, Message(type="DATA_RETR", src="client")), kwargs={"timeout": 3.0})
+                    for _ in range(2)]
+            for t in slow:
+                t.start()
+            try:
+                # Espera a que el pool general esté lleno: un DATA_RETR en curso y otro en cola
+                deadline = time.monotonic() + 2.0
+                while node.handler_stats()["queue_depth"] < 1 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertGreaterEqual(node.handler_stats()["queue_depth"], 1, mode)
+                started = time.perf_counter()
+                response = node.send_message("127.0.0.1", port, Message(type="DISCOVERY_HEARTBEAT", src="client"), timeout=1.0)
+                self.assertEqual(response.payload["status"], "OK", mode)
+                self.assertLess(time.perf_counter() - started, 0.5, mode)
+                self.assertEqual(node.handler_stats()["lanes"]["control"]["submitted"], 1, mode)
+            finally:
+                release.set()
+                for t in slow:
+                    t.join()
+                node.stop_server()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Executor, Future
+
+logger = logging.getLogger("dftp.comm.worker_pool")
+
+
+class WorkerPoolBusy(Exception):
+    """La cola de admisión del WorkerPool está llena: la tarea se rechaza."""
+
+
+class WorkerPool(Executor):
+    """
+    Pool acotado de hilos para ejecutar handlers con cola de admisión limitada.
+
+    - Como mucho max_workers hilos (se crean bajo demanda).
+    - Como mucho max_queue tareas esperando; con la cola llena submit() lanza
+      WorkerPoolBusy en lugar de acumular trabajo o crear más hilos.
+    - Mide profundidad de cola, tiempo de espera en cola y rechazos (stats()).
+
+    Es un concurrent.futures.Executor, así que también sirve para loop.run_in_executor.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 64, name: str = "worker"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._idle = 0
+        self._shutdown = False
+
+        # Métricas
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ---------------- Métodos públicos ----------------
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        """Encola fn(*args, **kwargs). Lanza WorkerPoolBusy si la cola está llena."""
+        if self._shutdown:
+            raise RuntimeError("WorkerPool detenido")
+
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args, kwargs, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise WorkerPoolBusy(f"{self.name}: cola llena ({self.max_queue} tareas)")
+
+        with self._lock:
+            self.submitted += 1
+            depth = self._queue.qsize()
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+            # Cada tarea reclama un hilo libre; si no hay, se crea otro (hasta max_workers)
+            if self._idle > 0:
+                self._idle -= 1
+            elif len(self._threads) < self.max_workers:
+                self._spawn_worker()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Detiene los hilos cuando terminen las tareas en curso."""
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_futures:
+            while True:
+                try:
+                    future, *_ = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                future.cancel()
+        for _ in threads:
+            # Un centinela por hilo; si no caben, los hilos ocupados salen al terminar su tarea
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if wait:
+            for t in threads:
+                t.join()
+
+    def stats(self) -> dict:
+        """Snapshot de las métricas del pool."""
+        with self._lock:
+            finished = self.completed or 1
+            return {
+                "workers": len(self._threads),
+                "busy_workers": len(self._threads) - self._idle,
+                "max_workers": self.max_workers,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / finished * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+    # ---------------- Métodos internos ----------------
+    def _spawn_worker(self):
+        """Crea un hilo más (llamar con el lock tomado)."""
+        t = threading.Thread(target=self._worker_loop, name=f"{self.name}-{len(self._threads)}", daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, enqueued_at = item
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self.total_wait += waited
+                if waited > self.max_wait:
+                    self.max_wait = waited
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._lock:
+                self._idle += 1
+                self.completed += 1
+            if self._shutdown and self._queue.empty():
+                break
+
+        with self._lock:
+            self._idle = max(0, self._idle - 1)
+            self._threads.remove(threading.current_thread())
+
+
+class PriorityLanes(Executor):
+    """
+    Carriles de prioridad: reparte los handlers entre varios WorkerPool según el tipo del
+    mensaje, para que los tipos de control (heartbeats, discovery) tengan hilos y cola
+    reservados y no esperen detrás de handlers lentos (p.ej. transferencias de datos).
+
+    submit(fn, message, ...) elige el carril por message.header["type"]; los tipos sin carril
+    asignado van al carril default. Sirve como executor de AsyncTCPServer.
+    """
+
+    def __init__(self, lanes: dict[str, WorkerPool], routes: dict[str, str] = None, default: str = "default"):
+        """
+        lanes: nombre del carril -> WorkerPool
+        routes: tipo de mensaje -> nombre del carril
+        default: carril de los tipos que no están en routes
+        """
+        if default not in lanes:
+            raise ValueError(f"Carril por defecto '{default}' no existe")
+        self.lanes = lanes
+        self.default = default
+        self.routes: dict[str, str] = {}
+        for type, lane in (routes or {}).items():
+            self.route(type, lane)
+
+    # ---------------- Métodos públicos ----------------
+    def route(self, type: str, lane: str):
+        """Asigna el tipo de mensaje type al carril lane."""
+        if lane not in self.lanes:
+            raise ValueError(f"Carril '{lane}' no existe. Esperado uno de {sorted(self.lanes)}")
+        self.routes[type] = lane
+
+    def add_lane(self, name: str, pool: WorkerPool):
+        """Añade el carril name, atendido por pool (asignarle tipos con route)."""
+        if name in self.lanes:
+            raise ValueError(f"Carril '{name}' ya existe")
+        self.lanes[name] = pool
+
+    def lane_for(self, type: str) -> WorkerPool:
+        return self.lanes[self.routes.get(type, self.default)]
+
+    def submit(self, fn, message, /, *args, **kwargs) -> Future:
+        """Encola fn(message, *args, **kwargs) en el carril del tipo de message (WorkerPoolBusy si está lleno)."""
+        return self.lane_for(message.header.get("type")).submit(fn, message, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        for pool in self.lanes.values():
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> dict:
+        """Métricas de cada carril."""
+        return {name: pool.stats() for name, pool in self.lanes.items()}
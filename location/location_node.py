@@ -1,11 +1,15 @@
 import os
 import threading
-import time
 import ipaddress
 import logging
 import concurrent.futures
 
 from comm import CommunicationNode, Message
+from comm.beacon import BeaconListener, beacon_address, beacon_interval, beacon_mode, beacon_port
+from comm.prober import ConnectProber, SubnetSweep
+from comm.streaming import StreamError
+from location.membership_cache import MembershipCache, cache_path_for
+from location.service_directory import ServiceDirectory
 from app.discovery import NodeType
 
 logger = logging.getLogger("dftp.location.location_node")
@@ -14,9 +18,15 @@ class LocationNode(CommunicationNode):
     """
     Nodo base para TODOS los nodos del sistema (routing, auth, data, processing).
     Añade:
-    - Descubrimiento automático de DiscoveryNodes por subred.
+    - Descubrimiento automático de DiscoveryNodes por sus beacons UDP (o, si no llegan, barriendo la subred).
     - Heartbeat periódico hacia los DiscoveryNodes detectados.
     - API simple para consultar discovery: register, query, resolve...
+    - Directorio local por rol (ServiceDirectory): lookup_role responde desde memoria mientras
+      no caduque (DIRECTORY_TTL) y un miembro al que no se puede conectar queda en cuarentena. Con
+      DIRECTORY_SUBSCRIBE (por defecto activo) se mantiene al día con los cambios que
+      discovery envía por DISCOVERY_SUBSCRIBE, sin consultar por rol.
+    - Arranque en caliente (con MEMBERSHIP_CACHE_DIR): la última membresía conocida
+      (MembershipCache) se usa desde el primer momento y el heartbeat la verifica en segundo plano.
     """
 
     def __init__(self, node_name: str, ip: str, port: int, discovery_port: int = 9100, discovery_timeout: float = 0.8,
@@ -35,6 +45,11 @@ class LocationNode(CommunicationNode):
             raise ValueError("DISCOVERY_SUBNET no está configurado en LocationNode")
         
         self.possible_ips = self._get_possible_ips()
+
+        # Barrido de la subred cuando no llegan beacons: connects no bloqueantes desde un hilo,
+        # por ventanas de DISCOVERY_SCAN_WINDOW direcciones (por defecto la subred entera)
+        self.prober = ConnectProber(timeout=discovery_timeout)
+        self.sweep = SubnetSweep(self.possible_ips, window=int(os.getenv("DISCOVERY_SCAN_WINDOW", "0")) or None)
         
         # Para scaneo de red paralelo
         self.discovery_workers = discovery_workers
@@ -43,13 +58,114 @@ class LocationNode(CommunicationNode):
         self.discovery_nodes: dict[str, str] = {}
         self.discovery_nodes_lock = threading.Lock()
 
+        # Última respuesta OK de discovery por rol: sirve lookup_role mientras no caduque y
+        # respalda query_by_role si discovery no contesta, como mucho DIRECTORY_MAX_STALE segundos
+        # (los miembros a los que falla un envío quedan fuera DIRECTORY_QUARANTINE segundos)
+        self.directory = ServiceDirectory(ttl=float(os.getenv("DIRECTORY_TTL", "5")),
+                                          max_stale=float(os.getenv("DIRECTORY_MAX_STALE", "300")),
+                                          quarantine=float(os.getenv("DIRECTORY_QUARANTINE", "10")))
+        self._membership_dirty = False
+        self._save_lock = threading.Lock()  # un guardado a la vez: el último escrito es el más reciente
+
+        # Suscripción a los cambios de la tabla de un discovery node: copia local de sus registros
+        # (name -> to_dict) y el último cambio aplicado (epoch, seq) para pedir solo los siguientes
+        self.subscribe = os.getenv("DIRECTORY_SUBSCRIBE", "1") != "0"
+        self.subscribe_duration = float(os.getenv("DIRECTORY_SUBSCRIBE_DURATION", "30"))
+        self._sub_ip: str | None = None
+        self._sub_epoch: str | None = None
+        self._sub_seq: int | None = None
+        self._sub_members: dict[str, dict] = {}
+        self.subscription_resyncs = 0
+
+        # Arranque en caliente: membresía guardada en la ejecución anterior (MEMBERSHIP_CACHE_DIR)
+        cache_path = cache_path_for(node_name)
+        self.membership_cache = MembershipCache(cache_path) if cache_path else None
+        self._warm_roles_pending = False
+        if self.membership_cache is not None:
+            warm = self.membership_cache.load()
+            self.discovery_nodes = warm["discovery_nodes"]
+            self.directory.load(warm["roles"], age=warm["age"])
+            self._warm_roles_pending = bool(warm["roles"])
+            if self.discovery_nodes:
+                logger.info("[%s] Arranque en caliente con discovery nodes %s", node_name, self.discovery_nodes)
+
+        # Beacons UDP de los DiscoveryNodes: dicen a qué ips mandar heartbeats sin barrer la subred
+        self.beacon_listener = self._start_beacon_listener()
+        self.beacon_max_age = 3 * beacon_interval()
+
         logger.info("LocationNode '%s' iniciado en %s:%s (subnet=%s)", self.node_name, self.ip, self.port, self.subnet)
 
         # ---- Hilos internos ----
+        self._stop = threading.Event()
         # send_heartbeat_loop envia heartbeats periódicos a los discovery nodes
         self.heartbeat_thread = threading.Thread(target=self._send_heartbeat_loop, daemon=True)
         self.heartbeat_thread.start()
+        # subscription_loop mantiene el directorio con los cambios que envía discovery
+        self.subscription_thread = None
+        if self.subscribe:
+            self.subscription_thread = threading.Thread(target=self._subscription_loop, daemon=True)
+            self.subscription_thread.start()
+
+
+    def stop_server(self):
+        """Detiene el heartbeat, deja de escuchar beacons y detiene el servidor."""
+        self._stop.set()
+        if self.beacon_listener is not None:
+            self.beacon_listener.stop()
+        super().stop_server()
+
+    def metrics_snapshot(self) -> dict:
+        """CommunicationNode.metrics_snapshot más aciertos e invalidaciones del directorio por rol."""
+        snapshot = super().metrics_snapshot()
+        snapshot["directory"] = {**self.directory.stats(), "subscription_seq": self._sub_seq,
+                                 "subscription_resyncs": self.subscription_resyncs}
+        return snapshot
+
+    def _start_beacon_listener(self) -> BeaconListener | None:
+        mode = beacon_mode()
+        if mode == "off":
+            return None
+        try:
+            listener = BeaconListener(beacon_port(), group=beacon_address(self.subnet, mode) if mode == "multicast" else None,
+                                      accept=lambda p: p.get("role") == "DISCOVERY")
+        except OSError:
+            logger.warning("[%s] No se pudo escuchar beacons UDP, se escaneará la subred", self.node_name, exc_info=True)
+            return None
+        listener.start()
+        return listener
 
+    def _heartbeat_targets(self) -> list[str]:
+        """IPs a las que mandar el heartbeat de esta ronda: por beacons o, si no llegan, barriendo."""
+        if self._scanning():
+            return self._scan_targets()
+        return self._beacon_targets()
+
+    def _scanning(self) -> bool:
+        """Beacons desactivados o ninguno reciente (3 intervalos): hay que barrer la subred."""
+        return self.beacon_listener is None or self.beacon_listener.scan_needed(self.beacon_max_age)
+
+    def _beacon_targets(self) -> list[str]:
+        """
+        Los DiscoveryNodes con beacon reciente y los ya conocidos (un beacon perdido no los da
+        de baja; si cayeron, el heartbeat fallará).
+        """
+        listener = self.beacon_listener
+        self._learn_endpoints([p.get("endpoint") for p in listener.payloads(self.beacon_max_age)])
+        with self.discovery_nodes_lock:
+            known = set(self.discovery_nodes.values())
+        return sorted(known | set(listener.alive(self.beacon_max_age).values()))
+
+    def _scan_targets(self) -> list[str]:
+        """
+        Siguiente ventana del barrido (con los discovery nodes conocidos y las ips que ya
+        respondieron por delante), reducida a las que tienen abierto el puerto de discovery.
+        """
+        with self.discovery_nodes_lock:
+            known = list(self.discovery_nodes.values())
+        window = self.sweep.next_window(priority=known)
+        open_ips = self.prober.probe(window, self.discovery_port)
+        self.sweep.update(window, open_ips, skipped=self.prober.last_skipped)
+        return open_ips
 
     def _get_possible_ips(self) -> list[str]:
         """Obtiene todas las posibles ips de hosts de la red exceptuando la ip propia para el envío de mensajes"""
@@ -73,7 +189,11 @@ class LocationNode(CommunicationNode):
 
         msg = Message(type="DISCOVERY_QUERY_BY_NAME", src=self.ip, dst=d_ip, payload={"name": name})
 
-        return self.send_message(d_ip, self.discovery_port, msg, await_response=True)
+        # Consultas idénticas concurrentes (una por sesión FTP) comparten una sola petición
+        response = self.send_message_coalesced(d_ip, self.discovery_port, msg)
+        if response and response.payload.get("status") == "OK":
+            self._learn_endpoints([(response.payload.get("node") or {}).get("endpoint")])
+        return response
 
     def query_by_role(self, node_type: NodeType):
         """ DISCOVERY_QUERY_BY_ROLE """
@@ -83,32 +203,114 @@ class LocationNode(CommunicationNode):
 
         msg = Message(type="DISCOVERY_QUERY_BY_ROLE", src=self.ip, dst=d_ip, payload={"role": node_type.value})
 
-        return self.send_message(d_ip, self.discovery_port, msg, await_response=True)
+        response = self.send_message_coalesced(d_ip, self.discovery_port, msg)
+        if response and response.payload.get("status") == "OK":
+            self._learn_endpoints(response.payload.get("endpoints") or [])
+            self._remember_role(node_type, response.payload)
+        elif response is None:
+            return self._cached_role_response(node_type, d_ip)
+        return response
+
+    def lookup_role(self, node_type: NodeType) -> list[dict]:
+        """
+        Miembros del rol ({ip, port, host, uds}, ver endpoint_info) desde el directorio local;
+        solo pregunta a discovery si la entrada caducó o se invalidó. Lista vacía si no hay.
+        """
+        payload = self.directory.fresh(node_type.value)
+        if payload is None:
+            self.query_by_role(node_type)
+            payload = self.directory.get(node_type.value) or {}
+        return [e for e in payload.get("endpoints") or [] if e.get("ip") and e.get("port")]
+
+    def _on_send_failure(self, ip: str, port: int):
+        """No se pudo conectar o enviar a ip:port (o su circuito se abrió): queda en cuarentena en el directorio."""
+        if self.directory.invalidate(ip, port):
+            with self.discovery_nodes_lock:
+                self._membership_dirty = True
+
+    def _remember_role(self, node_type: NodeType, payload: dict):
+        entry = {k: v for k, v in payload.items() if k != "status"}
+        if self.directory.put(node_type.value, entry):
+            with self.discovery_nodes_lock:
+                self._membership_dirty = True
+
+    def _cached_role_response(self, node_type: NodeType, d_ip: str | None):
+        """
+        Respuesta de query_by_role con la última lista conocida del rol (marcada "cached"), o None
+        si no la hay o discovery la dio hace más de DIRECTORY_MAX_STALE segundos.
+        """
+        entry = self.directory.get(node_type.value)
+        if entry is None:
+            return None
+        logger.debug("[%s] Discovery no responde, se usa la lista guardada de %s", self.node_name, node_type.value)
+        return Message(type="DISCOVERY_QUERY_BY_ROLE_RESPONSE", src=d_ip or self.ip, dst=self.ip,
+                       payload={**entry, "status": "OK", "cached": True})
+
+    def _save_membership(self):
+        """Guarda la membresía en el fichero de arranque en caliente si cambió."""
+        if self.membership_cache is None:
+            return
+        with self._save_lock:
+            with self.discovery_nodes_lock:
+                if not self._membership_dirty:
+                    return
+                self._membership_dirty = False
+                discovery_nodes = dict(self.discovery_nodes)
+            roles = self.directory.snapshot()
+            self.membership_cache.save(discovery_nodes, roles)
+
+    def _verify_warm_roles(self):
+        """Tras el primer heartbeat con respuesta, refresca las listas por rol traídas del fichero."""
+        self._warm_roles_pending = False
+        for role in self.directory.snapshot():
+            try:
+                self.query_by_role(NodeType(role))
+            except ValueError:
+                continue
+
+    def _learn_endpoints(self, endpoints):
+        """Registra los sockets Unix de los nodos del mismo host anunciados por discovery."""
+        for endpoint in endpoints:
+            if isinstance(endpoint, dict):
+                self.register_peer_endpoint(endpoint)
         
     def _send_heartbeat_loop(self):
-        """Envía heartbeats en paralelo a todas las IPs de la subred para descubrir discovery nodes.
+        """Envía heartbeats en paralelo a los discovery nodes anunciados por beacon (o a las IPs
+        de la subred con el puerto de discovery abierto, si no llegan beacons) para descubrirlos.
 
         .Si el nodo no se encuentra registrado en el discovery node este lo registrará automáticamente.
         .Si ya se encontraba registrado simplemente se actualizará su heartbeat e ip."""
 
         logger.info("[%s] Iniciando send_heartbeat_loop", self.node_name)
 
-        while True:
+        while not self._stop.is_set():
             try:
-                found = self._find_discovery_nodes_in_parallel()
+                targets = self._heartbeat_targets()
+                if not targets and not self._scanning():
+                    # Aún no llegó ningún beacon: se vuelve a mirar enseguida (no cuesta tráfico)
+                    self._stop.wait(0.2)
+                    continue
+                found = self._find_discovery_nodes_in_parallel(targets)
 
                 self._update_discovery_nodes(found)
-                time.sleep(self.heartbeat_interval)
+                if found and self._warm_roles_pending:
+                    self._verify_warm_roles()
+                self._save_membership()
+                self._stop.wait(self.heartbeat_interval)
 
             except Exception:
                 logger.exception("Error en send_heartbeat_loop")
-                time.sleep(self.heartbeat_interval)
+                self._stop.wait(self.heartbeat_interval)
     
-    def _find_discovery_nodes_in_parallel(self):
-        max_workers = min(self.discovery_workers, max(1, len(self.possible_ips)))
+    def _find_discovery_nodes_in_parallel(self, ips: list[str] = None):
+        """Heartbeat en paralelo a ips (por defecto toda la subred); devuelve name -> ip de los discovery nodes que respondieron."""
+        ips = self.possible_ips if ips is None else ips
+        if not ips:
+            return {}
+        max_workers = min(self.discovery_workers, len(ips))
         results = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-            futures = [ex.submit(self._probe_heartbeat_ip, ip) for ip in self.possible_ips]
+            futures = [ex.submit(self._probe_heartbeat_ip, ip) for ip in ips]
             
             for fut in concurrent.futures.as_completed(futures):
                 try:
@@ -124,7 +326,8 @@ class LocationNode(CommunicationNode):
     def _probe_heartbeat_ip(self, ip_addr: str):
         """Envía un DISCOVERY_HEARTBEAT a ip_addr y devuelve (ip, response) o (ip, None)."""
         try:
-            payload = {"name": self.node_name, "ip": self.ip, "role": (self.node_type.value if self.node_type else None)}
+            payload = {"name": self.node_name, "ip": self.ip, "role": (self.node_type.value if self.node_type else None),
+                       "endpoint": self.endpoint_info()}
             msg = Message(type="DISCOVERY_HEARTBEAT", src=self.ip, dst=ip_addr, payload=payload)
             resp = self.send_message(ip_addr, self.discovery_port, msg, await_response=True, timeout=self.discovery_timeout)
             return ip_addr, resp
@@ -147,14 +350,94 @@ class LocationNode(CommunicationNode):
                     
                     if name and ip:
                         found[name] = ip
+                        self._learn_endpoints([response.payload.get("endpoint")])
 
             except Exception:
                 continue
 
         return found
 
-    def _update_discovery_nodes(self, found: dict) -> dict:
+    def _subscription_loop(self):
+        """Se suscribe a los cambios de un discovery node y, al terminar cada stream, vuelve a hacerlo desde el último."""
+        logger.info("[%s] Iniciando subscription_loop", self.node_name)
+        while not self._stop.is_set():
+            d_ip = self._subscription_target()
+            if not d_ip:
+                self._stop.wait(0.2)
+                continue
+            if d_ip != self._sub_ip:
+                # Otro discovery node: sus seq no tienen que ver con las del anterior
+                self._sub_ip, self._sub_epoch, self._sub_seq = d_ip, None, None
+            try:
+                self._consume_subscription(d_ip)
+            except StreamError as e:
+                logger.debug("[%s] Suscripción a %s cortada: %s", self.node_name, d_ip, e)
+                self._stop.wait(self.heartbeat_interval)
+            except Exception:
+                logger.exception("Error en subscription_loop")
+                self._stop.wait(self.heartbeat_interval)
+
+    def _subscription_target(self) -> str | None:
+        """El discovery node de la suscripción actual mientras siga conocido; si no, el de las consultas."""
+        with self.discovery_nodes_lock:
+            if self._sub_ip in self.discovery_nodes.values():
+                return self._sub_ip
+        return self._get_discovery_node()
+
+    def _consume_subscription(self, d_ip: str):
+        # Un chunk al menos cada keepalive: así el directorio no caduca mientras la suscripción vive
+        keepalive = self.directory.ttl / 2
+        msg = Message(type="DISCOVERY_SUBSCRIBE", src=self.ip, dst=d_ip,
+                      payload={"since": self._sub_seq, "epoch": self._sub_epoch,
+                               "duration": self.subscribe_duration, "keepalive": keepalive})
+        chunks = self.send_stream(d_ip, self.discovery_port, msg, timeout=keepalive + self.discovery_timeout + 1)
+        try:
+            for chunk in chunks:
+                if self._stop.is_set() or not self._apply_subscription(chunk):
+                    return
+        finally:
+            chunks.close()
+
+    def _apply_subscription(self, chunk: dict) -> bool:
+        """
+        Aplica un chunk de DISCOVERY_SUBSCRIBE a la copia local y publica las listas por rol en
+        el directorio. Devuelve False si falta algún cambio (hay que volver a pedir la tabla).
+        """
+        kind = chunk.get("kind")
+        if kind == "snapshot":
+            self._sub_members = {node["name"]: node for node in chunk.get("nodes") or []}
+        elif kind == "deltas":
+            deltas = chunk.get("deltas") or []
+            if self._sub_seq is None or chunk.get("epoch") != self._sub_epoch or \
+                    (deltas and deltas[0].get("seq") != self._sub_seq + 1):
+                logger.info("[%s] Hueco en la suscripción tras seq %s, se pide la tabla entera", self.node_name, self._sub_seq)
+                self._sub_epoch, self._sub_seq = None, None
+                self.subscription_resyncs += 1
+                return False
+            for delta in deltas:
+                node = delta.get("node") or {}
+                if delta.get("op") == "remove":
+                    self._sub_members.pop(node.get("name"), None)
+                else:
+                    self._sub_members[node.get("name")] = node
+        else:
+            return False
+
+        self._sub_epoch, self._sub_seq = chunk.get("epoch"), chunk.get("seq")
+        self._publish_subscription()
+        return True
+
+    def _publish_subscription(self):
+        """Lleva la copia local al directorio con el mismo formato que DISCOVERY_QUERY_BY_ROLE."""
+        for node_type in NodeType:
+            members = [node for node in self._sub_members.values() if node.get("type") == node_type.value]
+            endpoints = [node["endpoint"] for node in members if node.get("endpoint")]
+            self._learn_endpoints(endpoints)
+            self._remember_role(node_type, {"ips": [node.get("ip") for node in members], "endpoints": endpoints})
+
+    def _update_discovery_nodes(self, found: dict) -> None:
         """Actualiza self.discovery_nodes si cambió."""
         with self.discovery_nodes_lock:
             if set(found.items()) != set(self.discovery_nodes.items()):
                 self.discovery_nodes = found
+                self._membership_dirty = True
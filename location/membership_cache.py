@@ -0,0 +1,68 @@
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger("dftp.location.membership_cache")
+
+# MEMBERSHIP_CACHE_DIR: directorio propio del despliegue donde cada nodo guarda su última
+# membresía conocida (sin definir o vacío, desactivado: no se usa el temporal compartido).
+# MEMBERSHIP_CACHE_MAX_AGE: segundos tras los cuales el fichero se ignora al arrancar.
+DEFAULT_MAX_AGE = 3600.0
+
+
+def cache_path_for(node_name: str) -> str | None:
+    directory = os.getenv("MEMBERSHIP_CACHE_DIR")
+    if not directory:
+        return None
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in node_name)
+    return os.path.join(directory, f"dftp-membership-{safe_name}.json")
+
+
+class MembershipCache:
+    """
+    Última membresía conocida por un LocationNode (discovery nodes y respuestas por rol) en
+    un fichero JSON local. Al arrancar se carga para usarla de inmediato, de forma optimista,
+    mientras el heartbeat la verifica; se reescribe cuando cambia.
+    """
+
+    def __init__(self, path: str, max_age: float = None):
+        self.path = path
+        self.max_age = max_age if max_age is not None else float(os.getenv("MEMBERSHIP_CACHE_MAX_AGE", str(DEFAULT_MAX_AGE)))
+
+    def load(self) -> dict:
+        """
+        Devuelve {"discovery_nodes": {name: ip}, "roles": {role: payload}, "age": segundos};
+        vacío si no hay fichero, no se puede leer o es más antiguo que max_age.
+        """
+        empty = {"discovery_nodes": {}, "roles": {}, "age": 0.0}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return empty
+        except (OSError, ValueError):
+            logger.warning("Caché de membresía ilegible en %s, se ignora", self.path)
+            return empty
+
+        age = max(0.0, time.time() - data.get("saved_at", 0))
+        if age > self.max_age:
+            logger.info("Caché de membresía de hace %.0fs, se ignora", age)
+            return empty
+        return {"discovery_nodes": dict(data.get("discovery_nodes") or {}), "roles": dict(data.get("roles") or {}),
+                "age": age}
+
+    def save(self, discovery_nodes: dict, roles: dict):
+        """Escribe la membresía de forma atómica (fichero temporal + rename), legible solo por el usuario."""
+        data = {"saved_at": time.time(), "discovery_nodes": discovery_nodes, "roles": roles}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.warning("No se pudo guardar la caché de membresía en %s", self.path, exc_info=True)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -0,0 +1,125 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger("dftp.location.service_directory")
+
+
+class ServiceDirectory:
+    """
+    Vista local de la membresía por rol: la última respuesta OK de DISCOVERY_QUERY_BY_ROLE
+    de cada rol y cuándo llegó. Mientras no caduque (ttl) las consultas por rol se sirven
+    desde memoria. Un miembro al que no se puede conectar se quita de inmediato y queda en
+    cuarentena quarantine segundos: las respuestas de discovery que lleguen mientras tanto
+    (que aún puede tenerlo registrado) se guardan sin él. La cuarentena nunca deja un rol
+    vacío: si solo quedan miembros en cuarentena se siguen usando. Ya caducada, la lista
+    solo se usa de respaldo hasta max_stale segundos después de que discovery la diera.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_stale: float = None, quarantine: float = 10.0):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.quarantine = quarantine
+        self._quarantined: dict[tuple, float] = {}  # (ip, port o None) -> fin de la cuarentena
+        # role -> (payload sin status, instante para el ttl, instante en que discovery la dio)
+        self._roles: dict[str, tuple[dict, float, float]] = {}
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def fresh(self, role: str) -> dict | None:
+        """Payload del rol si no ha caducado (cuenta como acierto o fallo en las métricas)."""
+        with self._lock:
+            entry = self._roles.get(role)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def get(self, role: str) -> dict | None:
+        """Último payload conocido del rol aunque haya caducado, si no supera max_stale."""
+        with self._lock:
+            entry = self._roles.get(role)
+            if entry is None:
+                return None
+            if self.max_stale is not None and time.monotonic() - entry[2] > self.max_stale:
+                return None
+            return entry[0]
+
+    def put(self, role: str, payload: dict) -> bool:
+        """
+        Guarda la respuesta del rol, sin los miembros en cuarentena (salvo que sean todos).
+        Devuelve True si cambió la lista de miembros.
+        """
+        now = time.monotonic()
+        with self._lock:
+            payload = self._without_quarantined(payload, now)
+            previous = self._roles.get(role)
+            self._roles[role] = (payload, now, now)
+            return previous is None or previous[0] != payload
+
+    def load(self, roles: dict, age: float = 0.0):
+        """
+        Carga payloads guardados hace age segundos (arranque en caliente) como ya caducados:
+        solo de respaldo, y cuentan como obtenidos entonces para max_stale.
+        """
+        obtained_at = time.monotonic() - age
+        with self._lock:
+            for role, payload in roles.items():
+                self._roles[role] = (payload, float("-inf"), obtained_at)
+
+    def invalidate(self, ip: str, port: int = None) -> bool:
+        """
+        Pone en cuarentena el miembro ip:port (o todos los de ip si port es None) y lo quita de
+        los roles en los que queda algún otro miembro fuera de cuarentena. Si no queda ninguno
+        se conservan, pero el rol se marca caducado para volver a preguntar a discovery.
+        Devuelve True si estaba en alguno.
+        """
+        changed = False
+        with self._lock:
+            now = time.monotonic()
+            self._quarantined[(ip, port)] = now + self.quarantine
+            for role, (payload, fetched_at, obtained_at) in list(self._roles.items()):
+                endpoints = payload.get("endpoints") or []
+                if not any(e.get("ip") == ip and (port is None or e.get("port") == port) for e in endpoints):
+                    continue
+                kept = self._without_quarantined(payload, now)
+                self._roles[role] = (kept, fetched_at if kept is not payload else float("-inf"), obtained_at)
+                changed = True
+            if changed:
+                self.invalidations += 1
+        if changed:
+            logger.debug("Miembro %s:%s invalidado en el directorio", ip, port)
+        return changed
+
+    def _without_quarantined(self, payload: dict, now: float) -> dict:
+        """
+        payload sin los miembros en cuarentena; el mismo objeto si no había ninguno o si lo
+        estaban todos (mejor probar con ellos que quedarse sin miembros). Con el lock tomado.
+        """
+        for key, until in list(self._quarantined.items()):
+            if until <= now:
+                del self._quarantined[key]
+        if not self._quarantined:
+            return payload
+        endpoints = payload.get("endpoints") or []
+        kept = [e for e in endpoints
+                if (e.get("ip"), e.get("port")) not in self._quarantined and (e.get("ip"), None) not in self._quarantined]
+        if not kept or len(kept) == len(endpoints):
+            return payload
+        return {**payload, "endpoints": kept, "ips": [e.get("ip") for e in kept]}
+
+    def snapshot(self) -> dict:
+        """role -> payload de los roles que aún sirven de respaldo, para persistirlos."""
+        with self._lock:
+            now = time.monotonic()
+            return {role: entry[0] for role, entry in self._roles.items()
+                    if self.max_stale is None or now - entry[2] <= self.max_stale}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"roles": len(self._roles), "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
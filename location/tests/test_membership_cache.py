@@ -0,0 +1,106 @@
+import unittest
+import json
+import os
+import tempfile
+import time
+from app.discovery import DiscoveryNode, NodeType
+from location.location_node import LocationNode
+from location.membership_cache import MembershipCache, cache_path_for
+
+
+class TestMembershipCache(unittest.TestCase):
+
+    def setUp(self):
+        self.env = dict(os.environ)
+        self.tmp = tempfile.TemporaryDirectory()
+        os.environ["MEMBERSHIP_CACHE_DIR"] = self.tmp.name
+        os.environ["DISCOVERY_SUBNET"] = "127.0.0.0/28"
+        # Beacons lentos: un nodo en frío tarda en encontrar al DiscoveryNode
+        os.environ["DISCOVERY_BEACON"] = "multicast"
+        os.environ["DISCOVERY_BEACON_PORT"] = "9610"
+        os.environ["DISCOVERY_BEACON_INTERVAL"] = "5"
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop_server()
+        self.tmp.cleanup()
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def test_save_and_load(self):
+        cache = MembershipCache(cache_path_for("data/1"))
+        self.assertEqual(cache.load(), {"discovery_nodes": {}, "roles": {}, "age": 0.0})
+        cache.save({"d1": "10.0.0.2"}, {"DATA": {"ips": ["10.0.0.5"]}})
+        self.assertEqual(cache.load()["discovery_nodes"], {"d1": "10.0.0.2"})
+        self.assertEqual(os.stat(cache.path).st_mode & 0o777, 0o600)
+        self.assertEqual(MembershipCache(cache.path, max_age=0).load()["discovery_nodes"], {})
+
+        with open(cache.path, "w") as f:
+            f.write("{no es json")
+        self.assertEqual(cache.load()["roles"], {})
+
+    def test_disabled_unless_configured(self):
+        os.environ["MEMBERSHIP_CACHE_DIR"] = ""
+        self.assertIsNone(cache_path_for("data1"))
+        del os.environ["MEMBERSHIP_CACHE_DIR"]
+        self.assertIsNone(cache_path_for("data1"))
+
+    def test_warm_start_answers_immediately(self):
+        """Con la membresía guardada el nodo consulta a discovery nada más arrancar, sin esperar al beacon."""
+        discovery = DiscoveryNode("discovery1", "127.0.0.1", 9611)
+        self.nodes.append(discovery)
+        time.sleep(0.1)  # su primer beacon sale antes de que nadie escuche
+
+        cold = LocationNode("cold", "127.0.0.1", 9612, discovery_port=9611, node_type=NodeType.DATA)
+        self.nodes.append(cold)
+        self.assertIsNone(cold.query_by_role(NodeType.DATA))
+
+        MembershipCache(cache_path_for("warm")).save({"discovery1": "127.0.0.1"}, {})
+        warm = LocationNode("warm", "127.0.0.1", 9613, discovery_port=9611, node_type=NodeType.DATA)
+        self.nodes.append(warm)
+        response = warm.query_by_role(NodeType.DATA)
+        self.assertEqual(response.payload["status"], "OK")
+        self.assertNotIn("cached", response.payload)
+
+        # El heartbeat verifica y reescribe la membresía
+        end = time.monotonic() + 3
+        while time.monotonic() < end and not discovery.register_table.get_node("warm"):
+            time.sleep(0.05)
+        self.assertIsNotNone(discovery.register_table.get_node("warm"))
+        warm.query_by_role(NodeType.DATA)
+        warm._save_membership()
+        with open(cache_path_for("warm")) as f:
+            saved = json.load(f)
+        self.assertEqual(saved["discovery_nodes"], {"discovery1": "127.0.0.1"})
+        self.assertEqual(saved["roles"]["DATA"]["ips"], ["127.0.0.1"])
+
+    def test_cached_roles_when_discovery_unreachable(self):
+        """Si discovery no contesta, query_by_role devuelve la última lista guardada marcada como cached."""
+        MembershipCache(cache_path_for("orphan")).save({"discovery1": "127.0.0.1"}, {"AUTH": {"ips": ["10.0.0.9"]}})
+        node = LocationNode("orphan", "127.0.0.1", 9614, discovery_port=9615, node_type=NodeType.DATA)
+        self.nodes.append(node)
+        response = node.query_by_role(NodeType.AUTH)
+        self.assertEqual(response.payload["ips"], ["10.0.0.9"])
+        self.assertTrue(response.payload["cached"])
+        self.assertIsNone(node.query_by_role(NodeType.DATA))
+
+    def test_cached_roles_expire(self):
+        """La lista guardada no se sirve si discovery la dio hace más de DIRECTORY_MAX_STALE."""
+        os.environ["DIRECTORY_MAX_STALE"] = "60"
+        cache = MembershipCache(cache_path_for("orphan"))
+        cache.save({"discovery1": "127.0.0.1"}, {"AUTH": {"ips": ["10.0.0.9"]}})
+        with open(cache.path) as f:
+            data = json.load(f)
+        data["saved_at"] -= 120
+        with open(cache.path, "w") as f:
+            json.dump(data, f)
+
+        node = LocationNode("orphan", "127.0.0.1", 9616, discovery_port=9615, node_type=NodeType.DATA)
+        self.nodes.append(node)
+        self.assertIsNone(node.query_by_role(NodeType.AUTH))
+        self.assertEqual(node.lookup_role(NodeType.AUTH), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import os
+import time
+from app.discovery import DiscoveryNode, NodeType
+from comm import Message
+from location.location_node import LocationNode
+from location.service_directory import ServiceDirectory
+
+
+def payload(*members):
+    return {"ips": [ip for ip, _ in members], "endpoints": [{"ip": ip, "port": port} for ip, port in members]}
+
+
+class TestServiceDirectory(unittest.TestCase):
+
+    def test_fresh_until_ttl(self):
+        directory = ServiceDirectory(ttl=0.2)
+        self.assertIsNone(directory.fresh("DATA"))
+        self.assertTrue(directory.put("DATA", payload(("10.0.0.5", 9000))))
+        self.assertFalse(directory.put("DATA", payload(("10.0.0.5", 9000))))
+        self.assertEqual(directory.fresh("DATA")["ips"], ["10.0.0.5"])
+        time.sleep(0.25)
+        self.assertIsNone(directory.fresh("DATA"))
+        self.assertEqual(directory.get("DATA")["ips"], ["10.0.0.5"])
+        self.assertEqual(directory.stats()["hits"], 1)
+        self.assertEqual(directory.stats()["misses"], 2)
+
+    def test_invalidate_member(self):
+        directory = ServiceDirectory(ttl=60, quarantine=0.2)
+        directory.put("DATA", payload(("10.0.0.5", 9000), ("10.0.0.6", 9000)))
+        self.assertFalse(directory.invalidate("10.0.0.7", 9000))
+        self.assertTrue(directory.invalidate("10.0.0.5", 9000))
+        self.assertEqual(directory.fresh("DATA")["ips"], ["10.0.0.6"])
+
+        # Discovery aún lo devuelve: sigue fuera mientras dure la cuarentena
+        self.assertFalse(directory.put("DATA", payload(("10.0.0.5", 9000), ("10.0.0.6", 9000))))
+        self.assertEqual(directory.get("DATA")["ips"], ["10.0.0.6"])
+        time.sleep(0.25)
+        self.assertTrue(directory.put("DATA", payload(("10.0.0.5", 9000), ("10.0.0.6", 9000))))
+        self.assertEqual(directory.get("DATA")["ips"], ["10.0.0.5", "10.0.0.6"])
+
+    def test_quarantine_never_empties_a_role(self):
+        """Con el único miembro en cuarentena el rol lo conserva (y se vuelve a preguntar a discovery)."""
+        directory = ServiceDirectory(ttl=60)
+        directory.put("DATA", payload(("10.0.0.5", 9000)))
+        self.assertTrue(directory.invalidate("10.0.0.5"))
+        self.assertIsNone(directory.fresh("DATA"))
+        self.assertEqual(directory.get("DATA")["ips"], ["10.0.0.5"])
+
+        directory.put("DATA", payload(("10.0.0.5", 9000)))
+        self.assertEqual(directory.fresh("DATA")["ips"], ["10.0.0.5"])
+        directory.put("DATA", payload(("10.0.0.5", 9000), ("10.0.0.6", 9000)))
+        self.assertEqual(directory.fresh("DATA")["ips"], ["10.0.0.6"])
+
+    def test_loaded_roles_are_stale(self):
+        directory = ServiceDirectory(ttl=60)
+        directory.load({"AUTH": payload(("10.0.0.9", 9000))})
+        self.assertIsNone(directory.fresh("AUTH"))
+        self.assertEqual(directory.snapshot(), {"AUTH": payload(("10.0.0.9", 9000))})
+
+    def test_stale_fallback_is_bounded(self):
+        directory = ServiceDirectory(ttl=0.1, max_stale=0.3)
+        directory.put("DATA", payload(("10.0.0.5", 9000)))
+        directory.load({"AUTH": payload(("10.0.0.9", 9000))}, age=0.5)
+        self.assertIsNone(directory.get("AUTH"))
+        time.sleep(0.2)
+        self.assertEqual(directory.get("DATA")["ips"], ["10.0.0.5"])
+        time.sleep(0.2)
+        self.assertIsNone(directory.get("DATA"))
+        self.assertEqual(directory.snapshot(), {})
+
+
+class TestLocationLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.env = dict(os.environ)
+        os.environ["MEMBERSHIP_CACHE_DIR"] = ""
+        os.environ["DISCOVERY_SUBNET"] = "127.0.0.0/28"
+        os.environ["DISCOVERY_BEACON"] = "multicast"
+        os.environ["DISCOVERY_BEACON_PORT"] = "9620"
+        os.environ["DISCOVERY_BEACON_INTERVAL"] = "0.2"
+        os.environ["DIRECTORY_TTL"] = "60"
+        os.environ["DIRECTORY_SUBSCRIBE"] = "0"  # solo consultas por rol
+        self.nodes = []
+
+        self.discovery = self._start(DiscoveryNode("discovery1", "127.0.0.1", 9621))
+        self.queries = 0
+        handler = self.discovery._handle_query_by_role
+
+        def counted(message, client_sock):
+            self.queries += 1
+            return handler(message, client_sock)
+
+        self.discovery.register_handler("DISCOVERY_QUERY_BY_ROLE", counted)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop_server()
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def _start(self, node):
+        self.nodes.append(node)
+        return node
+
+    def _wait_registered(self, *names):
+        end = time.monotonic() + 5
+        while time.monotonic() < end and not all(self.discovery.register_table.get_node(n) for n in names):
+            time.sleep(0.05)
+        self.assertTrue(all(self.discovery.register_table.get_node(n) for n in names))
+
+    def test_lookup_served_from_memory(self):
+        self._start(LocationNode("data1", "127.0.0.2", 9622, discovery_port=9621, node_type=NodeType.DATA))
+        client = self._start(LocationNode("proc1", "127.0.0.3", 9623, discovery_port=9621, node_type=NodeType.PROCESSING))
+        self._wait_registered("data1", "proc1")
+
+        for _ in range(5):
+            members = client.lookup_role(NodeType.DATA)
+        self.assertEqual([(m["ip"], m["port"]) for m in members], [("127.0.0.2", 9622)])
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(client.metrics_snapshot()["directory"]["hits"], 4)
+
+    def test_failed_send_invalidates_member(self):
+        data = self._start(LocationNode("data1", "127.0.0.2", 9624, discovery_port=9621, node_type=NodeType.DATA))
+        self._start(LocationNode("data2", "127.0.0.4", 9619, discovery_port=9621, node_type=NodeType.DATA))
+        client = self._start(LocationNode("proc1", "127.0.0.3", 9625, discovery_port=9621, node_type=NodeType.PROCESSING))
+        self._wait_registered("data1", "data2", "proc1")
+        self.assertEqual(len(client.lookup_role(NodeType.DATA)), 2)
+
+        # Sin presupuesto no se llega a enviar, y una respuesta lenta no indica que el miembro esté caído
+        msg = Message(type="DATA_PING", src=client.ip, dst="127.0.0.2", payload={})
+        self.assertIsNone(client.send_message("127.0.0.2", 9624, msg, timeout=0))
+        data.register_handler("DATA_PING", lambda m, s: time.sleep(0.5))
+        self.assertIsNone(client.send_message("127.0.0.2", 9624, msg, timeout=0.1))
+        self.assertEqual(len(client.lookup_role(NodeType.DATA)), 2)
+
+        # No se puede conectar: sale sin volver a preguntar a discovery, que aún lo tiene registrado
+        data.stop_server()
+        self.assertIsNone(client.send_message("127.0.0.2", 9624, msg, timeout=0.3))
+        self.assertEqual([(m["ip"], m["port"]) for m in client.lookup_role(NodeType.DATA)], [("127.0.0.4", 9619)])
+        self.assertEqual(self.queries, 1)
+
+
+class TestDirectorySubscription(unittest.TestCase):
+
+    def setUp(self):
+        self.env = dict(os.environ)
+        os.environ["MEMBERSHIP_CACHE_DIR"] = ""
+        os.environ["DISCOVERY_SUBNET"] = "127.0.0.0/28"
+        os.environ["DISCOVERY_BEACON"] = "multicast"
+        os.environ["DISCOVERY_BEACON_PORT"] = "9626"
+        os.environ["DISCOVERY_BEACON_INTERVAL"] = "0.2"
+        os.environ["DIRECTORY_TTL"] = "1"
+        os.environ["DIRECTORY_SUBSCRIBE_DURATION"] = "1"
+        self.nodes = []
+        self.discovery = DiscoveryNode("discovery1", "127.0.0.1", 9627)
+        self.nodes.append(self.discovery)
+        self.queries = 0
+        handler = self.discovery._handle_query_by_role
+
+        def counted(message, client_sock):
+            self.queries += 1
+            return handler(message, client_sock)
+
+        self.discovery.register_handler("DISCOVERY_QUERY_BY_ROLE", counted)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop_server()
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def wait_for(self, condition, timeout=5):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end and not condition():
+            time.sleep(0.05)
+        self.assertTrue(condition())
+
+    def test_directory_follows_changes_without_queries(self):
+        client = LocationNode("proc1", "127.0.0.3", 9628, discovery_port=9627, node_type=NodeType.PROCESSING)
+        self.nodes.append(client)
+        data = LocationNode("data1", "127.0.0.2", 9629, discovery_port=9627, node_type=NodeType.DATA)
+        self.nodes.append(data)
+
+        self.wait_for(lambda: client.directory.fresh(NodeType.DATA.value) and client.directory.get(NodeType.DATA.value)["ips"])
+        self.assertEqual([(m["ip"], m["port"]) for m in client.lookup_role(NodeType.DATA)], [("127.0.0.2", 9629)])
+
+        # Sigue al día más allá del TTL (keepalives y nuevas suscripciones) y ve la baja
+        time.sleep(1.5)
+        self.assertEqual(len(client.lookup_role(NodeType.DATA)), 1)
+        data.stop_server()
+        self.discovery.register_table.remove_node("data1")
+        self.wait_for(lambda: client.lookup_role(NodeType.DATA) == [])
+        self.assertEqual(self.queries, 0)
+        self.assertEqual(client.metrics_snapshot()["directory"]["subscription_resyncs"], 0)
+
+    def test_gap_triggers_resync(self):
+        os.environ["DIRECTORY_SUBSCRIBE"] = "0"  # los chunks se aplican a mano
+        client = LocationNode("proc1", "127.0.0.3", 9628, discovery_port=9627, node_type=NodeType.PROCESSING)
+        self.nodes.append(client)
+        node = {"name": "auth1", "ip": "127.0.0.4", "type": "AUTH", "endpoint": {"ip": "127.0.0.4", "port": 9000}}
+        self.assertTrue(client._apply_subscription({"kind": "snapshot", "epoch": "e1", "seq": 4, "nodes": [node]}))
+        self.assertTrue(client._apply_subscription({"kind": "deltas", "epoch": "e1", "seq": 5,
+                                                    "deltas": [{"seq": 5, "op": "update", "node": node}]}))
+        self.assertEqual(len(client.lookup_role(NodeType.AUTH)), 1)
+
+        # Falta el 6: se descarta y hay que volver a pedir la tabla
+        self.assertFalse(client._apply_subscription({"kind": "deltas", "epoch": "e1", "seq": 7,
+                                                     "deltas": [{"seq": 7, "op": "remove", "node": node}]}))
+        self.assertIsNone(client._sub_seq)
+        self.assertEqual(client.subscription_resyncs, 1)
+        self.assertEqual(len(client.directory.get(NodeType.AUTH.value)["endpoints"]), 1)
+
+if __name__ == "__main__":
+    unittest.main()